@@ -0,0 +1,259 @@
+import atexit
+import logging
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime
+
+from flask import request, url_for
+from markupsafe import Markup, escape
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.orm import Session
+
+from rate_limit import is_bot
+
+logger = logging.getLogger(__name__)
+
+_SLOT_RE = re.compile(rb'<!--ad:(\w+)-->(.*?)<!--/ad-->', re.DOTALL)
+_POSITION_RE = re.compile(rb'<!--ad:(\w+)-->')
+_IMAGE_RE = re.compile(r'^(https?://|/)\S+\.(png|jpe?g|gif|webp|svg)(\?\S*)?$', re.IGNORECASE)
+
+
+def render_ad(ad, position):
+    """HTML for one advertisement: an image when ``content`` is an image URL,
+    otherwise ``content`` as HTML (entered by admins), linked through the
+    click counter when the ad has a link"""
+    content = (ad.content or '').strip()
+    if _IMAGE_RE.match(content):
+        body = f'<img src="{escape(content)}" alt="{escape(ad.title)}" class="img-fluid">'
+    else:
+        body = content or str(escape(ad.title))
+    if ad.link_url:
+        body = (f'<a href="{url_for("main.advertisement_click", ad_id=ad.id)}" target="_blank" '
+                f'rel="sponsored noopener">{body}</a>')
+    return f'<div class="ad ad-{position}" data-ad-id="{ad.id}">{body}</div>'
+
+
+class AdServer:
+    """Chooses the advertisement shown in each ad slot and counts views.
+
+    Templates mark slots with ``{% call ad_slot('position') %}fallback{% endcall %}``.
+    Slots are filled after the page is rendered, so pages served from the
+    page cache still rotate ads; while a page has a slot with active ads it
+    gets no ETag, so no 304 keeps a previous ad on screen and every
+    impression counted was sent. Active ads are kept in memory per position
+    and picked at random in proportion to their ``weight``; the set is
+    reloaded after a local commit that touched an ad, when the directory
+    version changes, and every ``ADS_RELOAD_INTERVAL`` seconds for changes
+    made by other workers. Impressions and clicks are counted in memory and
+    added to ``AdvertisementDailyStats`` every ``ADS_FLUSH_INTERVAL`` seconds.
+    """
+
+    def __init__(self, app=None, directory_version=None):
+        self.app = None
+        self.directory_version = directory_version
+        self._lock = threading.Lock()
+        self._positions = {}
+        self._links = {}
+        self._loaded = None
+        self._stale = True
+        self._counts = Counter()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self.counters = {'impressions': 0, 'clicks': 0, 'reloads': 0, 'flushes': 0, 'failed': 0}
+        if app is not None:
+            self.init_app(app, directory_version)
+
+    def init_app(self, app, directory_version=None):
+        app.config.setdefault('ADS_RELOAD_INTERVAL', float(os.environ.get('ADS_RELOAD_INTERVAL', 60)))
+        app.config.setdefault('ADS_FLUSH_INTERVAL', float(os.environ.get('ADS_FLUSH_INTERVAL', 30)))
+        if directory_version is not None:
+            self.directory_version = directory_version
+        if self.app is None:
+            atexit.register(self.flush)
+        self.app = app
+        app.extensions['ad_server'] = self
+        app.add_template_global(self.slot, 'ad_slot')
+        app.after_request(self._fill_slots)
+        # Cached pages are stored with their slots unfilled; one that will
+        # get ads must not be validated by the cache
+        page_cache = app.extensions.get('page_cache')
+        if page_cache is not None:
+            page_cache.add_dynamic_check(self.fills)
+        if not event.contains(Session, 'after_flush', self._after_flush):
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+
+    def create(self):
+        """Add the weight column to an Advertisement table created before it existed"""
+        from app import db
+
+        columns = {column['name'] for column in inspect(db.engine).get_columns('advertisement')}
+        if 'weight' not in columns:
+            with db.engine.begin() as conn:
+                conn.execute(text("ALTER TABLE advertisement ADD COLUMN weight INTEGER NOT NULL DEFAULT 1"))
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['pending'] = sum(self._counts.values())
+        stats['active'] = sum(len(ads) for ads, _ in self._positions.values())
+        return stats
+
+    @staticmethod
+    def slot(position, caller=None):
+        """Template global marking an ad slot; ``caller`` renders the
+        fallback shown while no ad is active for ``position``"""
+        return Markup(f'<!--ad:{position}-->{caller() if caller else ""}<!--/ad-->')
+
+    def fills(self, body):
+        """Whether a slot in ``body`` will get an ad, by the same active
+        ads ``choose`` picks from"""
+        if b'<!--ad:' not in body:
+            return False
+        self._reload_if_needed()
+        positions = self._positions
+        return any(position.decode('ascii') in positions for position in _POSITION_RE.findall(body))
+
+    def choose(self, position):
+        """Return ``(ad_id, html)`` for a weighted random active ad, or None"""
+        self._reload_if_needed()
+        entry = self._positions.get(position)
+        if entry is None:
+            return None
+        ads, cumulative = entry
+        return ads[bisect_right(cumulative, random.random() * cumulative[-1])]
+
+    def link(self, ad_id):
+        """Target URL of an active ad, without a database query"""
+        self._reload_if_needed()
+        return self._links.get(ad_id)
+
+    def record(self, ad_id, event_type):
+        if is_bot(request.headers.get('User-Agent')):
+            return
+        self._ensure_worker()
+        with self._lock:
+            self._counts[(datetime.utcnow().date(), ad_id, event_type)] += 1
+        self.counters['impressions' if event_type == 'impression' else 'clicks'] += 1
+
+    def flush(self):
+        """Add the counts gathered so far to the database"""
+        from analytics_rollups import increment_counts
+        from app import db
+        from models import AdvertisementDailyStats
+
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return
+        with self.app.app_context():
+            try:
+                increment_counts(AdvertisementDailyStats, ('day', 'advertisement_id', 'event_type'), counts)
+                db.session.commit()
+                self.counters['flushes'] += 1
+            except Exception as e:
+                db.session.rollback()
+                self.counters['failed'] += sum(counts.values())
+                logger.error(f"Advertisement stats flush of {len(counts)} counters failed: {e}")
+
+    def report(self, start_date, end_date):
+        """Impressions and clicks of each advertisement between two dates
+        (inclusive), most viewed first"""
+        from app import db
+        from models import Advertisement, AdvertisementDailyStats
+
+        rows = db.session.execute(
+            select(Advertisement.id, Advertisement.title, Advertisement.position,
+                   AdvertisementDailyStats.event_type, func.sum(AdvertisementDailyStats.count))
+            .join(AdvertisementDailyStats, AdvertisementDailyStats.advertisement_id == Advertisement.id)
+            .where(AdvertisementDailyStats.day >= start_date, AdvertisementDailyStats.day <= end_date)
+            .group_by(Advertisement.id, Advertisement.title, Advertisement.position,
+                      AdvertisementDailyStats.event_type)
+        )
+        report = {}
+        for ad_id, title, position, event_type, count in rows:
+            entry = report.setdefault(ad_id, {'title': title, 'position': position, 'impressions': 0, 'clicks': 0})
+            entry['impressions' if event_type == 'impression' else 'clicks'] += count or 0
+        return sorted(report.values(), key=lambda entry: entry['impressions'], reverse=True)
+
+    # Loading
+
+    def _reload_if_needed(self):
+        version = self.directory_version.current()[0]
+        loaded = self._loaded
+        if (not self._stale and loaded is not None and loaded[0] == version
+                and time.monotonic() - loaded[1] < self.app.config['ADS_RELOAD_INTERVAL']):
+            return
+        from app import db
+        from models import Advertisement
+
+        self._stale = False
+        ads = db.session.execute(
+            select(Advertisement).where(Advertisement.is_active.is_(True)).order_by(Advertisement.id)
+        ).scalars().all()
+        positions = {}
+        for ad in ads:
+            if (ad.weight or 0) <= 0:
+                continue
+            entries, cumulative = positions.setdefault(ad.position, ([], []))
+            entries.append((ad.id, render_ad(ad, ad.position)))
+            cumulative.append((cumulative[-1] if cumulative else 0) + ad.weight)
+        self._positions = positions
+        self._links = {ad.id: ad.link_url for ad in ads if ad.link_url}
+        self._loaded = (version, time.monotonic())
+        self.counters['reloads'] += 1
+
+    def _after_flush(self, session, flush_context):
+        from models import Advertisement
+
+        if any(isinstance(obj, Advertisement) for obj in (*session.new, *session.dirty, *session.deleted)):
+            session.info['advertisements_changed'] = True
+
+    def _after_commit(self, session):
+        if session.info.pop('advertisements_changed', False):
+            self._stale = True
+
+    # Serving
+
+    def _fill_slots(self, response):
+        if (response.status_code != 200 or response.mimetype != 'text/html'
+                or response.is_streamed or request.method != 'GET'):
+            return response
+        body = response.get_data()
+        if b'<!--ad:' not in body:
+            return response
+
+        def fill(match):
+            chosen = self.choose(match.group(1).decode('ascii'))
+            if chosen is None:
+                return match.group(2)
+            ad_id, html = chosen
+            self.record(ad_id, 'impression')
+            return html.encode('utf-8')
+
+        response.set_data(_SLOT_RE.sub(fill, body))
+        return response
+
+    # Background flushing
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork; start one per process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._stopping = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='ad-stats', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.app.config['ADS_FLUSH_INTERVAL']):
+            self.flush()
@@ -0,0 +1,112 @@
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import func, select
+
+from professional_io import EXPORT_FORMATS
+
+EXPORT_FIELDS = [
+    'id', 'created_at', 'action_type', 'target_type', 'target_id',
+    'user_ip', 'user_agent', 'referrer',
+]
+EXPORT_CHUNK_SIZE = 1000
+
+# Action types that can be filtered on, with their labels
+ACTION_TYPES = {
+    'page_view': 'Visitas',
+    'profile_view': 'Perfiles vistos',
+    'search': 'Búsquedas',
+    'contact_click': 'Clics de contacto',
+}
+
+
+def event_filters(start_date=None, end_date=None, actions=None, professional_id=None, after_id=None):
+    """WHERE clauses selecting raw events; dates are inclusive"""
+    from models import Analytics
+
+    filters = []
+    if start_date:
+        filters.append(Analytics.created_at >= datetime.combine(start_date, time.min))
+    if end_date:
+        filters.append(Analytics.created_at < datetime.combine(end_date + timedelta(days=1), time.min))
+    if actions:
+        filters.append(Analytics.action_type.in_(actions))
+    if professional_id is not None:
+        filters.append(Analytics.target_type == 'professional')
+        filters.append(Analytics.target_id == professional_id)
+    if after_id:
+        filters.append(Analytics.id > after_id)
+    return filters
+
+
+def export_events(fmt, filters, limit, next_url):
+    """Run the export query and return a generator of CSV or JSON Lines text.
+
+    The query runs right away, on the caller's connection; rows are then
+    read with ``yield_per`` (a server-side cursor on PostgreSQL) and written
+    out one partition at a time, so memory stays flat for any range.
+    Interned user agents and referrers are resolved back to their text.
+
+    At most ``limit`` events are written. When more match, the last record
+    is a pointer to the rest, ``next_url(last_id)`` resuming after the last
+    event written: ``{"next": url, "after_id": id}`` in JSON Lines, a
+    ``# next: url`` line in CSV. The database reads one row past the
+    chunk to tell, never more.
+    """
+    from app import db
+    from models import Analytics, Referrer, UserAgent
+
+    query = (
+        select(
+            Analytics.id, Analytics.created_at, Analytics.action_type, Analytics.target_type,
+            Analytics.target_id, Analytics.user_ip,
+            func.coalesce(UserAgent.value, Analytics.user_agent).label('user_agent'),
+            func.coalesce(Referrer.value, Analytics.referrer).label('referrer'),
+        )
+        .outerjoin(UserAgent, UserAgent.id == Analytics.user_agent_id)
+        .outerjoin(Referrer, Referrer.id == Analytics.referrer_id)
+        .where(*filters)
+        .order_by(Analytics.id)
+        .limit(limit + 1)
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+    return _write_rows(db.session.execute(query), fmt, limit, next_url)
+
+
+def _write_rows(result, fmt, limit, next_url):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(EXPORT_FIELDS)
+
+    written = 0
+    last_id = None
+    try:
+        for partition in result.partitions():
+            for row in partition:
+                if written == limit:
+                    # The one row read past the chunk, and the last of the result
+                    url = next_url(last_id)
+                    if fmt == 'csv':
+                        buffer.write(f'# next: {url}\r\n')
+                    else:
+                        buffer.write(json.dumps({'next': url, 'after_id': last_id}) + '\n')
+                    break
+                record = dict(row._mapping)
+                record['created_at'] = record['created_at'].isoformat() if record['created_at'] else None
+                if fmt == 'csv':
+                    writer.writerow(['' if record[field] is None else record[field] for field in EXPORT_FIELDS])
+                else:
+                    buffer.write(json.dumps(record, ensure_ascii=False) + '\n')
+                written += 1
+                last_id = record['id']
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    finally:
+        result.close()
+
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,192 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyticsIngestor:
+    """Buffers analytics events in memory and writes them in batches.
+
+    Requests only enqueue a plain dict; a background thread drains the
+    bounded queue and bulk-inserts rows into the ``Analytics`` table when
+    either ``ANALYTICS_BATCH_SIZE`` events are pending or
+    ``ANALYTICS_FLUSH_INTERVAL`` seconds have passed.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._batch_preprocessors = []
+        self._batch_handlers = []
+        self._last_drop_warning = 0.0
+        self.counters = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'backpressured': 0,
+            'failed': 0,
+            'batches': 0,
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ANALYTICS_QUEUE_SIZE', int(os.environ.get('ANALYTICS_QUEUE_SIZE', 10000)))
+        app.config.setdefault('ANALYTICS_BATCH_SIZE', int(os.environ.get('ANALYTICS_BATCH_SIZE', 200)))
+        app.config.setdefault('ANALYTICS_FLUSH_INTERVAL', float(os.environ.get('ANALYTICS_FLUSH_INTERVAL', 2.0)))
+        # How long a request may block waiting for room in a full queue before
+        # the event is dropped. 0 means never block.
+        app.config.setdefault('ANALYTICS_ENQUEUE_TIMEOUT', float(os.environ.get('ANALYTICS_ENQUEUE_TIMEOUT', 0.01)))
+        if self.app is None:
+            atexit.register(self.shutdown)
+        self.app = app
+        self._queue = queue.Queue(maxsize=app.config['ANALYTICS_QUEUE_SIZE'])
+        app.extensions['analytics_ingestor'] = self
+
+    def add_batch_preprocessor(self, preprocessor):
+        """Register ``preprocessor(rows) -> rows`` to transform rows before insert.
+
+        It runs inside the batch transaction and must return new dicts; batch
+        handlers still receive the events as they were tracked.
+        """
+        if preprocessor not in self._batch_preprocessors:
+            self._batch_preprocessors.append(preprocessor)
+        return preprocessor
+
+    def add_batch_handler(self, handler):
+        """Register ``handler(rows)`` to run inside each batch transaction."""
+        if handler not in self._batch_handlers:
+            self._batch_handlers.append(handler)
+        return handler
+
+    def track(self, action_type, target_id=None, target_type=None,
+              user_ip=None, user_agent=None, referrer=None):
+        """Queue an event for insertion. Returns False if it was dropped."""
+        event = {
+            'action_type': action_type,
+            'target_id': target_id,
+            'target_type': target_type,
+            'user_ip': user_ip,
+            'user_agent': user_agent,
+            'referrer': referrer[:500] if referrer else referrer,
+            'created_at': datetime.utcnow(),
+        }
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            timeout = self.app.config['ANALYTICS_ENQUEUE_TIMEOUT']
+            self.counters['backpressured'] += 1
+            try:
+                if timeout <= 0:
+                    raise queue.Full
+                self._queue.put(event, timeout=timeout)
+            except queue.Full:
+                self.counters['dropped'] += 1
+                self._warn_dropped()
+                return False
+        self.counters['enqueued'] += 1
+        return True
+
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['pending'] = self.pending()
+        return stats
+
+    def flush(self):
+        """Synchronously write everything currently queued."""
+        batch_size = self.app.config['ANALYTICS_BATCH_SIZE']
+        while True:
+            batch = []
+            while len(batch) < batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def shutdown(self, timeout=10.0):
+        """Stop the worker and flush any events still in the queue."""
+        if self._queue is None:
+            return
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            thread.join(timeout)
+        self.flush()
+
+    def _ensure_worker(self):
+        # Re-create the worker after a fork: threads do not survive it, so a
+        # pre-forking server would otherwise leave every worker without one.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._stopping = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='analytics-ingest', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        batch_size = self.app.config['ANALYTICS_BATCH_SIZE']
+        interval = self.app.config['ANALYTICS_FLUSH_INTERVAL']
+        while not self._stopping.is_set():
+            batch = []
+            deadline = time.monotonic() + interval
+            while len(batch) < batch_size and not self._stopping.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(remaining, 0.5)))
+                except queue.Empty:
+                    continue
+            if batch:
+                self._write(batch)
+
+    def _write(self, rows):
+        from app import db
+        from models import Analytics
+
+        with self.app.app_context():
+            try:
+                insert_rows = rows
+                for preprocessor in self._batch_preprocessors:
+                    insert_rows = preprocessor(insert_rows)
+                db.session.execute(insert(Analytics), insert_rows)
+                for handler in self._batch_handlers:
+                    handler(rows)
+                db.session.commit()
+                self.counters['written'] += len(rows)
+                self.counters['batches'] += 1
+            except Exception as e:
+                db.session.rollback()
+                self.counters['failed'] += len(rows)
+                logger.error(f"Analytics batch of {len(rows)} events failed: {e}")
+
+    def _warn_dropped(self):
+        now = time.monotonic()
+        if now - self._last_drop_warning >= 60:
+            self._last_drop_warning = now
+            logger.warning(
+                f"Analytics queue full, {self.counters['dropped']} events dropped so far "
+                f"({self.counters['backpressured']} backpressured)"
+            )
@@ -0,0 +1,371 @@
+import hashlib
+import logging
+import re
+import threading
+from datetime import date, datetime, time, timedelta
+from time import monotonic
+
+from sqlalchemy import bindparam, delete, func, inspect, or_, select, text, update
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+# Interned ids already known to exist, keyed by (table, sha256 of value),
+# with the monotonic time they expire at. Other workers cache ids too, so a
+# lookup row is only deleted once it has been unreferenced for longer than
+# any cache entry lives.
+INTERN_CACHE_SIZE = 10000
+INTERN_CACHE_TTL = 600
+LOOKUP_GRACE = timedelta(hours=1)
+_intern_cache = {}
+_intern_lock = threading.Lock()
+
+_PARTITION_RE = re.compile(r'^analytics_p(\d{4})(\d{2})$')
+
+
+def _value_hash(value):
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def ensure_schema():
+    """Add the interning columns and indexes to Analytics and lookup tables
+    created before they existed (``db.create_all`` never alters existing
+    tables)."""
+    from app import db
+
+    inspector = inspect(db.engine)
+    columns = {column['name'] for column in inspector.get_columns('analytics')}
+    with db.engine.begin() as conn:
+        for column, target in (('user_agent_id', 'user_agent'), ('referrer_id', 'referrer')):
+            if column not in columns:
+                conn.execute(text(f"ALTER TABLE analytics ADD COLUMN {column} INTEGER REFERENCES {target}(id)"))
+            if 'orphaned_at' not in {c['name'] for c in inspector.get_columns(target)}:
+                conn.execute(text(f"ALTER TABLE {target} ADD COLUMN orphaned_at TIMESTAMP"))
+        for column in ('created_at', 'user_agent_id', 'referrer_id'):
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_analytics_{column} ON analytics ({column})"))
+
+
+def intern_values(model, values):
+    """Return ``{value: id}`` for ``model`` (UserAgent or Referrer), inserting
+    values that are not in the lookup table yet."""
+    from app import db
+
+    table = model.__tablename__
+    result = {}
+    missing = {}
+    now = monotonic()
+    for value in set(v for v in values if v):
+        value_hash = _value_hash(value)
+        cached = _intern_cache.get((table, value_hash))
+        if cached is not None and cached[1] > now:
+            result[value] = cached[0]
+        else:
+            missing[value_hash] = value
+    if not missing:
+        return result
+
+    found = dict(db.session.execute(
+        select(model.value_hash, model.id).where(model.value_hash.in_(list(missing)))
+    ).all())
+    with _intern_lock:
+        if len(_intern_cache) + len(found) > INTERN_CACHE_SIZE:
+            _intern_cache.clear()
+        # Only committed rows are cached; ids inserted below may still roll back
+        expires_at = now + INTERN_CACHE_TTL
+        _intern_cache.update({(table, value_hash): (id_, expires_at) for value_hash, id_ in found.items()})
+
+    new = [{'value_hash': h, 'value': v} for h, v in missing.items() if h not in found]
+    if new:
+        _insert_ignoring_conflicts(model, new)
+        found.update(db.session.execute(
+            select(model.value_hash, model.id).where(model.value_hash.in_([row['value_hash'] for row in new]))
+        ).all())
+
+    for value_hash, id_ in found.items():
+        result[missing[value_hash]] = id_
+    return result
+
+
+def _insert_ignoring_conflicts(model, rows):
+    # Another worker may intern the same value concurrently
+    from app import db
+
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        db.session.add_all(model(**row) for row in rows)
+        db.session.flush()
+        return
+    db.session.execute(insert(model).on_conflict_do_nothing(index_elements=['value_hash']), rows)
+
+
+def intern_rows(rows):
+    """Batch preprocessor: replace user agent and referrer text with ids"""
+    from models import Referrer, UserAgent
+
+    user_agents = intern_values(UserAgent, [row['user_agent'] for row in rows])
+    referrers = intern_values(Referrer, [row['referrer'] for row in rows])
+    return [
+        dict(
+            row,
+            user_agent=None,
+            referrer=None,
+            user_agent_id=user_agents.get(row['user_agent']),
+            referrer_id=referrers.get(row['referrer']),
+        )
+        for row in rows
+    ]
+
+
+def prune(retention_days, chunk_size=5000, vacuum=False, dry_run=False):
+    """Apply the raw-event retention policy and return a report dict.
+
+    Events older than ``retention_days`` are removed after making sure their
+    days are covered by the daily rollups. Surviving legacy rows get their
+    user agent and referrer text interned. On PostgreSQL, if ``analytics``
+    is range-partitioned by month (``analytics_pYYYYMM``), fully expired
+    partitions are dropped and upcoming ones created; everything else is
+    deleted in ``chunk_size`` batches so locks stay short.
+    """
+    from app import db
+    from models import Analytics
+
+    cutoff = datetime.combine(datetime.utcnow().date() - timedelta(days=retention_days), time.min)
+    report = {
+        'cutoff': cutoff,
+        'dry_run': dry_run,
+        'rollup_days_rebuilt': 0,
+        'rows_interned': 0,
+        'partitions_dropped': 0,
+        'rows_deleted': 0,
+        'lookup_rows_deleted': 0,
+        'bytes_reclaimed': None,
+    }
+
+    if dry_run:
+        report['rows_deleted'] = db.session.query(func.count(Analytics.id)).filter(
+            Analytics.created_at < cutoff
+        ).scalar()
+        return report
+
+    size_before = _storage_bytes()
+    report['rollup_days_rebuilt'] = _compact_uncovered_days(cutoff)
+    report['rows_interned'] = _intern_legacy_rows(cutoff, chunk_size)
+
+    if _is_partitioned():
+        _create_upcoming_partitions()
+        report['partitions_dropped'] = _drop_expired_partitions(cutoff)
+    report['rows_deleted'] = _delete_in_chunks(cutoff, chunk_size)
+    report['lookup_rows_deleted'] = _delete_orphaned_lookups()
+
+    if vacuum:
+        _vacuum()
+    size_after = _storage_bytes()
+    if size_before is not None and size_after is not None:
+        report['bytes_reclaimed'] = max(size_before - size_after, 0)
+    logger.info(f"Analytics retention: {report}")
+    return report
+
+
+def _compact_uncovered_days(cutoff):
+    """Roll up expiring days that have raw events but no rollup rows yet"""
+    from app import db
+    from analytics_rollups import rebuild_rollups
+    from models import Analytics, DailyAnalytics
+
+    day = func.date(Analytics.created_at)
+    raw_days = {
+        value if isinstance(value, date) else date.fromisoformat(value)
+        for (value,) in db.session.query(day).filter(Analytics.created_at < cutoff).distinct()
+    }
+    covered = {
+        value for (value,) in db.session.query(DailyAnalytics.day).filter(
+            DailyAnalytics.day < cutoff.date()
+        ).distinct()
+    }
+    missing = sorted(raw_days - covered)
+    for value in missing:
+        rebuild_rollups(start=value, end=value)
+    return len(missing)
+
+
+def _intern_legacy_rows(cutoff, chunk_size):
+    from app import db
+    from models import Analytics, Referrer, UserAgent
+
+    interned = 0
+    while True:
+        rows = db.session.query(Analytics.id, Analytics.user_agent, Analytics.referrer).filter(
+            Analytics.created_at >= cutoff,
+            or_(Analytics.user_agent.isnot(None), Analytics.referrer.isnot(None))
+        ).order_by(Analytics.id).limit(chunk_size).all()
+        if not rows:
+            return interned
+
+        user_agents = intern_values(UserAgent, [row.user_agent for row in rows])
+        referrers = intern_values(Referrer, [row.referrer for row in rows])
+        db.session.execute(
+            update(Analytics.__table__).where(Analytics.__table__.c.id == bindparam('row_id')).values(
+                user_agent=None,
+                referrer=None,
+                user_agent_id=bindparam('ua_id'),
+                referrer_id=bindparam('ref_id'),
+            ),
+            [
+                {
+                    'row_id': row.id,
+                    'ua_id': user_agents.get(row.user_agent),
+                    'ref_id': referrers.get(row.referrer),
+                }
+                for row in rows
+            ]
+        )
+        db.session.commit()
+        interned += len(rows)
+
+
+def _delete_in_chunks(cutoff, chunk_size):
+    from app import db
+    from models import Analytics
+
+    deleted = 0
+    while True:
+        expired = select(Analytics.id).where(Analytics.created_at < cutoff).order_by(Analytics.id).limit(chunk_size)
+        result = db.session.execute(
+            delete(Analytics).where(Analytics.id.in_(expired)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        deleted += result.rowcount
+        if result.rowcount < chunk_size:
+            return deleted
+
+
+def _delete_orphaned_lookups():
+    """Delete lookup rows found unreferenced by a prune at least
+    ``LOOKUP_GRACE`` ago and still unreferenced; newly unreferenced rows are
+    only marked, as another worker may still have their id cached."""
+    from app import db
+    from models import Analytics, Referrer, UserAgent
+
+    now = datetime.utcnow()
+    deleted = 0
+    for model, column in ((UserAgent, Analytics.user_agent_id), (Referrer, Analytics.referrer_id)):
+        referenced = select(Analytics.id).where(column == model.id).exists()
+        db.session.execute(
+            update(model).where(model.orphaned_at.isnot(None), referenced).values(orphaned_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        result = db.session.execute(
+            delete(model).where(model.orphaned_at < now - LOOKUP_GRACE, ~referenced)
+            .execution_options(synchronize_session=False)
+        )
+        deleted += result.rowcount
+        db.session.execute(
+            update(model).where(model.orphaned_at.is_(None), ~referenced).values(orphaned_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+    with _intern_lock:
+        _intern_cache.clear()
+    return deleted
+
+
+def _dialect():
+    from app import db
+    return db.engine.dialect.name
+
+
+def _is_partitioned():
+    from app import db
+
+    if _dialect() != 'postgresql':
+        return False
+    return db.session.execute(text(
+        "SELECT 1 FROM pg_class WHERE relname = 'analytics' AND relkind = 'p'"
+    )).first() is not None
+
+
+def _partition_names():
+    from app import db
+
+    return [row[0] for row in db.session.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = 'analytics'"
+    ))]
+
+
+def _month_start(year, month):
+    return date(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+def _create_upcoming_partitions(months_ahead=2):
+    from app import db
+
+    today = datetime.utcnow().date()
+    for offset in range(months_ahead + 1):
+        start = _month_start(today.year, today.month + offset)
+        end = _month_start(start.year, start.month + 1)
+        db.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS analytics_p{start:%Y%m} PARTITION OF analytics "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+    db.session.commit()
+
+
+def _drop_expired_partitions(cutoff):
+    from app import db
+
+    dropped = 0
+    for name in _partition_names():
+        match = _PARTITION_RE.match(name)
+        if not match:
+            continue
+        year, month = int(match.group(1)), int(match.group(2))
+        if _month_start(year, month + 1) <= cutoff.date():
+            db.session.execute(text(f"DROP TABLE {name}"))
+            dropped += 1
+    db.session.commit()
+    return dropped
+
+
+def _storage_bytes():
+    """Bytes used by the analytics tables and their indexes, or None if not measurable"""
+    from app import db
+
+    dialect = _dialect()
+    with db.engine.connect() as conn:
+        if dialect == 'sqlite':
+            # Pages of the tables and their indexes; needs SQLite built with
+            # the dbstat virtual table, as Python's bundled one is
+            try:
+                return conn.execute(text(
+                    "SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN "
+                    "(SELECT name FROM sqlite_master "
+                    "WHERE tbl_name IN ('analytics', 'user_agent', 'referrer'))"
+                )).scalar()
+            except OperationalError:
+                return None
+        if dialect == 'postgresql':
+            return conn.execute(text(
+                "SELECT COALESCE(SUM(pg_total_relation_size(c.oid)), 0) FROM pg_class c "
+                "WHERE c.relname IN ('analytics', 'user_agent', 'referrer') "
+                "OR c.oid IN (SELECT inhrelid FROM pg_inherits "
+                "WHERE inhparent = 'analytics'::regclass)"
+            )).scalar()
+    return None
+
+
+def _vacuum():
+    from app import db
+
+    dialect = _dialect()
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if dialect == 'sqlite':
+            conn.execute(text("VACUUM"))
+        elif dialect == 'postgresql':
+            conn.execute(text("VACUUM ANALYZE analytics"))
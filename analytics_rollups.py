@@ -0,0 +1,165 @@
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import delete, func
+
+# Actions shown in the "Visitas Diarias" chart
+VIEW_ACTIONS = ('page_view', 'profile_view')
+
+
+def record_batch(rows):
+    """Fold a batch of raw analytics events into the daily rollup tables.
+
+    Registered as an ``analytics_ingestor`` batch handler, so it runs in the
+    same transaction that inserts the raw events.
+    """
+    from models import DailyAnalytics, ProfessionalDailyAnalytics
+
+    daily = Counter()
+    per_professional = Counter()
+    for row in rows:
+        day = row['created_at'].date()
+        daily[(day, row['action_type'])] += 1
+        if row.get('target_type') == 'professional' and row.get('target_id') is not None:
+            per_professional[(day, row['target_id'], row['action_type'])] += 1
+
+    increment_counts(DailyAnalytics, ('day', 'action_type'), daily)
+    increment_counts(ProfessionalDailyAnalytics, ('day', 'professional_id', 'action_type'), per_professional)
+
+
+def rebuild_rollups(start=None, end=None):
+    """Recompute rollups for ``start``..``end`` (inclusive) from raw events.
+
+    Only needed for events recorded before rollups existed, or after raw
+    rows were fixed by hand; normal ingestion keeps rollups current. By
+    default it covers every day that still has raw events, so days whose raw
+    events were already pruned keep their rollups. The unique visitor
+    sketches of the same days are rebuilt too.
+    """
+    from app import db
+    from models import Analytics, DailyAnalytics, ProfessionalDailyAnalytics
+    from visitor_sketches import rebuild_sketches
+
+    day = func.date(Analytics.created_at)
+    if start is None:
+        first_day = db.session.query(func.min(day)).scalar()
+        if first_day is None:
+            return 0
+        start = _as_date(first_day)
+
+    raw_filters = [Analytics.created_at >= datetime.combine(start, time.min)]
+    rollup_filters = [DailyAnalytics.day >= start]
+    professional_filters = [ProfessionalDailyAnalytics.day >= start]
+    if end is not None:
+        raw_filters.append(Analytics.created_at < datetime.combine(end + timedelta(days=1), time.min))
+        rollup_filters.append(DailyAnalytics.day <= end)
+        professional_filters.append(ProfessionalDailyAnalytics.day <= end)
+
+    daily = Counter({
+        (_as_date(d), action): n
+        for d, action, n in db.session.query(day, Analytics.action_type, func.count(Analytics.id))
+        .filter(*raw_filters)
+        .group_by(day, Analytics.action_type)
+    })
+    per_professional = Counter({
+        (_as_date(d), target_id, action): n
+        for d, target_id, action, n in db.session.query(
+            day, Analytics.target_id, Analytics.action_type, func.count(Analytics.id)
+        ).filter(
+            *raw_filters,
+            Analytics.target_type == 'professional',
+            Analytics.target_id.isnot(None)
+        ).group_by(day, Analytics.target_id, Analytics.action_type)
+    })
+
+    db.session.execute(delete(DailyAnalytics).where(*rollup_filters))
+    db.session.execute(delete(ProfessionalDailyAnalytics).where(*professional_filters))
+    increment_counts(DailyAnalytics, ('day', 'action_type'), daily)
+    increment_counts(ProfessionalDailyAnalytics, ('day', 'professional_id', 'action_type'), per_professional)
+    rebuild_sketches(start, end)
+    db.session.commit()
+    return sum(daily.values())
+
+
+def action_totals(start, end):
+    """Event counts per action type between two dates (inclusive)"""
+    from app import db
+    from models import DailyAnalytics
+
+    rows = db.session.query(
+        DailyAnalytics.action_type, func.sum(DailyAnalytics.count)
+    ).filter(
+        DailyAnalytics.day.between(start, end)
+    ).group_by(DailyAnalytics.action_type).all()
+    return {action: int(total or 0) for action, total in rows}
+
+
+def daily_views(start, end):
+    """Page and profile views per day between two dates (inclusive)"""
+    from app import db
+    from models import DailyAnalytics
+
+    return db.session.query(
+        DailyAnalytics.day.label('date'),
+        func.sum(DailyAnalytics.count).label('views')
+    ).filter(
+        DailyAnalytics.day.between(start, end),
+        DailyAnalytics.action_type.in_(VIEW_ACTIONS)
+    ).group_by(DailyAnalytics.day).order_by(DailyAnalytics.day).all()
+
+
+def popular_professionals(start, end, limit=10):
+    """Most viewed professionals between two dates (inclusive)"""
+    from app import db
+    from models import Professional, ProfessionalDailyAnalytics
+
+    views = func.sum(ProfessionalDailyAnalytics.count)
+    return db.session.query(
+        Professional.id,
+        Professional.name,
+        Professional.specialty,
+        views.label('views')
+    ).join(
+        ProfessionalDailyAnalytics, Professional.id == ProfessionalDailyAnalytics.professional_id
+    ).filter(
+        ProfessionalDailyAnalytics.action_type == 'profile_view',
+        ProfessionalDailyAnalytics.day.between(start, end)
+    ).group_by(
+        Professional.id, Professional.name, Professional.specialty
+    ).order_by(views.desc()).limit(limit).all()
+
+
+def _as_date(value):
+    # func.date() returns a string on SQLite and a date on PostgreSQL
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def increment_counts(model, key_columns, counts):
+    """Add ``counts`` ({key tuple: n}) to ``model.count``, inserting missing keys"""
+    from app import db
+
+    if not counts:
+        return
+    rows = [dict(zip(key_columns, key), count=n) for key, n in counts.items()]
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={'count': model.__table__.c['count'] + stmt.excluded['count']}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        filters = {column: row[column] for column in key_columns}
+        existing = model.query.filter_by(**filters).with_for_update().first()
+        if existing:
+            existing.count += row['count']
+        else:
+            db.session.add(model(**row))
+    db.session.flush()
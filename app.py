@@ -1,75 +1,195 @@
-import os
+import gc
+import json
 import logging
+import logging.config
+import os
+import weakref
 
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
-
-# Configure logging for debug mode
-logging.basicConfig(level=logging.DEBUG)
+from analytics_ingest import AnalyticsIngestor
+from search_index import SearchIndex
+from geo_index import GeoIndex
+from directory_version import DirectoryVersion
+from directory_stats import DirectoryStats
+from page_cache import PageCache
+from assets import AssetPipeline
+from metrics import RequestMetrics
+from rate_limit import RateLimiter
+from autocomplete import AutocompleteIndex
+from facet_index import FacetIndex
+from ad_server import AdServer
+from popularity import PopularityRanking
+from static_site import StaticSite
+from db_routing import DatabaseRouter, RoutingSession
+from async_db import AsyncDatabase
+import analytics_rollups
+import analytics_retention
+import visitor_sketches
 
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+# Extensions are created unbound and attached in create_app()
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
+db_router = DatabaseRouter()
+async_db = AsyncDatabase()
 login_manager = LoginManager()
+analytics_ingestor = AnalyticsIngestor()
+search_index = SearchIndex()
+geo_index = GeoIndex()
+directory_version = DirectoryVersion()
+directory_stats = DirectoryStats()
+page_cache = PageCache()
+asset_pipeline = AssetPipeline()
+request_metrics = RequestMetrics()
+rate_limiter = RateLimiter()
+autocomplete_index = AutocompleteIndex()
+facet_index = FacetIndex()
+ad_server = AdServer()
+popularity_ranking = PopularityRanking()
+static_site = StaticSite()
+
+def create_app(config=None):
+    """Build the application.
+
+    Creating the app does no database I/O: the schema, indexes and default
+    admin are set up by ``flask init-db``, and the search and spatial
+    indexes detect their tables on first use. Workers therefore start
+    without a DB round trip, and a pre-forking server (``gunicorn
+    --preload``) can build the app once in the master and share it
+    copy-on-write with every worker.
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
+
+    # Configure static files
+    app.config['STATIC_FOLDER'] = 'static'
+    app.config['STATIC_URL_PATH'] = '/static'
+
+    # Configure the database
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///salud_valle_uco.db")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    # Optional read replica for the public read path (see db_routing.py)
+    if os.environ.get("DATABASE_REPLICA_URL"):
+        app.config["SQLALCHEMY_BINDS"] = {"replica": os.environ["DATABASE_REPLICA_URL"]}
+
+    # Raw analytics events older than this are pruned by `flask prune-analytics`
+    app.config["ANALYTICS_RETENTION_DAYS"] = int(os.environ.get("ANALYTICS_RETENTION_DAYS", 90))
+    # Largest chunk of raw events returned by one /admin/analytics/export request
+    app.config["ANALYTICS_EXPORT_MAX_ROWS"] = int(os.environ.get("ANALYTICS_EXPORT_MAX_ROWS", 1000000))
+
+    # Reverse proxies in front of the app; each appends the peer it saw to
+    # X-Forwarded-For, so only that many entries from the right are trusted
+    app.config["TRUSTED_PROXIES"] = int(os.environ.get("TRUSTED_PROXIES", 1))
+
+    # LOG_CONFIG names a logging.config.dictConfig JSON file; without it
+    # LOG_LEVEL applies (default DEBUG in debug mode, INFO otherwise)
+    app.config["LOG_CONFIG"] = os.environ.get("LOG_CONFIG")
+    app.config["LOG_LEVEL"] = os.environ.get("LOG_LEVEL")
+
+    if config:
+        app.config.update(config)
+    configure_logging(app)
+    proxies = app.config["TRUSTED_PROXIES"]
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
 
-# Create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# Configure static files
-app.config['STATIC_FOLDER'] = 'static'
-app.config['STATIC_URL_PATH'] = '/static'
-
-# Configure the database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///salud_valle_uco.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-
-# Initialize extensions
-db.init_app(app)
-login_manager.init_app(app)
-login_manager.login_view = 'admin_login'
-login_manager.login_message = 'Por favor inicie sesión para acceder a esta página.'
-login_manager.login_message_category = 'info'
+    # Initialize extensions
+    db.init_app(app)
+    db_router.init_app(app)
+    async_db.init_app(app)
+    login_manager.init_app(app)
+    login_manager.login_view = 'main.admin_login'
+    login_manager.login_message = 'Por favor inicie sesión para acceder a esta página.'
+    login_manager.login_message_category = 'info'
+    analytics_ingestor.init_app(app)
+    analytics_ingestor.add_batch_preprocessor(analytics_retention.intern_rows)
+    analytics_ingestor.add_batch_handler(analytics_rollups.record_batch)
+    analytics_ingestor.add_batch_handler(visitor_sketches.record_batch)
+    popularity_ranking.init_app(app)
+    analytics_ingestor.add_batch_handler(popularity_ranking.record_batch)
+    search_index.init_app(app)
+    geo_index.init_app(app)
+    directory_version.init_app(app)
+    directory_stats.init_app(app, directory_version)
+    page_cache.init_app(app, directory_version)
+    autocomplete_index.init_app(app, directory_version)
+    facet_index.init_app(app, directory_version)
+    ad_server.init_app(app, directory_version)
+    static_site.init_app(app, directory_version)
+    asset_pipeline.init_app(app)
+    rate_limiter.init_app(app)
+    request_metrics.init_app(app)
+    request_metrics.add_collector('analytics_ingest', analytics_ingestor.stats)
+    request_metrics.add_collector('page_cache', page_cache.stats)
+    request_metrics.add_collector('rate_limit', rate_limiter.stats)
+    request_metrics.add_collector('autocomplete', autocomplete_index.stats)
+    request_metrics.add_collector('facets', facet_index.stats)
+    request_metrics.add_collector('db_router', db_router.stats)
+    request_metrics.add_collector('ads', ad_server.stats)
+    request_metrics.add_collector('popularity', popularity_ranking.stats)
+    request_metrics.add_collector('static_site', static_site.stats)
+    request_metrics.add_collector('async_db', async_db.stats)
+
+    from routes import bp
+    import commands
+
+    app.register_blueprint(bp)
+    app.add_template_filter(nl2br_filter, 'nl2br')
+    commands.register(app)
+
+    # Pooled connections must not be shared across a fork
+    _forked_apps.add(app)
+    return app
+
+def configure_logging(app):
+    """Configure logging from LOG_CONFIG or LOG_LEVEL"""
+    if app.config['LOG_CONFIG']:
+        with open(app.config['LOG_CONFIG'], encoding='utf-8') as f:
+            logging.config.dictConfig(json.load(f))
+        return
+    level = (app.config['LOG_LEVEL'] or ('DEBUG' if app.debug else 'INFO')).upper()
+    logging.basicConfig(level=level, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    logging.getLogger().setLevel(level)
+
+def warm_up(app):
+    """Load what workers would otherwise load lazily, then freeze the heap.
+
+    Called in the master of a pre-forking server before it forks: compiled
+    templates are shared by every worker, and ``gc.freeze()`` keeps the
+    collector from touching (and so copying) those pages.
+    """
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    gc.freeze()
+
+# Apps built by create_app, held weakly: a forked child drops the DB
+# connections it inherited from each one still alive
+_forked_apps = weakref.WeakSet()
+
+def _dispose_engines():
+    for app in list(_forked_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+os.register_at_fork(after_in_child=_dispose_engines)
 
 @login_manager.user_loader
 def load_user(user_id):
     from models import Admin
     return Admin.query.get(int(user_id))
 
-with app.app_context():
-    # Import models to ensure tables are created
-    import models
-    db.create_all()
-    
-    # Create default admin user if it doesn't exist
-    from models import Admin
-    from werkzeug.security import generate_password_hash
-    
-    if not Admin.query.first():
-        admin = Admin(
-            username='admin',
-            email='admin@saludvalleuco.com',
-            password_hash=generate_password_hash('admin123')
-        )
-        db.session.add(admin)
-        db.session.commit()
-        print("Admin user created: username=admin, password=admin123")
-
-# Add custom template filters
-@app.template_filter('nl2br')
+# Custom template filters
 def nl2br_filter(s):
     """Convert newlines to <br> tags"""
     if s is None:
         return ''
     return s.replace('\n', '<br>\n')
-
-# Import routes
-import routes
@@ -0,0 +1,10 @@
+# ASGI entry point: `uvicorn asgi:application`, or
+# `gunicorn --preload -k uvicorn_worker.UvicornWorker asgi:application`.
+# Public pages and JSON APIs run as async views; everything else is served
+# by the WSGI app in a thread pool (see async_serving.py).
+from app import create_app
+from async_serving import AsgiApp
+import async_routes
+
+app = create_app()
+application = AsgiApp(app, async_routes.VIEWS)
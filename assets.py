@@ -0,0 +1,344 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import urllib.request
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are written without it
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Application assets, relative to the static folder
+SOURCE_ASSETS = ['css/style.css', 'js/main.js']
+
+# Third-party assets used by the templates: local copy and the CDN URL it is
+# downloaded from (and falls back to until `flask build-assets --vendor` ran)
+VENDOR_ASSETS = {
+    'bootstrap.css': (
+        'vendor/bootstrap/css/bootstrap.min.css',
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    ),
+    'bootstrap.js': (
+        'vendor/bootstrap/js/bootstrap.bundle.min.js',
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    ),
+    'fontawesome.css': (
+        'vendor/fontawesome/css/all.min.css',
+        'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+    ),
+    'chart.js': (
+        'vendor/chartjs/chart.umd.js',
+        'https://cdn.jsdelivr.net/npm/chart.js',
+    ),
+}
+
+# Files referenced from vendored stylesheets rather than from templates
+VENDOR_SUPPORT_FILES = {
+    f'vendor/fontawesome/webfonts/{name}.{ext}':
+        f'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/webfonts/{name}.{ext}'
+    for name in ('fa-brands-400', 'fa-regular-400', 'fa-solid-900', 'fa-v4compatibility')
+    for ext in ('woff2', 'ttf')
+}
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ttf', '.json')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+_CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def minify_css(source):
+    """Strip comments and redundant whitespace from a stylesheet"""
+    out = []
+    i, n = 0, len(source)
+    pending_space = False
+    while i < n:
+        c = source[i]
+        if c in '"\'':
+            end = i + 1
+            while end < n and source[end] != c:
+                end += 2 if source[end] == '\\' else 1
+            if pending_space and out and out[-1] not in '{};,>(':
+                out.append(' ')
+            pending_space = False
+            out.append(source[i:end + 1])
+            i = end + 1
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            pending_space = pending_space or bool(out)
+        elif c.isspace():
+            pending_space = bool(out)
+            i += 1
+        else:
+            if c in '{};,>)':
+                pending_space = False
+                if c == '}' and out and out[-1] == ';':
+                    out.pop()
+            elif pending_space and out and out[-1] not in '{};,>(:':
+                out.append(' ')
+            pending_space = False
+            out.append(c)
+            i += 1
+    return ''.join(out)
+
+
+_JS_REGEX_PREFIX = set('(,=:[!&|?{};+-*%<>~^')
+_JS_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'delete', 'throw'}
+_JS_TRAILING_WORD_RE = re.compile(r'([A-Za-z_$][\w$]*)$')
+_JS_NO_SPACE_AROUND = set('{}()[];,=:<>!&|?+-*/%^~.')
+
+
+def minify_js(source):
+    """Strip comments and collapse whitespace in a script.
+
+    Conservative by design: newlines between statements are kept so
+    automatic semicolon insertion behaves exactly as in the source, and
+    string, template and regex literals are copied verbatim.
+    """
+    out = []
+    i, n = 0, len(source)
+    pending = ''  # whitespace seen since the last token: '', ' ' or '\n'
+
+    def regex_allowed():
+        # A slash starts a regex literal unless it follows an operand
+        tail = ''.join(out[-16:]).rstrip()
+        if not tail or tail[-1] in _JS_REGEX_PREFIX:
+            return True
+        word = _JS_TRAILING_WORD_RE.search(tail)
+        return bool(word) and word.group(1) in _JS_REGEX_KEYWORDS
+
+    def emit_separator(next_char):
+        nonlocal pending
+        if pending and out:
+            prev = out[-1][-1]
+            if pending == '\n':
+                out.append('\n')
+            elif not (prev in _JS_NO_SPACE_AROUND or next_char in _JS_NO_SPACE_AROUND) \
+                    or (prev in '+-' and next_char in '+-'):
+                out.append(' ')
+        pending = ''
+
+    while i < n:
+        c = source[i]
+        if c in '"\'`':
+            emit_separator(c)
+            end = i + 1
+            while end < n and source[end] != c:
+                end += 2 if source[end] == '\\' else 1
+            out.append(source[i:end + 1])
+            i = end + 1
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end == -1 else end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            pending = pending or ' '
+        elif c == '/' and regex_allowed():
+            emit_separator(c)
+            end = i + 1
+            in_class = False
+            while end < n and (source[end] != '/' or in_class):
+                if source[end] == '\\':
+                    end += 1
+                elif source[end] == '[':
+                    in_class = True
+                elif source[end] == ']':
+                    in_class = False
+                end += 1
+            end += 1
+            while end < n and source[end].isalpha():
+                end += 1
+            out.append(source[i:end])
+            i = end
+        elif c.isspace():
+            if c == '\n' or pending == '\n':
+                pending = '\n'
+            else:
+                pending = ' '
+            i += 1
+        else:
+            emit_separator(c)
+            out.append(c)
+            i += 1
+    return ''.join(out).strip() + '\n'
+
+
+class AssetPipeline:
+    """Fingerprinted, precompressed static assets.
+
+    ``flask build-assets`` minifies the application assets, copies vendored
+    third-party files, writes content-hashed copies under ``static/dist``
+    with ``.gz`` (and ``.br`` when brotli is installed) variants, and a
+    manifest. ``url_for('static', ...)`` then emits the hashed names, which
+    are served with far-future immutable caching and the best encoding the
+    client accepts. Without a build everything keeps working unhashed.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.manifest = {}
+        self.encodings = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['assets'] = self
+        self.load_manifest()
+        app.url_defaults(self._hashed_static_url)
+        app.view_functions['static'] = self._serve_static
+        app.add_template_global(self.vendor_url)
+
+    @property
+    def static_folder(self):
+        return self.app.static_folder
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.static_folder, DIST_DIR, MANIFEST_NAME)
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        self.manifest = data.get('assets', {})
+        self.encodings = data.get('encodings', {})
+        self._immutable = set(self.manifest.values())
+
+    def vendor_url(self, name):
+        """URL of a vendored library: the local copy if present, else its CDN"""
+        local, cdn = VENDOR_ASSETS[name]
+        if local in self.manifest or os.path.exists(os.path.join(self.static_folder, local)):
+            return url_for('static', filename=local)
+        return cdn
+
+    def vendor(self):
+        """Download the third-party assets into static/vendor"""
+        downloaded = []
+        sources = {local: cdn for local, cdn in VENDOR_ASSETS.values()}
+        sources.update(VENDOR_SUPPORT_FILES)
+        for local, url in sources.items():
+            target = os.path.join(self.static_folder, local)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with urllib.request.urlopen(url, timeout=30) as response, open(target, 'wb') as f:
+                shutil.copyfileobj(response, f)
+            downloaded.append(local)
+        return downloaded
+
+    def build(self):
+        """Write hashed, minified and precompressed assets plus the manifest.
+
+        Returns ``[(logical_path, hashed_path, size, {encoding: size})]``.
+        """
+        dist = os.path.join(self.static_folder, DIST_DIR)
+        shutil.rmtree(dist, ignore_errors=True)
+
+        # Files referenced from stylesheets go first so url() can be rewritten
+        support = [path for path in VENDOR_SUPPORT_FILES if self._exists(path)]
+        vendored = [local for local, _ in VENDOR_ASSETS.values() if self._exists(local)]
+        manifest = {}
+        encodings = {}
+        report = []
+        for logical in support + vendored + SOURCE_ASSETS:
+            with open(os.path.join(self.static_folder, logical), 'rb') as f:
+                content = f.read()
+            if logical.endswith('.css'):
+                text = content.decode('utf-8')
+                if not logical.endswith('.min.css'):
+                    text = minify_css(text)
+                content = self._rewrite_css_urls(text, logical, manifest).encode('utf-8')
+            elif logical.endswith('.js') and not logical.endswith('.min.js') and logical in SOURCE_ASSETS:
+                content = minify_js(content.decode('utf-8')).encode('utf-8')
+
+            digest = hashlib.sha256(content).hexdigest()[:12]
+            stem, ext = posixpath.splitext(logical)
+            hashed = f'{DIST_DIR}/{stem}.{digest}{ext}'
+            target = os.path.join(self.static_folder, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(content)
+
+            variants = {}
+            if ext in COMPRESSIBLE:
+                compressed = {'gzip': ('.gz', gzip.compress(content, 9, mtime=0))}
+                if brotli is not None:
+                    compressed['br'] = ('.br', brotli.compress(content))
+                for encoding, (suffix, data) in compressed.items():
+                    if len(data) < len(content):
+                        variants[encoding] = self._write_variant(target + suffix, data)
+            manifest[logical] = hashed
+            encodings[hashed] = sorted(variants)
+            report.append((logical, hashed, len(content), variants))
+
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({'assets': manifest, 'encodings': encodings}, f, indent=2, sort_keys=True)
+        self.load_manifest()
+        return report
+
+    def _exists(self, path):
+        return os.path.exists(os.path.join(self.static_folder, path))
+
+    @staticmethod
+    def _write_variant(path, data):
+        with open(path, 'wb') as f:
+            f.write(data)
+        return len(data)
+
+    @staticmethod
+    def _rewrite_css_urls(text, logical, manifest):
+        base = posixpath.dirname(logical)
+        hashed_base = posixpath.dirname(f'{DIST_DIR}/{logical}')
+
+        def replace(match):
+            quote, ref = match.group(1), match.group(2)
+            if ref.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+                return match.group(0)
+            path, sep, suffix = re.match(r'([^?#]*)([?#]?)(.*)', ref).groups()
+            target = manifest.get(posixpath.normpath(posixpath.join(base, path)))
+            if target is None:
+                return match.group(0)
+            return f'url({quote}{posixpath.relpath(target, hashed_base)}{sep}{suffix}{quote})'
+
+        return _CSS_URL_RE.sub(replace, text)
+
+    def _hashed_static_url(self, endpoint, values):
+        if endpoint != 'static' or current_app.debug:
+            return
+        hashed = self.manifest.get(values.get('filename'))
+        if hashed:
+            values['filename'] = hashed
+
+    def _serve_static(self, filename):
+        if filename not in self._immutable:
+            return self.app.send_static_file(filename)
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        accepted = request.accept_encodings
+        response = None
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if encoding in self.encodings.get(filename, ()) and accepted[encoding]:
+                response = send_from_directory(self.static_folder, filename + suffix,
+                                               mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+                response.headers['Content-Encoding'] = encoding
+                break
+        if response is None:
+            response = send_from_directory(self.static_folder, filename,
+                                           mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
@@ -0,0 +1,99 @@
+import os
+
+from flask import g, has_request_context
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from db_routing import REPLICA_BIND
+
+# Async driver for each backend of DATABASE_URL
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg',
+}
+
+
+def async_url(url):
+    """The URL of the same database through its async driver"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for {backend}; set ASYNC_DATABASE_URL")
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    # asyncpg spells libpq's sslmode as ssl
+    if 'sslmode' in url.query:
+        url = url.update_query_dict({'ssl': url.query['sslmode']}).difference_update_query(['sslmode'])
+    return url
+
+
+class AsyncDatabase:
+    """Async SQLAlchemy engines for the async views served by ``asgi.py``.
+
+    The engines reach the databases of ``DATABASE_URL`` and the optional
+    replica bind through their async drivers (aiosqlite, asyncpg), or
+    ``ASYNC_DATABASE_URL`` for the primary when set. They are created on
+    first use, so the sync app never opens them. Each holds up to
+    ``ASYNC_DB_POOL_SIZE`` connections shared by all the requests a worker
+    has in flight; a request waiting on one does not hold a thread.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._engines = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASYNC_DATABASE_URL', os.environ.get('ASYNC_DATABASE_URL'))
+        app.config.setdefault('ASYNC_DB_POOL_SIZE', int(os.environ.get('ASYNC_DB_POOL_SIZE', 10)))
+        self.app = app
+        self._engines = {}
+        app.extensions['async_db'] = self
+
+    def engine(self, bind=None):
+        engine = self._engines.get(bind)
+        if engine is None:
+            engine = self._engines[bind] = self._create_engine(bind)
+        return engine
+
+    def session(self):
+        """A new ``AsyncSession``, for ``async with async_db.session() as session``.
+
+        In views decorated with ``db_router.replica_reads`` it reads from the
+        replica, like ``db.session`` does.
+        """
+        bind = None
+        if (has_request_context() and g.get('db_replica') and not g.get('db_wrote')
+                and REPLICA_BIND in (self.app.config.get('SQLALCHEMY_BINDS') or {})):
+            g.db_replica_used = True
+            bind = REPLICA_BIND
+        return AsyncSession(self.engine(bind), expire_on_commit=False)
+
+    async def dispose(self):
+        engines, self._engines = self._engines, {}
+        for engine in engines.values():
+            await engine.dispose()
+
+    def stats(self):
+        return {
+            'engines': len(self._engines),
+            'connections_in_use': sum(getattr(engine.pool, 'checkedout', lambda: 0)()
+                                      for engine in self._engines.values()),
+        }
+
+    def _create_engine(self, bind):
+        from app import db
+
+        config = self.app.config
+        if bind is None and config['ASYNC_DATABASE_URL']:
+            url = make_url(config['ASYNC_DATABASE_URL'])
+        else:
+            # Start from the sync engine's URL, which has Flask-SQLAlchemy's
+            # defaults applied (relative SQLite paths are in the instance folder)
+            with self.app.app_context():
+                url = async_url(db.engines[bind].url)
+        options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        if url.database not in (None, '', ':memory:'):
+            options['pool_size'] = config['ASYNC_DB_POOL_SIZE']
+        return create_async_engine(url, **options)
@@ -0,0 +1,166 @@
+import asyncio
+
+from flask import abort, jsonify, render_template, request
+from sqlalchemy import select
+
+import routes
+from app import async_db, db_router, facet_index, geo_index, page_cache, rate_limiter
+from forms import SearchForm
+from models import Professional
+from pagination import InvalidCursor, split_page
+from routes import (
+    SEARCH_PAGE_SIZE, filter_professionals, get_api_limit, get_point_args,
+    get_search_args, get_sort_arg, nearby_results, professional_result, quick_categories, render_search_results,
+    search_statement, track_analytics,
+)
+
+# Flask endpoint -> async view, for the requests asgi.py serves on the event loop.
+# Each view mirrors the sync one in routes.py and shares its helpers; those
+# that may block (analytics backpressure, in-memory indexes syncing from the
+# database) run in the default executor, which keeps the Flask contexts.
+VIEWS = {}
+
+
+def view(endpoint):
+    def decorator(f):
+        VIEWS[endpoint] = f
+        return f
+    return decorator
+
+
+async def search_professionals(session, query, specialty, location, available_only, cursor=None,
+                               per_page=SEARCH_PAGE_SIZE, sort='relevance'):
+    statement, key = search_statement(query, specialty, location, available_only, cursor, per_page, sort)
+    rows, next_cursor = split_page((await session.execute(statement)).all(), key, per_page)
+    return [row[0] for row in rows], next_cursor
+
+
+@view('main.index')
+@db_router.replica_reads
+async def index():
+    """Homepage with search and quick access categories"""
+    response = await page_cache.serve_async(render_index)
+    await asyncio.to_thread(track_analytics, 'page_view', target_type='homepage')
+    return response
+
+
+async def render_index():
+    counts = await asyncio.to_thread(facet_index.facet_counts, 'specialty', available_only=True)
+    async with async_db.session() as session:
+        featured_professionals = (await session.execute(
+            select(Professional).where(Professional.available.is_(True))
+            .order_by(Professional.popularity.desc(), Professional.id).limit(6)
+        )).scalars().all()
+
+    return render_template('index.html',
+                           form=SearchForm(),
+                           quick_categories=quick_categories(counts),
+                           featured_professionals=featured_professionals)
+
+
+@view('main.search')
+@rate_limiter.limit('search')
+@db_router.replica_reads
+async def search():
+    """Search professionals with filters"""
+    query, specialty, location, available_only = get_search_args()
+    sort = get_sort_arg()
+    cursor = request.args.get('cursor') or None
+
+    response = await page_cache.serve_async(
+        lambda: render_search(query, specialty, location, available_only, cursor, sort)
+    )
+    if (query or specialty or location) and not cursor:
+        await asyncio.to_thread(track_analytics, 'search', target_type='search')
+    return response
+
+
+async def render_search(query, specialty, location, available_only, cursor, sort):
+    async with async_db.session() as session:
+        try:
+            professionals, next_cursor = await search_professionals(
+                session, query, specialty, location, available_only, cursor=cursor, sort=sort
+            )
+        except InvalidCursor:
+            professionals, next_cursor = await search_professionals(
+                session, query, specialty, location, available_only, sort=sort
+            )
+
+    # The dropdown counts come from the facet index, which may sync first
+    return await asyncio.to_thread(
+        render_search_results, professionals, next_cursor, query, specialty, location, available_only, sort
+    )
+
+
+@view('main.api_search')
+@rate_limiter.limit('api')
+async def api_search():
+    """JSON search results, one keyset page at a time"""
+    query, specialty, location, available_only = get_search_args()
+    cursor = request.args.get('cursor') or None
+    limit = get_api_limit()
+
+    if (query or specialty or location) and not cursor:
+        await asyncio.to_thread(track_analytics, 'search', target_type='search')
+
+    try:
+        async with async_db.session() as session:
+            professionals, next_cursor = await search_professionals(
+                session, query, specialty, location, available_only, cursor=cursor, per_page=limit,
+                sort=get_sort_arg()
+            )
+    except InvalidCursor:
+        return jsonify({'error': 'Cursor inválido'}), 400
+
+    results = [professional_result(professional) for professional in professionals]
+    return jsonify({'results': results, 'next_cursor': next_cursor})
+
+
+@view('main.api_autocomplete')
+async def api_autocomplete():
+    """Search box suggestions; served from memory, so the sync view is reused
+    (in the executor: the index re-reads changed rows after admin edits)"""
+    return await asyncio.to_thread(routes.api_autocomplete)
+
+
+@view('main.api_nearby')
+@rate_limiter.limit('api')
+async def api_nearby():
+    """Professionals closest to a point, sorted by distance"""
+    point = get_point_args()
+    if point is None:
+        return jsonify({'error': 'Coordenadas inválidas'}), 400
+
+    lat, lng, radius_km = point
+    limit = get_api_limit()
+    _, specialty, location, available_only = get_search_args()
+
+    await asyncio.to_thread(track_analytics, 'search', target_type='search')
+
+    statement = filter_professionals(select(Professional), specialty, location, available_only)
+    async with async_db.session() as session:
+        nearby = await geo_index.nearby_async(session, statement, lat, lng, radius_km, limit)
+    return jsonify({'results': nearby_results(nearby), 'radius_km': radius_km})
+
+
+@view('main.professional_detail')
+@db_router.replica_reads
+async def professional_detail(professional_id):
+    """Individual professional profile page"""
+    response = await page_cache.serve_async(lambda: render_professional(professional_id))
+
+    # Track profile view (only reached if the profile exists)
+    await asyncio.to_thread(track_analytics, 'profile_view', target_id=professional_id, target_type='professional')
+
+    return response
+
+
+async def render_professional(professional_id):
+    async with async_db.session() as session:
+        professional = (await session.execute(
+            select(Professional).filter_by(id=professional_id, available=True)
+        )).scalar_one_or_none()
+    if professional is None:
+        abort(404)
+    html = render_template('professional.html', professional=professional)
+    return html, professional.updated_at
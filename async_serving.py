@@ -0,0 +1,189 @@
+import asyncio
+import copy
+import io
+import logging
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import request, request_started
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_cookie
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+logger = logging.getLogger(__name__)
+
+
+def build_environ(scope, body=b''):
+    """WSGI environ for an ASGI HTTP request"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': client[1],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        value = value.decode('latin-1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class AsgiApp:
+    """ASGI application serving the Flask ``app`` with async views.
+
+    Anonymous GET and HEAD requests (no session cookie) for an endpoint in
+    ``views`` run the async view on the event loop, inside a regular Flask
+    request context: request hooks, the page cache, rate limiting, error
+    handlers and templates work as in the sync app, while queries go
+    through ``async_db`` and waiting on them does not hold a thread.
+    Every other request, including all admin pages and anything with a
+    session cookie (which may need the user loader, or the primary after a
+    write), is passed to the WSGI app in a thread pool.
+    """
+
+    def __init__(self, app, views):
+        self.flask_app = app
+        self.views = views
+        self.wsgi = WsgiToAsgi(app)
+        self.counters = {'async_requests': 0, 'wsgi_requests': 0}
+        self._urls = app.url_map.bind('localhost')
+        # ProxyFix wraps app.wsgi_app; apply its environ rewriting on the
+        # async path too, with the app call swapped out
+        self._proxy_fix = None
+        if isinstance(app.wsgi_app, ProxyFix):
+            self._proxy_fix = copy.copy(app.wsgi_app)
+            self._proxy_fix.app = lambda environ, start_response: environ
+        app.extensions['asgi'] = self
+        metrics = app.extensions.get('request_metrics')
+        if metrics is not None:
+            metrics.add_collector('asgi', self.stats)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        view = self._async_view(scope) if scope['type'] == 'http' else None
+        if view is None:
+            self.counters['wsgi_requests'] += 1
+            return await self.wsgi(scope, receive, send)
+        self.counters['async_requests'] += 1
+        await self._serve(view, scope, send)
+
+    def stats(self):
+        return dict(self.counters)
+
+    def _async_view(self, scope):
+        if scope['method'] not in ('GET', 'HEAD'):
+            return None
+        cookie_name = self.flask_app.config['SESSION_COOKIE_NAME']
+        for name, value in scope['headers']:
+            if name == b'cookie' and cookie_name in parse_cookie(value.decode('latin-1')):
+                return None
+        root_path, path = scope.get('root_path', ''), scope['path']
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        try:
+            endpoint, _ = self._urls.match(path, method=scope['method'])
+        except HTTPException:
+            return None
+        return self.views.get(endpoint)
+
+    async def _serve(self, view, scope, send):
+        app = self.flask_app
+        environ = build_environ(scope)
+        if self._proxy_fix is not None:
+            environ = self._proxy_fix(environ, None)
+
+        # The same steps as Flask.wsgi_app and full_dispatch_request, with
+        # the view awaited
+        ctx = app.request_context(environ)
+        error = None
+        try:
+            try:
+                ctx.push()
+                response = await self._dispatch(view)
+            except Exception as e:
+                error = e
+                response = app.handle_exception(e)
+            app_iter, status, headers = response.get_wsgi_response(environ)
+            try:
+                body = b''.join(app_iter)
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+        finally:
+            if error is not None and app.should_ignore_error(error):
+                error = None
+            ctx.pop(error)
+
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _dispatch(self, view):
+        app = self.flask_app
+        try:
+            request_started.send(app, _async_wrapper=app.ensure_sync)
+            # Request hooks are sync and some query the database (the ad
+            # server reloading its ads after_request), so they run in the
+            # default executor, which keeps the Flask contexts
+            rv = await asyncio.to_thread(app.preprocess_request)
+            if rv is None:
+                rv = await view(**request.view_args)
+        except Exception as e:
+            rv = app.handle_user_exception(e)
+        return await asyncio.to_thread(app.finalize_request, rv)
+
+    async def _lifespan(self, receive, send):
+        from app import async_db
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    self._warm_up()
+                except Exception as e:
+                    logger.error(f"ASGI startup failed: {e}")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_db.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _warm_up(self):
+        # Do the blocking first-use work before the event loop serves
+        # anything: load the async driver and detect the search indexes
+        from app import async_db, geo_index, search_index
+
+        with self.flask_app.app_context():
+            async_db.engine()
+            search_index.available
+            geo_index.rtree
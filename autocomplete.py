@@ -0,0 +1,160 @@
+import os
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from search_index import tokenize
+
+
+def prefix_keys(text):
+    """Accent-folded keys for every word start of ``text``, so "Juan Pérez"
+    is found by "jua", "juan p" and "per" """
+    terms = tokenize(text)
+    return {' '.join(terms[i:]) for i in range(len(terms))}
+
+
+def _scan(keys, prefix, limit):
+    """Refs of the first ``limit`` distinct entries whose key starts with ``prefix``"""
+    refs = []
+    i = bisect_left(keys, (prefix,))
+    while i < len(keys) and len(refs) < limit:
+        key, ref = keys[i]
+        if not key.startswith(prefix):
+            break
+        if ref not in refs:
+            refs.append(ref)
+        i += 1
+    return refs
+
+
+class AutocompleteIndex:
+    """In-memory prefix index for the search box.
+
+    Specialties, locations and the names of available professionals are
+    kept as sorted ``(key, ref)`` lists searched with ``bisect``, so a
+    lookup costs a binary search plus a short scan and never queries the
+    database. The index is loaded on first use and follows the directory
+    version: when it changes (in this worker or another), only rows updated
+    since the previous sync are re-read and applied, with a full reload
+    when rows disappeared or a bulk write touched a large part of it.
+    """
+
+    # Window re-read on each sync, covering transactions that committed
+    # after the previous sync but were stamped before it
+    SYNC_OVERLAP = timedelta(seconds=60)
+
+    def __init__(self, app=None, directory_version=None):
+        self.app = None
+        self.directory_version = directory_version
+        self._lock = threading.Lock()
+        self._terms = []
+        self._term_labels = {}
+        self._keys = []
+        self._names = {}
+        self._version = None
+        self._synced_at = None
+        self.counters = {'lookups': 0, 'syncs': 0, 'full_loads': 0}
+        if app is not None:
+            self.init_app(app, directory_version)
+
+    def init_app(self, app, directory_version=None):
+        from models import LOCATIONS, SPECIALTIES
+
+        app.config.setdefault('AUTOCOMPLETE_LIMIT', int(os.environ.get('AUTOCOMPLETE_LIMIT', 8)))
+        if directory_version is not None:
+            self.directory_version = directory_version
+        self.app = app
+        app.extensions['autocomplete'] = self
+
+        terms = [('specialty', s) for s in SPECIALTIES] + [('location', l) for l in LOCATIONS]
+        self._term_labels = dict(enumerate(terms))
+        self._terms = sorted((key, ref) for ref, (_, label) in self._term_labels.items()
+                             for key in prefix_keys(label))
+
+    def stats(self):
+        return {**self.counters, 'professionals': len(self._names), 'keys': len(self._keys)}
+
+    def suggest(self, query, limit=None):
+        """Suggestions for ``query``: specialties and locations first, then
+        professionals, each ``{'type', 'label'}`` plus ``'id'`` for professionals"""
+        prefix = ' '.join(tokenize(query))
+        if not prefix:
+            return []
+        limit = limit or self.app.config['AUTOCOMPLETE_LIMIT']
+        self._sync()
+        self.counters['lookups'] += 1
+
+        suggestions = []
+        for ref in _scan(self._terms, prefix, limit):
+            kind, label = self._term_labels[ref]
+            suggestions.append({'type': kind, 'label': label})
+        with self._lock:
+            refs = _scan(self._keys, prefix, limit - len(suggestions))
+            names = [self._names.get(ref) for ref in refs]
+        suggestions.extend(
+            {'type': 'professional', 'label': name, 'id': ref}
+            for ref, name in zip(refs, names) if name is not None
+        )
+        return suggestions
+
+    def _sync(self):
+        version = self.directory_version.current()[0]
+        if version == self._version:
+            return
+        from app import db
+        from models import Professional
+
+        started = datetime.utcnow()
+        with self._lock:
+            if version == self._version:
+                return
+            if self._synced_at is None:
+                self._load(db.session.execute(
+                    select(Professional.id, Professional.name).where(Professional.available.is_(True))
+                ).all())
+            else:
+                changed = db.session.execute(
+                    select(Professional.id, Professional.name, Professional.available)
+                    .where(Professional.updated_at >= self._synced_at - self.SYNC_OVERLAP)
+                ).all()
+                self._apply(changed)
+                total = db.session.execute(
+                    select(func.count(Professional.id)).where(Professional.available.is_(True))
+                ).scalar()
+                # Deleted rows leave no trace to sync from
+                if total != len(self._names):
+                    self._load(db.session.execute(
+                        select(Professional.id, Professional.name).where(Professional.available.is_(True))
+                    ).all())
+            self._version = version
+            self._synced_at = started
+            self.counters['syncs'] += 1
+
+    def _load(self, rows):
+        self._names = {pid: name for pid, name in rows}
+        self._keys = sorted((key, pid) for pid, name in self._names.items() for key in prefix_keys(name))
+        self.counters['full_loads'] += 1
+
+    def _apply(self, rows):
+        updates = {pid: name if available else None for pid, name, available in rows
+                   if self._names.get(pid) != (name if available else None)}
+        if not updates:
+            return
+        # Inserting into a sorted list is linear, so large batches re-sort instead
+        if len(updates) > max(100, len(self._names) // 20):
+            names = {**self._names, **updates}
+            self._load([(pid, name) for pid, name in names.items() if name is not None])
+            return
+        for pid, name in updates.items():
+            old = self._names.pop(pid, None)
+            if old is not None:
+                for key in prefix_keys(old):
+                    i = bisect_left(self._keys, (key, pid))
+                    if i < len(self._keys) and self._keys[i] == (key, pid):
+                        del self._keys[i]
+            if name is not None:
+                self._names[pid] = name
+                for key in prefix_keys(name):
+                    insort(self._keys, (key, pid))
@@ -0,0 +1,410 @@
+import inspect
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import Engine
+from werkzeug.serving import make_server
+
+# A latency or query count this much above the baseline is a regression
+DEFAULT_THRESHOLD = 0.2
+
+# Sent by every client, so requests count as visits and not as bot traffic
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0'
+
+
+def default_endpoints():
+    """``(name, paths, admin)`` for the pages worth tracking.
+
+    Search and profile pages cycle through several URLs so a benchmark does
+    not measure a single cached row. Must run inside an app context.
+    """
+    from app import db
+    from models import LOCATIONS, SPECIALTIES, Professional
+
+    # The first available profile at ten evenly spaced points of the id range
+    max_id = db.session.execute(select(func.max(Professional.id))).scalar() or 1
+    profile_ids = set()
+    for i in range(10):
+        profile_id = db.session.execute(select(func.min(Professional.id)).where(
+            Professional.available.is_(True), Professional.id >= max_id * i // 10
+        )).scalar()
+        if profile_id is not None:
+            profile_ids.add(profile_id)
+    return [
+        ('index', ['/'], False),
+        ('search_text', [
+            '/buscar?' + urlencode({'query': q}) for q in ('gonzalez', 'pediatria', 'maria', 'lopez')
+        ], False),
+        ('search_filters', [
+            '/buscar?' + urlencode({'specialty': specialty, 'location': location})
+            for specialty in SPECIALTIES[:4] for location in LOCATIONS
+        ], False),
+        ('professional_detail', [f'/profesional/{pid}' for pid in sorted(profile_ids)] or ['/profesional/1'], False),
+        ('admin_dashboard', ['/admin'], True),
+        ('admin_analytics', ['/admin/analytics'], True),
+    ]
+
+
+def serving_endpoints():
+    """A single endpoint cycling through the anonymous pages of
+    ``default_endpoints`` and the JSON search API, the requests the
+    async server runs as async views"""
+    paths = []
+    for name, endpoint_paths, admin in default_endpoints():
+        if not admin:
+            paths.extend(endpoint_paths)
+    paths.extend('/api/buscar?' + urlencode({'query': q}) for q in ('gonzalez', 'pediatria', 'maria', 'lopez'))
+    return [('public', paths, False)]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class QueryCounter:
+    """Counts SQL statements executed on an engine while active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+class InProcessClient:
+    """Drives the app through the Flask test client, one client per thread"""
+
+    counts_queries = True
+
+    def __init__(self, app, admin_id):
+        self.app = app
+        self.admin_id = admin_id
+        self._local = threading.local()
+
+    def _client(self, admin):
+        key = 'admin' if admin else 'anonymous'
+        client = getattr(self._local, key, None)
+        if client is None:
+            client = self.app.test_client()
+            client.environ_base['HTTP_USER_AGENT'] = USER_AGENT
+            if admin:
+                with client.session_transaction() as session:
+                    session['_user_id'] = str(self.admin_id)
+                    session['_fresh'] = True
+            setattr(self._local, key, client)
+        return client
+
+    def get(self, path, admin):
+        response = self._client(admin).get(path)
+        response.close()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class HttpClient:
+    """Drives a real WSGI server over HTTP.
+
+    Without ``base_url`` the app is served by a threaded Werkzeug server on
+    an ephemeral port in this process, so SQL queries can still be counted.
+    With ``base_url`` (e.g. a gunicorn started separately with the same
+    ``SESSION_SECRET``) only latency and throughput are measured.
+    """
+
+    def __init__(self, app, admin_id, base_url=None):
+        self.server = None
+        self.counts_queries = base_url is None
+        if base_url is None:
+            self.server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+            base_url = f'http://127.0.0.1:{self.server.server_port}'
+        self.base_url = base_url.rstrip('/')
+        self.admin_cookie = None
+        if admin_id is None:
+            return
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(admin_id)
+            session['_fresh'] = True
+        cookie = client.get_cookie(app.config.get('SESSION_COOKIE_NAME', 'session'))
+        self.admin_cookie = f'{cookie.key}={cookie.value}'
+
+    def get(self, path, admin):
+        request = urllib.request.Request(self.base_url + path, headers={'User-Agent': USER_AGENT})
+        if admin:
+            request.add_header('Cookie', self.admin_cookie)
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+
+class ServerProcess:
+    """The app under gunicorn in a child process, for comparing servers.
+
+    ``wsgi`` uses the default sync workers (one request at a time each) as
+    deployed today; ``asgi`` runs ``asgi:application`` on uvicorn workers.
+    Both preload the app, so their memory is comparable.
+    """
+
+    ARGS = {
+        'wsgi': ['main:app'],
+        'asgi': ['--worker-class', 'uvicorn_worker.UvicornWorker', 'asgi:application'],
+    }
+
+    def __init__(self, kind, workers, cwd, env=None):
+        self.kind = kind
+        self.workers = workers
+        self.cwd = cwd
+        self.env = env
+        self.process = None
+        self.base_url = None
+        self._log = None
+
+    def start(self, timeout=60):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        self.base_url = f'http://127.0.0.1:{port}'
+        self._log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--preload', '--workers', str(self.workers),
+             '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', *self.ARGS[self.kind]],
+            cwd=self.cwd, env=self.env, stdout=self._log, stderr=subprocess.STDOUT
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                with urllib.request.urlopen(self.base_url + '/', timeout=5) as response:
+                    response.read()
+                    return self
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.2)
+        self.stop()
+        self._log.seek(0)
+        raise RuntimeError(f"{self.kind} server did not start:\n{self._log.read().decode(errors='replace')[-2000:]}")
+
+    def memory(self):
+        """Proportional set size in bytes of the master and its workers,
+        so pages shared after the fork count once; None off Linux"""
+        total = 0
+        for pid in [self.process.pid, *_child_pids(self.process.pid)]:
+            try:
+                with open(f'/proc/{pid}/smaps_rollup') as f:
+                    for line in f:
+                        if line.startswith('Pss:'):
+                            total += int(line.split()[1]) * 1024
+                            break
+            except OSError:
+                return None
+        return total
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+def simulate_db_latency(ms):
+    """Add ``ms`` of latency to every SQLite statement, in the thread that
+    runs it, to emulate a database across the network: a sync worker waits
+    like it would on PostgreSQL, while the aiosqlite thread keeps the event
+    loop free. Other databases have real latency and are left alone."""
+    def connect(dbapi_connection, connection_record):
+        driver = connection_record.driver_connection
+        if not hasattr(driver, 'set_trace_callback'):
+            return
+        delay = ms / 1000
+
+        def trace(statement):
+            # Statements run inside SQLite (FTS5 lookups) start with "--"
+            if not statement.startswith('--'):
+                time.sleep(delay)
+
+        if inspect.iscoroutinefunction(driver.set_trace_callback):
+            dbapi_connection.await_(driver.set_trace_callback(trace))
+        else:
+            driver.set_trace_callback(trace)
+
+    event.listen(Engine, 'connect', connect)
+
+
+def _child_pids(parent):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The fields after the parenthesized command: state, ppid, ...
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == parent:
+            children.append(int(entry))
+    return children
+
+
+def compare_servers(app, kinds, workers, concurrency_levels, requests=300, env=None):
+    """Benchmark each server kind at each concurrency level.
+
+    Returns a list of ``(kind, concurrency, stats, memory_bytes)``; memory is
+    measured right after the run at that concurrency. Must run inside an
+    app context.
+    """
+    endpoints = serving_endpoints()
+    rows = []
+    for kind in kinds:
+        server = ServerProcess(kind, workers, cwd=app.root_path, env=env).start()
+        try:
+            client = HttpClient(app, None, base_url=server.base_url)
+            for concurrency in concurrency_levels:
+                stats = run(app, client, endpoints, requests=requests, concurrency=concurrency,
+                            warmup=workers * 5)['public']
+                rows.append((kind, concurrency, stats, server.memory()))
+        finally:
+            server.stop()
+    return rows
+
+
+def format_server_comparison(rows):
+    lines = [f"{'server':<8}{'clients':>8}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}{'memory':>11}"]
+    for kind, concurrency, s, memory in rows:
+        memory = '-' if memory is None else f'{memory / 2 ** 20:.1f} MB'
+        lines.append(
+            f"{kind:<8}{concurrency:>8}{s['throughput']:>9}{s['p50_ms']:>9}{s['p95_ms']:>9}"
+            f"{s['p99_ms']:>9}{s['errors']:>8}{memory:>11}"
+        )
+    return '\n'.join(lines)
+
+
+def run(app, client, endpoints, requests=100, concurrency=1, warmup=5):
+    """Benchmark each endpoint and return ``{name: stats}``.
+
+    Stats hold throughput (req/s), p50/p95/p99/max latency in milliseconds,
+    SQL queries per request and the number of non-2xx responses.
+    """
+    from app import db
+
+    results = {}
+    for name, paths, admin in endpoints:
+        for i in range(warmup):
+            client.get(paths[i % len(paths)], admin)
+
+        latencies = []
+        errors = 0
+
+        def timed(i):
+            started = time.perf_counter()
+            status = client.get(paths[i % len(paths)], admin)
+            return time.perf_counter() - started, status
+
+        with app.app_context():
+            engine = db.engine
+        with QueryCounter(engine) as counter:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for elapsed, status in pool.map(timed, range(requests)):
+                    latencies.append(elapsed * 1000)
+                    if status >= 400:
+                        errors += 1
+            wall = time.perf_counter() - started
+
+        latencies.sort()
+        results[name] = {
+            'requests': requests,
+            'errors': errors,
+            'throughput': round(requests / wall, 1) if wall else None,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'max_ms': round(latencies[-1], 2),
+            'queries_per_request': round(counter.count / requests, 2) if client.counts_queries else None,
+        }
+    return results
+
+
+def save_baseline(results, path, meta=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta or {}, 'results': results}, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path):
+    """Return ``(meta, results)`` saved by ``save_baseline``"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get('meta', {}), data['results']
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return human-readable regressions of ``results`` against a baseline.
+
+    p95 latency and queries per request are compared; throughput is too
+    noisy on shared machines to gate on.
+    """
+    regressions = []
+    for name, stats in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if previous.get('p95_ms') and stats['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {stats['p95_ms']}ms")
+        before, after = previous.get('queries_per_request'), stats['queries_per_request']
+        # Cache refreshes add stray queries; an extra query on every request does not
+        if before is not None and after is not None and after - before >= 1:
+            regressions.append(f"{name}: queries/request {before} -> {after}")
+    return regressions
+
+
+def format_results(results):
+    lines = [f"{'endpoint':<22}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'sql/req':>9}{'errors':>8}"]
+    for name, s in results.items():
+        queries = '-' if s['queries_per_request'] is None else s['queries_per_request']
+        lines.append(
+            f"{name:<22}{s['throughput']:>9}{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}"
+            f"{s['max_ms']:>9}{queries:>9}{s['errors']:>8}"
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,313 @@
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+import analytics_retention
+import analytics_rollups
+import benchmark
+import professional_io
+import synthetic_data
+
+DEFAULT_ADMIN_USERNAME = 'admin'
+DEFAULT_ADMIN_EMAIL = 'admin@saludvalleuco.com'
+DEFAULT_ADMIN_PASSWORD = 'admin123'
+
+
+def init_db():
+    """Create tables and indexes, upgrade older schemas and make sure the
+    directory state row exists. Safe to run on every deploy."""
+    from app import ad_server, db, directory_stats, directory_version, geo_index, popularity_ranking, search_index
+    import models  # noqa: F401  (registers the tables)
+
+    db.create_all()
+    analytics_retention.ensure_schema()
+    search_index.create()
+    geo_index.create()
+    directory_version.create()
+    directory_stats.create()
+    ad_server.create()
+    popularity_ranking.create()
+
+
+def create_admin(username, email, password):
+    from app import db
+    from models import Admin
+    from werkzeug.security import generate_password_hash
+
+    admin = Admin(username=username, email=email, password_hash=generate_password_hash(password))
+    db.session.add(admin)
+    db.session.commit()
+    return admin
+
+
+def ensure_default_admin():
+    """Create the default admin user when there is no admin at all"""
+    from models import Admin
+
+    if Admin.query.first():
+        return None
+    return create_admin(DEFAULT_ADMIN_USERNAME, DEFAULT_ADMIN_EMAIL, DEFAULT_ADMIN_PASSWORD)
+
+
+@click.command('init-db')
+@click.option('--no-admin', is_flag=True, help='Do not create the default admin user.')
+@with_appcontext
+def init_db_command(no_admin):
+    """Create or upgrade the schema and indexes"""
+    init_db()
+    print("Database ready")
+    if not no_admin and ensure_default_admin():
+        print(f"Admin user created: username={DEFAULT_ADMIN_USERNAME}, password={DEFAULT_ADMIN_PASSWORD}")
+
+
+@click.command('create-admin')
+@click.argument('username')
+@click.option('--email', required=True)
+@click.password_option()
+@with_appcontext
+def create_admin_command(username, email, password):
+    """Add an admin user"""
+    from models import Admin
+
+    if Admin.query.filter_by(username=username).first():
+        raise click.ClickException(f'Admin {username} already exists')
+    create_admin(username, email, password)
+    print(f"Admin user created: username={username}")
+
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Rebuild the full-text index used by /buscar"""
+    from app import search_index
+
+    count = search_index.rebuild()
+    print(f"Indexed {count} professionals")
+
+
+@click.command('rebuild-analytics-rollups')
+@with_appcontext
+def rebuild_analytics_rollups_command():
+    """Recompute the daily analytics rollups from raw events"""
+    from app import analytics_ingestor
+
+    analytics_ingestor.flush()
+    count = analytics_rollups.rebuild_rollups()
+    print(f"Rolled up {count} events")
+
+
+@click.command('rebuild-popularity')
+@with_appcontext
+def rebuild_popularity_command():
+    """Recompute the professionals' popularity scores from the daily rollups"""
+    from app import analytics_ingestor, popularity_ranking
+
+    analytics_ingestor.flush()
+    count = popularity_ranking.rebuild()
+    print(f"Scored {count} professionals")
+
+
+@click.command('build-static')
+@with_appcontext
+def build_static_command():
+    """Pre-render the public pages and sitemap.xml into STATIC_SITE_DIR"""
+    from app import static_site
+
+    report = static_site.build()
+    print(f"Rendered {report['pages']} pages ({report['bytes'] / 1e6:.1f} MB) "
+          f"in {report['seconds']:.1f}s into {report['output_dir']}")
+    if report['removed']:
+        print(f"Removed {report['removed']} stale pages")
+
+
+@click.command('prune-analytics')
+@click.option('--days', type=int, default=None, help='Raw event TTL (default: ANALYTICS_RETENTION_DAYS)')
+@click.option('--chunk-size', type=int, default=5000, help='Rows deleted per transaction')
+@click.option('--vacuum', is_flag=True, help='Return freed space to the operating system')
+@click.option('--dry-run', is_flag=True, help='Only report how many events would be pruned')
+@with_appcontext
+def prune_analytics_command(days, chunk_size, vacuum, dry_run):
+    """Compact and delete raw analytics events past their retention period"""
+    from app import analytics_ingestor
+
+    analytics_ingestor.flush()
+    if days is None:
+        days = current_app.config['ANALYTICS_RETENTION_DAYS']
+    report = analytics_retention.prune(days, chunk_size=chunk_size, vacuum=vacuum, dry_run=dry_run)
+    if dry_run:
+        print(f"{report['rows_deleted']} events older than {report['cutoff']:%Y-%m-%d} would be pruned")
+        return
+    print(f"Cutoff: {report['cutoff']:%Y-%m-%d}")
+    print(f"Days compacted into rollups: {report['rollup_days_rebuilt']}")
+    print(f"Legacy rows interned: {report['rows_interned']}")
+    print(f"Partitions dropped: {report['partitions_dropped']}")
+    print(f"Rows deleted: {report['rows_deleted']}")
+    print(f"Unused user agents/referrers deleted: {report['lookup_rows_deleted']}")
+    if report['bytes_reclaimed'] is not None:
+        print(f"Bytes reclaimed from the analytics tables: {report['bytes_reclaimed']}")
+
+
+@click.command('import-professionals')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@with_appcontext
+def import_professionals_command(path):
+    """Bulk import professionals from a CSV, JSON or JSON Lines file"""
+    # Rows are validated with ProfessionalForm, which needs a request context
+    with open(path, 'rb') as stream, current_app.test_request_context():
+        try:
+            report = professional_io.import_professionals(professional_io.iter_rows(stream, path))
+        except professional_io.ImportFormatError as e:
+            raise click.ClickException(str(e))
+    print(f"{report['rows']} rows: {report['created']} created, {report['updated']} updated, "
+          f"{len(report['errors'])} with errors")
+    for error in report['errors']:
+        details = '; '.join(f"{field}: {', '.join(messages)}" for field, messages in error['errors'].items())
+        print(f"  row {error['row']}: {details}")
+
+
+@click.command('build-assets')
+@click.option('--vendor', is_flag=True, help='Download the CDN dependencies into static/vendor first.')
+@with_appcontext
+def build_assets_command(vendor):
+    """Minify, fingerprint and precompress the static assets"""
+    from app import asset_pipeline
+
+    if vendor:
+        for path in asset_pipeline.vendor():
+            print(f"Vendored {path}")
+    for logical, hashed, size, variants in asset_pipeline.build():
+        encoded = ', '.join(f"{encoding} {length}" for encoding, length in sorted(variants.items()))
+        print(f"{logical} -> {hashed} ({size} bytes{'; ' + encoded if encoded else ''})")
+
+
+@click.command('seed-data')
+@click.option('--professionals', default=10000, show_default=True, help='Synthetic professionals to add.')
+@click.option('--events', default=0, show_default=True, help='Synthetic analytics events to add.')
+@click.option('--days', default=90, show_default=True, help='Spread events over this many past days.')
+@click.option('--seed', type=int, default=None, help='Random seed for reproducible data.')
+@with_appcontext
+def seed_data_command(professionals, events, days, seed):
+    """Fill the database with synthetic professionals and analytics events"""
+    started = time.perf_counter()
+    if professionals:
+        count = synthetic_data.generate_professionals(professionals, seed=seed)
+        print(f"Professionals added: {count}")
+    if events:
+        try:
+            count = synthetic_data.generate_analytics(events, days=days, seed=seed)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        print(f"Analytics events added: {count}")
+    totals = synthetic_data.table_counts()
+    print(f"Totals: {totals['professionals']} professionals, {totals['analytics']} events "
+          f"({time.perf_counter() - started:.1f}s)")
+
+
+@click.command('benchmark')
+@click.option('--mode', type=click.Choice(['inprocess', 'http']), default='inprocess', show_default=True)
+@click.option('--url', default=None, help='Benchmark an already running server (http mode) instead of a local one.')
+@click.option('--requests', 'request_count', default=100, show_default=True, help='Requests per endpoint.')
+@click.option('--concurrency', default=1, show_default=True)
+@click.option('--no-page-cache', is_flag=True, help='Disable the public page cache while measuring.')
+@click.option('--baseline', 'baseline_path', type=click.Path(dir_okay=False), default=None,
+              help='Baseline file (default: instance/benchmark-baseline.json).')
+@click.option('--save-baseline', is_flag=True, help='Store these results as the new baseline.')
+@click.option('--threshold', default=benchmark.DEFAULT_THRESHOLD, show_default=True,
+              help='Allowed relative p95 growth before reporting a regression.')
+@with_appcontext
+def benchmark_command(mode, url, request_count, concurrency, no_page_cache, baseline_path, save_baseline, threshold):
+    """Measure throughput, latency percentiles and SQL queries per endpoint"""
+    from models import Admin
+
+    app = current_app._get_current_object()
+    admin = Admin.query.order_by(Admin.id).first()
+    if admin is None:
+        raise click.ClickException('An admin user is required to benchmark admin pages')
+    # The benchmark clients would otherwise be throttled as bots
+    app.config['RATE_LIMIT_ENABLED'] = False
+    if no_page_cache:
+        app.config['PAGE_CACHE_SIZE'] = 0
+    if mode == 'http':
+        client = benchmark.HttpClient(app, admin.id, base_url=url)
+    else:
+        client = benchmark.InProcessClient(app, admin.id)
+    try:
+        results = benchmark.run(app, client, benchmark.default_endpoints(), requests=request_count,
+                                concurrency=concurrency)
+    finally:
+        client.close()
+    print(benchmark.format_results(results))
+
+    baseline_path = baseline_path or os.path.join(app.instance_path, 'benchmark-baseline.json')
+    settings = {'mode': mode, 'url': url, 'concurrency': concurrency, 'page_cache': not no_page_cache}
+    if save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+        benchmark.save_baseline(results, baseline_path, meta={
+            **settings, 'requests': request_count, **synthetic_data.table_counts(),
+        })
+        print(f"Baseline saved to {baseline_path}")
+    elif os.path.exists(baseline_path):
+        meta, baseline = benchmark.load_baseline(baseline_path)
+        if any(meta.get(key) != value for key, value in settings.items()):
+            print(f"Note: the baseline was recorded with different settings: {meta}")
+        regressions = benchmark.compare(results, baseline, threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions against {baseline_path}")
+
+
+@click.command('benchmark-serving')
+@click.option('--workers', default=2, show_default=True, help='Worker processes of each server.')
+@click.option('--concurrency', default='1,8,32', show_default=True,
+              help='Comma-separated numbers of concurrent clients.')
+@click.option('--requests', 'request_count', default=300, show_default=True, help='Requests per concurrency level.')
+@click.option('--server', 'servers', type=click.Choice(['wsgi', 'asgi']), multiple=True,
+              help='Servers to run (default: both).')
+@click.option('--no-page-cache', is_flag=True, help='Disable the public page cache in the servers.')
+@click.option('--db-latency-ms', type=float, default=0, show_default=True,
+              help='Latency added to every SQLite statement, as with a database across the network.')
+@with_appcontext
+def benchmark_serving_command(workers, concurrency, request_count, servers, no_page_cache, db_latency_ms):
+    """Compare the sync and async servers at the same worker count"""
+    try:
+        levels = [int(level) for level in concurrency.split(',')]
+    except ValueError:
+        raise click.ClickException('--concurrency takes comma-separated integers')
+    env = {**os.environ, 'RATE_LIMIT_ENABLED': '0'}
+    if no_page_cache:
+        env['PAGE_CACHE_SIZE'] = '0'
+    if db_latency_ms:
+        env['BENCHMARK_DB_LATENCY_MS'] = str(db_latency_ms)
+    app = current_app._get_current_object()
+    try:
+        rows = benchmark.compare_servers(app, servers or ('wsgi', 'asgi'), workers, levels,
+                                         requests=request_count, env=env)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    print(benchmark.format_server_comparison(rows))
+
+
+COMMANDS = [
+    init_db_command,
+    create_admin_command,
+    rebuild_search_index_command,
+    rebuild_analytics_rollups_command,
+    rebuild_popularity_command,
+    build_static_command,
+    prune_analytics_command,
+    import_professionals_command,
+    build_assets_command,
+    seed_data_command,
+    benchmark_command,
+    benchmark_serving_command,
+]
+
+
+def register(app):
+    for command in COMMANDS:
+        app.cli.add_command(command)
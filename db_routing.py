@@ -0,0 +1,168 @@
+import inspect
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session as OrmSession
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+
+# Flask session key holding the time until which a client reads from the primary
+PIN_KEY = '_db_primary_until'
+
+
+class RoutingSession(Session):
+    """``db.session`` that sends the reads of replica-enabled views to the
+    replica engine; flushes and any other statement go to the primary"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and has_request_context()
+                and g.get('db_replica') and not g.get('db_wrote')
+                and getattr(clause, 'is_select', False)):
+            router = current_app.extensions.get('db_router')
+            if router is not None:
+                g.db_replica_used = True
+                router.counters['replica_statements'] += 1
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class DatabaseRouter:
+    """Read/write splitting between the primary and an optional replica.
+
+    With a ``replica`` entry in ``SQLALCHEMY_BINDS`` (``DATABASE_REPLICA_URL``),
+    views decorated with ``replica_reads`` run their SELECTs on the replica.
+    Everything else, including every write, uses the primary. A client that
+    wrote something reads from the primary for ``REPLICA_PIN_SECONDS``
+    afterwards, so it sees its own changes despite replication lag. A
+    replica error marks the replica down for ``REPLICA_RETRY_SECONDS`` and
+    the view is run again on the primary.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self.counters = {'replica_requests': 0, 'pinned_requests': 0, 'replica_statements': 0, 'failovers': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('REPLICA_PIN_SECONDS', float(os.environ.get('REPLICA_PIN_SECONDS', 10)))
+        app.config.setdefault('REPLICA_RETRY_SECONDS', float(os.environ.get('REPLICA_RETRY_SECONDS', 30)))
+        self.app = app
+        app.extensions['db_router'] = self
+        if not event.contains(OrmSession, 'after_flush', _after_flush):
+            event.listen(OrmSession, 'after_flush', _after_flush)
+            event.listen(OrmSession, 'do_orm_execute', _do_orm_execute)
+
+    @property
+    def enabled(self):
+        return REPLICA_BIND in (self.app.config.get('SQLALCHEMY_BINDS') or {})
+
+    def healthy(self):
+        return time.monotonic() >= self._down_until
+
+    def stats(self):
+        return {**self.counters, 'replica_up': int(self.enabled and self.healthy())}
+
+    def mark_down(self, error):
+        with self._lock:
+            self._down_until = time.monotonic() + self.app.config['REPLICA_RETRY_SECONDS']
+            self.counters['failovers'] += 1
+        logger.warning(f"Read replica unavailable, using the primary for "
+                       f"{self.app.config['REPLICA_RETRY_SECONDS']:.0f}s: {error}")
+
+    def pinned(self):
+        """Whether the current client wrote recently enough to need the primary"""
+        # Visitors without a session cookie never wrote; not touching the
+        # session keeps their responses free of "Vary: Cookie"
+        if self.app.config['SESSION_COOKIE_NAME'] not in request.cookies:
+            return False
+        return session.get(PIN_KEY, 0) > time.time()
+
+    def pin(self):
+        g.db_wrote = True
+        if self.enabled:
+            session[PIN_KEY] = time.time() + self.app.config['REPLICA_PIN_SECONDS']
+
+    def replica_reads(self, view):
+        """Decorator running a read-only view's queries on the replica.
+
+        On a replica error the whole view runs again on the primary, so it
+        must not write, and side effects such as tracking go after its last
+        query. Async views (``asgi.py``) read through ``async_db``, which
+        follows the same ``g.db_replica`` flag.
+        """
+        if inspect.iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapped_async(*args, **kwargs):
+                if not self._use_replica():
+                    return await view(*args, **kwargs)
+                g.db_replica = True
+                try:
+                    return await view(*args, **kwargs)
+                except DBAPIError as e:
+                    if not g.pop('db_replica_used', False):
+                        raise
+                    self.mark_down(e.orig)
+                    g.db_replica = False
+                    return await view(*args, **kwargs)
+                finally:
+                    g.pop('db_replica', None)
+            return wrapped_async
+
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if not self._use_replica():
+                return view(*args, **kwargs)
+
+            from app import db
+
+            g.db_replica = True
+            try:
+                return view(*args, **kwargs)
+            except DBAPIError as e:
+                if not g.pop('db_replica_used', False):
+                    raise
+                self.mark_down(e.orig)
+                db.session.rollback()
+                g.db_replica = False
+                return view(*args, **kwargs)
+            finally:
+                g.pop('db_replica', None)
+        return wrapped
+
+    def _use_replica(self):
+        if not self.enabled or request.method not in ('GET', 'HEAD') or not self.healthy():
+            return False
+        if self.pinned():
+            self.counters['pinned_requests'] += 1
+            return False
+        self.counters['replica_requests'] += 1
+        return True
+
+
+def _after_flush(session, flush_context):
+    _record_write()
+
+
+def _do_orm_execute(orm_execute_state):
+    if not orm_execute_state.is_select:
+        _record_write()
+
+
+def _record_write():
+    if not has_request_context():
+        return
+    router = current_app.extensions.get('db_router')
+    if router is not None:
+        router.pin()
@@ -0,0 +1,155 @@
+import threading
+
+from sqlalchemy import event, func, inspect, select, text, update
+from sqlalchemy.orm import Session
+
+FIELDS = ('total', 'basic', 'premium', 'available')
+
+
+def _contribution(plan, available):
+    return {
+        'total': 1,
+        'basic': int(plan == 'basic'),
+        'premium': int(plan == 'premium'),
+        'available': int(available is True),
+    }
+
+
+def _old_and_new(state, key):
+    """``(old, new)`` values of an attribute in a flush, or None when the old
+    value was never loaded"""
+    history = state.attrs[key].history
+    if not history.added and not history.deleted:
+        value = history.unchanged[0] if history.unchanged else state.dict.get(key)
+        return value, value
+    if not history.deleted:
+        return None
+    return history.deleted[0], history.added[0] if history.added else None
+
+
+class DirectoryStats:
+    """Professional counters for the admin dashboard.
+
+    The totals live in the single ``DirectoryCounts`` row, adjusted by a
+    delta in the same transaction as every add, edit or delete flushed
+    through the ORM, so the dashboard reads one row instead of counting the
+    table. When a flush does not carry enough history to compute a delta,
+    or after bulk Core writes (``recompute``), the row is rebuilt with one
+    grouped aggregate. Reads are cached per directory version.
+    """
+
+    def __init__(self, app=None, directory_version=None):
+        self.app = None
+        self.directory_version = directory_version
+        self._lock = threading.Lock()
+        self._cached = None
+        if app is not None:
+            self.init_app(app, directory_version)
+
+    def init_app(self, app, directory_version=None):
+        if directory_version is not None:
+            self.directory_version = directory_version
+        self.app = app
+        app.extensions['directory_stats'] = self
+        if not event.contains(Session, 'after_flush', self._after_flush):
+            event.listen(Session, 'after_flush', self._after_flush)
+
+    def create(self):
+        """Create the counters row and the dashboard's pagination index
+        on databases created before they existed"""
+        from app import db
+        from models import DirectoryCounts
+
+        with db.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_professional_created_at_id ON professional (created_at, id)"
+            ))
+        if db.session.get(DirectoryCounts, 1) is None:
+            db.session.add(DirectoryCounts(id=1, **self.aggregate(db.session.connection())))
+            db.session.commit()
+
+    def aggregate(self, connection):
+        """Count the professionals with a single grouped query"""
+        from models import Professional
+
+        counts = dict.fromkeys(FIELDS, 0)
+        rows = connection.execute(
+            select(Professional.plan, Professional.available, func.count(Professional.id))
+            .group_by(Professional.plan, Professional.available)
+        )
+        for plan, available, count in rows:
+            for field, value in _contribution(plan, bool(available)).items():
+                counts[field] += value * count
+        return counts
+
+    def recompute(self, connection):
+        """Rebuild the counters on ``connection``, for bulk writes that bypass
+        the ORM flush (the caller commits)"""
+        from models import DirectoryCounts
+
+        connection.execute(update(DirectoryCounts).where(DirectoryCounts.id == 1).values(**self.aggregate(connection)))
+
+    def current(self):
+        """Return ``{'total', 'basic', 'premium', 'available'}``"""
+        from app import db
+        from models import DirectoryCounts
+
+        version = self.directory_version.current()[0]
+        cached = self._cached
+        if cached is not None and cached[0] == version:
+            return dict(cached[1])
+
+        row = db.session.get(DirectoryCounts, 1, populate_existing=True)
+        if row is None:
+            counts = self.aggregate(db.session.connection())
+        else:
+            counts = {field: getattr(row, field) for field in FIELDS}
+        with self._lock:
+            self._cached = (version, counts)
+        return dict(counts)
+
+    def _after_flush(self, session, flush_context):
+        from models import DirectoryCounts, Professional
+
+        delta = dict.fromkeys(FIELDS, 0)
+        touched = False
+        try:
+            for obj in session.new:
+                if isinstance(obj, Professional):
+                    state = inspect(obj)
+                    if 'plan' not in state.dict or 'available' not in state.dict:
+                        raise LookupError
+                    for field, value in _contribution(obj.plan, obj.available).items():
+                        delta[field] += value
+                    touched = True
+            for obj in session.deleted:
+                if isinstance(obj, Professional):
+                    state = inspect(obj)
+                    if 'plan' not in state.dict or 'available' not in state.dict:
+                        raise LookupError
+                    for field, value in _contribution(state.dict['plan'], state.dict['available']).items():
+                        delta[field] -= value
+                    touched = True
+            for obj in session.dirty:
+                if isinstance(obj, Professional) and obj not in session.deleted:
+                    state = inspect(obj)
+                    plan, available = _old_and_new(state, 'plan'), _old_and_new(state, 'available')
+                    if plan is None or available is None:
+                        raise LookupError
+                    if plan[0] == plan[1] and available[0] == available[1]:
+                        continue
+                    for field, value in _contribution(plan[0], available[0]).items():
+                        delta[field] -= value
+                    for field, value in _contribution(plan[1], available[1]).items():
+                        delta[field] += value
+                    touched = True
+        except LookupError:
+            self.recompute(session.connection())
+            return
+
+        if touched and any(delta.values()):
+            session.connection().execute(
+                update(DirectoryCounts).where(DirectoryCounts.id == 1).values(
+                    **{field: getattr(DirectoryCounts, field) + change for field, change in delta.items()}
+                )
+            )
@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class DirectoryVersion:
+    """Version counter for the professional directory shared by all workers.
+
+    Any flush that adds, edits or deletes a Professional bumps the single
+    ``DirectoryState`` row in the same transaction. Caches key on
+    ``current()``, which is re-read from the database at most every
+    ``DIRECTORY_VERSION_TTL`` seconds, so changes made by another worker
+    become visible within that delay and local changes immediately.
+    In-process listeners registered with ``on_change`` receive the ids of
+    the professionals touched by each committed transaction.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._current = None
+        self._checked_at = 0.0
+        self._listeners = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DIRECTORY_VERSION_TTL', float(os.environ.get('DIRECTORY_VERSION_TTL', 1.0)))
+        self.app = app
+        app.extensions['directory_version'] = self
+        if not event.contains(Session, 'after_flush', self._after_flush):
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', self._after_rollback)
+
+    def create(self):
+        """Make sure the state row exists"""
+        from app import db
+        from models import DirectoryState
+
+        if db.session.get(DirectoryState, 1) is None:
+            db.session.add(DirectoryState(id=1, version=0, updated_at=datetime.utcnow()))
+            db.session.commit()
+
+    def on_change(self, listener):
+        """Register ``listener(changed_ids)`` called after each local commit
+        that touched professionals. ``changed_ids`` maps id to 'saved' or
+        'deleted'."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+        return listener
+
+    def current(self):
+        """Return ``(version, updated_at)`` of the directory"""
+        ttl = self.app.config['DIRECTORY_VERSION_TTL']
+        now = time.monotonic()
+        current = self._current
+        if current is not None and now - self._checked_at < ttl:
+            return current
+        from app import db
+        from models import DirectoryState
+
+        row = db.session.execute(
+            select(DirectoryState.version, DirectoryState.updated_at).where(DirectoryState.id == 1)
+        ).first()
+        current = (row.version, row.updated_at) if row else (0, None)
+        with self._lock:
+            self._current = current
+            self._checked_at = now
+        return current
+
+    def invalidate(self):
+        with self._lock:
+            self._checked_at = 0.0
+
+    def bump(self, connection):
+        """Bump the version on ``connection``, for bulk writes that bypass
+        the ORM flush (the caller commits and calls ``invalidate``)"""
+        from models import DirectoryState
+
+        connection.execute(
+            update(DirectoryState).where(DirectoryState.id == 1).values(
+                version=DirectoryState.version + 1,
+                updated_at=datetime.utcnow()
+            )
+        )
+
+    def _after_flush(self, session, flush_context):
+        from models import Professional
+
+        changed = session.info.setdefault('directory_changes', {})
+        touched = False
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, Professional) and (obj in session.new or session.is_modified(obj)):
+                changed[obj.id] = 'saved'
+                touched = True
+        for obj in session.deleted:
+            if isinstance(obj, Professional):
+                changed[obj.id] = 'deleted'
+                touched = True
+        if touched:
+            self.bump(session.connection())
+
+    def _after_commit(self, session):
+        changed = session.info.pop('directory_changes', None)
+        if not changed:
+            return
+        self.invalidate()
+        for listener in self._listeners:
+            try:
+                listener(changed)
+            except Exception as e:
+                logger.error(f"Directory change listener {listener!r} failed: {e}")
+
+    def _after_rollback(self, session):
+        session.info.pop('directory_changes', None)
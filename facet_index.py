@@ -0,0 +1,159 @@
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+# Faceted Professional fields, in the order rows are stored
+FACETS = ('specialty', 'location', 'available', 'plan')
+
+
+def _facet_values(specialty, location, available, plan):
+    return specialty, location, available is True, plan or 'basic'
+
+
+def _match(snapshot, specialty, location, available_only, plan):
+    matching = snapshot.everyone
+    for facet, value in (('specialty', specialty), ('location', location),
+                         ('available', True if available_only else None), ('plan', plan)):
+        if value is not None:
+            matching &= snapshot.bitmaps[facet].get(value, 0)
+    return matching
+
+
+class FacetSnapshot:
+    """One immutable state of the index.
+
+    ``bitmaps[facet][value]`` is an int with bit ``id`` set for every
+    professional having that value; ``everyone`` has the bits of all of
+    them and ``rows`` their facet values, needed to clear old bits.
+    """
+
+    __slots__ = ('everyone', 'bitmaps', 'rows')
+
+    def __init__(self, everyone=0, bitmaps=None, rows=None):
+        self.everyone = everyone
+        self.bitmaps = bitmaps or {facet: {} for facet in FACETS}
+        self.rows = rows or {}
+
+
+class FacetIndex:
+    """In-memory bitmaps of the low-cardinality Professional fields.
+
+    Every value of ``specialty``, ``location``, ``available`` and ``plan``
+    has a Python int used as a bitset over professional ids, so any filter
+    combination is a few bitwise ANDs and every count a ``bit_count()``,
+    answered in microseconds without a query. Search results still come
+    from SQL, which orders and paginates them; the index answers the
+    counts around them. It follows the directory version like the
+    autocomplete index: changed rows are re-read by ``updated_at`` and
+    applied to a copy of the bitmaps, with a full reload when rows
+    disappeared. The copy then replaces the current snapshot in one
+    assignment, so readers never lock and never see a half-applied change.
+    """
+
+    # Window re-read on each sync, covering transactions that committed
+    # after the previous sync but were stamped before it
+    SYNC_OVERLAP = timedelta(seconds=60)
+
+    def __init__(self, app=None, directory_version=None):
+        self.app = None
+        self.directory_version = directory_version
+        self._lock = threading.Lock()
+        self._snapshot = FacetSnapshot()
+        self._version = None
+        self._synced_at = None
+        self.counters = {'lookups': 0, 'syncs': 0, 'full_loads': 0}
+        if app is not None:
+            self.init_app(app, directory_version)
+
+    def init_app(self, app, directory_version=None):
+        if directory_version is not None:
+            self.directory_version = directory_version
+        self.app = app
+        app.extensions['facet_index'] = self
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            **self.counters,
+            'professionals': len(snapshot.rows),
+            'bitmaps': sum(len(values) for values in snapshot.bitmaps.values()),
+        }
+
+    def count(self, specialty=None, location=None, available_only=False, plan=None):
+        """Number of professionals matching all the given filters"""
+        snapshot = self.snapshot()
+        return _match(snapshot, specialty, location, available_only, plan).bit_count()
+
+    def facet_counts(self, facet, specialty=None, location=None, available_only=False, plan=None):
+        """``{value: count}`` of ``facet`` among the professionals matching the filters"""
+        snapshot = self.snapshot()
+        matching = _match(snapshot, specialty, location, available_only, plan)
+        counts = {value: (bitmap & matching).bit_count() for value, bitmap in snapshot.bitmaps[facet].items()}
+        return {value: count for value, count in counts.items() if count}
+
+    def snapshot(self):
+        """The current ``FacetSnapshot``, synced with the directory version"""
+        self._sync()
+        self.counters['lookups'] += 1
+        return self._snapshot
+
+    def _sync(self):
+        version = self.directory_version.current()[0]
+        if version == self._version:
+            return
+        from app import db
+        from models import Professional
+
+        columns = (Professional.id, Professional.specialty, Professional.location,
+                   Professional.available, Professional.plan)
+        started = datetime.utcnow()
+        with self._lock:
+            if version == self._version:
+                return
+            if self._synced_at is None:
+                snapshot = self._load(db.session.execute(select(*columns)).all())
+            else:
+                changed = db.session.execute(
+                    select(*columns).where(Professional.updated_at >= self._synced_at - self.SYNC_OVERLAP)
+                ).all()
+                snapshot = self._apply(self._snapshot, changed)
+                total = db.session.execute(select(func.count(Professional.id))).scalar()
+                # Deleted rows leave no trace to sync from
+                if total != len(snapshot.rows):
+                    snapshot = self._load(db.session.execute(select(*columns)).all())
+            self._snapshot = snapshot
+            self._version = version
+            self._synced_at = started
+            self.counters['syncs'] += 1
+
+    def _load(self, rows):
+        self.counters['full_loads'] += 1
+        return self._apply(FacetSnapshot(), rows)
+
+    @staticmethod
+    def _apply(snapshot, rows):
+        """A new snapshot with ``rows`` (id plus raw facet columns) applied to ``snapshot``"""
+        updates = {}
+        for pid, *values in rows:
+            values = _facet_values(*values)
+            if snapshot.rows.get(pid) != values:
+                updates[pid] = values
+        if not updates:
+            return snapshot
+
+        everyone = snapshot.everyone
+        bitmaps = {facet: dict(values) for facet, values in snapshot.bitmaps.items()}
+        stored = dict(snapshot.rows)
+        for pid, values in updates.items():
+            bit = 1 << pid
+            old = stored.get(pid)
+            for facet, value in zip(FACETS, old or ()):
+                bitmaps[facet][value] &= ~bit
+                if not bitmaps[facet][value]:
+                    del bitmaps[facet][value]
+            for facet, value in zip(FACETS, values):
+                bitmaps[facet][value] = bitmaps[facet].get(value, 0) | bit
+            everyone |= bit
+            stored[pid] = values
+        return FacetSnapshot(everyone, bitmaps, stored)
@@ -1,4 +1,5 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileAllowed, FileRequired
 from wtforms import StringField, TextAreaField, SelectField, BooleanField, FloatField, PasswordField, SubmitField
 from wtforms.validators import DataRequired, Email, Length, Optional, NumberRange
 from models import SPECIALTIES, LOCATIONS
@@ -41,4 +42,14 @@ class SearchForm(FlaskForm):
     specialty = SelectField('Especialidad', choices=[('', 'Todas')] + [(s, s) for s in SPECIALTIES])
     location = SelectField('Localidad', choices=[('', 'Todas')] + [(l, l) for l in LOCATIONS])
     available_only = BooleanField('Solo disponibles', default=True)
+    sort = SelectField('Ordenar por', choices=[('relevance', 'Relevancia'), ('popular', 'Más consultados')],
+                       default='relevance')
     submit = SubmitField('Buscar')
+
+class ImportForm(FlaskForm):
+    """Bulk import of professionals from a CSV or JSON file"""
+    file = FileField('Archivo CSV o JSON', validators=[
+        FileRequired(),
+        FileAllowed(['csv', 'json', 'jsonl', 'ndjson'], 'Solo se admiten archivos CSV o JSON')
+    ])
+    submit = SubmitField('Importar')
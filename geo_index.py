@@ -0,0 +1,189 @@
+import logging
+import math
+
+from sqlalchemy import event, inspect, text
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radius_km):
+    """Return (min_lat, max_lat, min_lng, max_lng) enclosing a circle"""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlng = min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180.0)
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+
+class GeoIndex:
+    """Spatial index over Professional coordinates for "near me" searches.
+
+    On SQLite the coordinates are mirrored into an R*Tree virtual table,
+    kept in sync from mapper events like the full-text index. Elsewhere a
+    composite (latitude, longitude) B-tree index serves the same bounding
+    box query. Only the candidates inside the box get an exact haversine
+    distance, so no query computes distances against every row.
+    """
+
+    RTREE_TABLE = 'professional_rtree'
+
+    def __init__(self, app=None):
+        self.app = None
+        self._rtree = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from models import Professional
+
+        self.app = app
+        app.extensions['geo_index'] = self
+        if not event.contains(Professional, 'after_insert', self._after_save):
+            event.listen(Professional, 'after_insert', self._after_save)
+            event.listen(Professional, 'after_update', self._after_save)
+            event.listen(Professional, 'after_delete', self._after_delete)
+
+    @property
+    def rtree(self):
+        """Whether the R*Tree exists; checked once per process on first use"""
+        if self._rtree is None:
+            from app import db
+
+            with db.engine.connect() as conn:
+                self._detect(conn)
+        return self._rtree
+
+    def _detect(self, conn):
+        self._rtree = conn.dialect.name == 'sqlite' and inspect(conn).has_table(self.RTREE_TABLE)
+
+    def create(self):
+        """Create the spatial index if needed and backfill an empty R*Tree"""
+        from app import db
+
+        with db.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_professional_latitude_longitude "
+                "ON professional (latitude, longitude)"
+            ))
+        if db.engine.dialect.name != 'sqlite':
+            self._rtree = False
+            return
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.RTREE_TABLE} "
+                    f"USING rtree(id, min_lat, max_lat, min_lng, max_lng)"
+                ))
+            self._rtree = True
+        except Exception as e:
+            logger.warning(f"R*Tree unavailable, using the latitude/longitude index: {e}")
+            self._rtree = False
+            return
+
+        with db.engine.connect() as conn:
+            indexed = conn.execute(text(f"SELECT COUNT(*) FROM {self.RTREE_TABLE}")).scalar()
+        if not indexed:
+            self.rebuild()
+
+    def rebuild(self):
+        """Re-index every professional with coordinates"""
+        from app import db
+        from models import Professional
+
+        if not self.rtree:
+            return 0
+        rows = db.session.query(Professional.id, Professional.latitude, Professional.longitude).filter(
+            Professional.latitude.isnot(None), Professional.longitude.isnot(None)
+        ).all()
+        with db.engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {self.RTREE_TABLE}"))
+            for row in rows:
+                self._index_row(conn, row.id, row.latitude, row.longitude)
+        return len(rows)
+
+    def within_box(self, query, min_lat, max_lat, min_lng, max_lng):
+        """Restrict a Professional query to rows inside a bounding box"""
+        from models import Professional
+
+        if self.rtree:
+            box = text(
+                f"SELECT id FROM {self.RTREE_TABLE} WHERE max_lat >= :min_lat AND min_lat <= :max_lat "
+                f"AND max_lng >= :min_lng AND min_lng <= :max_lng"
+            ).bindparams(min_lat=min_lat, max_lat=max_lat, min_lng=min_lng, max_lng=max_lng)
+            return query.filter(Professional.id.in_(box.columns(id=Professional.id.type)))
+        return query.filter(
+            Professional.latitude.between(min_lat, max_lat),
+            Professional.longitude.between(min_lng, max_lng)
+        )
+
+    def nearby(self, query, lat, lng, radius_km, limit):
+        """Return up to ``limit`` ``(professional, distance_km)`` pairs sorted
+        by distance, within ``radius_km`` of the point.
+
+        The search box starts small and doubles until it holds ``limit``
+        matches or reaches the radius, so nearest-neighbour lookups in dense
+        areas only touch nearby rows.
+        """
+        search_km = min(radius_km, 5.0)
+        while True:
+            candidates = self.within_box(query, *bounding_box(lat, lng, search_km)).all()
+            results = _within_radius(candidates, lat, lng, search_km)
+            if len(results) >= limit or search_km >= radius_km:
+                return _nearest(results, limit)
+            search_km = min(search_km * 2, radius_km)
+
+    async def nearby_async(self, session, statement, lat, lng, radius_km, limit):
+        """``nearby`` for async views: ``statement`` is a ``select(Professional)``
+        run on the ``AsyncSession`` ``session``"""
+        search_km = min(radius_km, 5.0)
+        while True:
+            result = await session.execute(self.within_box(statement, *bounding_box(lat, lng, search_km)))
+            results = _within_radius(result.scalars().all(), lat, lng, search_km)
+            if len(results) >= limit or search_km >= radius_km:
+                return _nearest(results, limit)
+            search_km = min(search_km * 2, radius_km)
+
+    def _index_row(self, conn, professional_id, lat, lng):
+        conn.execute(text(f"DELETE FROM {self.RTREE_TABLE} WHERE id = :id"), {'id': professional_id})
+        if lat is not None and lng is not None:
+            conn.execute(text(
+                f"INSERT INTO {self.RTREE_TABLE} (id, min_lat, max_lat, min_lng, max_lng) "
+                f"VALUES (:id, :lat, :lat, :lng, :lng)"
+            ), {'id': professional_id, 'lat': lat, 'lng': lng})
+
+    def _after_save(self, mapper, connection, target):
+        if self._rtree is None:
+            self._detect(connection)
+        if self._rtree:
+            self._index_row(connection, target.id, target.latitude, target.longitude)
+
+    def _after_delete(self, mapper, connection, target):
+        if self._rtree is None:
+            self._detect(connection)
+        if self._rtree:
+            connection.execute(text(f"DELETE FROM {self.RTREE_TABLE} WHERE id = :id"), {'id': target.id})
+
+
+def _within_radius(candidates, lat, lng, radius_km):
+    results = []
+    for professional in candidates:
+        distance = haversine_km(lat, lng, professional.latitude, professional.longitude)
+        if distance <= radius_km:
+            results.append((professional, distance))
+    return results
+
+
+def _nearest(results, limit):
+    results.sort(key=lambda pair: (pair[1], pair[0].id))
+    return results[:limit]
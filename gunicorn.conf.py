@@ -0,0 +1,19 @@
+# Picked up automatically by gunicorn from the working directory.
+# With --preload the app is built once in the master and forked into the
+# workers; warm it up first so the shared pages stay shared.
+import os
+
+# Set by `flask benchmark-serving --db-latency-ms`
+if os.environ.get('BENCHMARK_DB_LATENCY_MS'):
+    import benchmark
+
+    benchmark.simulate_db_latency(float(os.environ['BENCHMARK_DB_LATENCY_MS']))
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from app import warm_up
+
+        application = server.app.wsgi()
+        # asgi:application wraps the Flask app
+        warm_up(getattr(application, 'flask_app', application))
@@ -1,4 +1,11 @@
-from app import app
+from app import create_app
+
+app = create_app()
 
 if __name__ == '__main__':
+    import commands
+
+    with app.app_context():
+        commands.init_db()
+        commands.ensure_default_admin()
     app.run(host='0.0.0.0', port=5000, debug=True)
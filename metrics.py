@@ -0,0 +1,231 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger('slow_requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Statements kept per request for the slow-request and N+1 reports
+MAX_RECORDED_STATEMENTS = 100
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class RequestMetrics:
+    """Per-request SQL and latency instrumentation.
+
+    SQLAlchemy cursor events count and time every statement run while a
+    request is active; Flask hooks record per-endpoint latency and query
+    histograms. A request running more than ``METRICS_QUERY_BUDGET``
+    statements, or the same statement more than
+    ``METRICS_REPEATED_QUERY_LIMIT`` times, is logged as a likely N+1.
+    Requests slower than ``SLOW_REQUEST_MS`` (0 disables it) are logged
+    with their SQL to the ``slow_requests`` logger, and to
+    ``SLOW_REQUEST_LOG`` when set. ``render()`` returns the Prometheus text
+    format; values are per process, so each worker reports its own.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._collectors = []
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.query_seconds = Counter()
+        self.responses = Counter()
+        self.query_budget_exceeded = Counter()
+        self.slow_requests = Counter()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_QUERY_BUDGET', int(os.environ.get('METRICS_QUERY_BUDGET', 20)))
+        app.config.setdefault('METRICS_REPEATED_QUERY_LIMIT',
+                              int(os.environ.get('METRICS_REPEATED_QUERY_LIMIT', 5)))
+        app.config.setdefault('SLOW_REQUEST_MS', float(os.environ.get('SLOW_REQUEST_MS', 0)))
+        app.config.setdefault('SLOW_REQUEST_LOG', os.environ.get('SLOW_REQUEST_LOG'))
+        app.config.setdefault('METRICS_TOKEN', os.environ.get('METRICS_TOKEN'))
+        self.app = app
+        app.extensions['request_metrics'] = self
+
+        # The logger is global; another app in this process may have
+        # attached the same file already
+        path = app.config['SLOW_REQUEST_LOG']
+        if path and not any(
+            isinstance(handler, logging.FileHandler) and handler.baseFilename == os.path.abspath(path)
+            for handler in slow_logger.handlers
+        ):
+            handler = logging.FileHandler(path)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            slow_logger.addHandler(handler)
+
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def add_collector(self, prefix, collector):
+        """Export ``collector()``'s numeric values as ``<prefix>_<key>`` gauges"""
+        if (prefix, collector) not in self._collectors:
+            self._collectors.append((prefix, collector))
+
+    # SQLAlchemy events
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'request_started' in g:
+            conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('metrics_query_start')
+        if not starts or not has_request_context() or 'request_started' not in g:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        g.query_count += 1
+        g.query_seconds += elapsed
+        g.statement_counts[statement] += 1
+        if len(g.statements) < MAX_RECORDED_STATEMENTS:
+            g.statements.append((statement, elapsed))
+
+    # Flask hooks
+
+    def _before_request(self):
+        g.request_started = time.perf_counter()
+        g.query_count = 0
+        g.query_seconds = 0.0
+        g.statements = []
+        g.statement_counts = Counter()
+
+    def _after_request(self, response):
+        if 'request_started' not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_started
+        endpoint = request.endpoint or 'unmatched'
+        config = self.app.config
+
+        over_budget = g.query_count > config['METRICS_QUERY_BUDGET']
+        repeated = [
+            (statement, count) for statement, count in g.statement_counts.items()
+            if count > config['METRICS_REPEATED_QUERY_LIMIT']
+        ]
+        slow = config['SLOW_REQUEST_MS'] and elapsed * 1000 >= config['SLOW_REQUEST_MS']
+
+        with self._lock:
+            self.latency[(endpoint, request.method)].observe(elapsed)
+            self.queries[endpoint].observe(g.query_count)
+            self.query_seconds[endpoint] += g.query_seconds
+            self.responses[(endpoint, request.method, response.status_code)] += 1
+            if over_budget or repeated:
+                self.query_budget_exceeded[endpoint] += 1
+            if slow:
+                self.slow_requests[endpoint] += 1
+
+        path = request.full_path.rstrip('?')
+        if over_budget or repeated:
+            details = '; '.join(f'{count}x {_one_line(statement)}' for statement, count in repeated)
+            logger.warning(
+                f"Possible N+1 on {request.method} {path}: {g.query_count} queries "
+                f"(budget {config['METRICS_QUERY_BUDGET']}){': ' + details if details else ''}"
+            )
+        if slow:
+            lines = [
+                f"{request.method} {path} -> {response.status_code} in {elapsed * 1000:.1f}ms, "
+                f"{g.query_count} queries in {g.query_seconds * 1000:.1f}ms"
+            ]
+            lines.extend(f"  {duration * 1000:8.2f}ms  {_one_line(statement)}"
+                         for statement, duration in sorted(g.statements, key=lambda s: -s[1]))
+            slow_logger.warning('\n'.join(lines))
+        return response
+
+    # Exposition
+
+    def render(self):
+        """Metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines += [
+                '# HELP http_request_duration_seconds Request latency by endpoint.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for (endpoint, method), histogram in sorted(self.latency.items()):
+                lines += _histogram_lines('http_request_duration_seconds', histogram,
+                                          f'endpoint="{endpoint}",method="{method}"')
+
+            lines += [
+                '# HELP http_requests_total Responses by endpoint and status.',
+                '# TYPE http_requests_total counter',
+            ]
+            for (endpoint, method, status), count in sorted(self.responses.items()):
+                lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+            lines += [
+                '# HELP db_queries_per_request SQL statements executed per request.',
+                '# TYPE db_queries_per_request histogram',
+            ]
+            for endpoint, histogram in sorted(self.queries.items()):
+                lines += _histogram_lines('db_queries_per_request', histogram, f'endpoint="{endpoint}"')
+
+            lines += [
+                '# HELP db_query_duration_seconds_total Time spent in SQL by endpoint.',
+                '# TYPE db_query_duration_seconds_total counter',
+            ]
+            for endpoint, seconds in sorted(self.query_seconds.items()):
+                lines.append(f'db_query_duration_seconds_total{{endpoint="{endpoint}"}} {seconds:.6f}')
+
+            for name, help_text, counter in (
+                ('db_query_budget_exceeded_total', 'Requests flagged as likely N+1.', self.query_budget_exceeded),
+                ('http_slow_requests_total', 'Requests slower than SLOW_REQUEST_MS.', self.slow_requests),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for endpoint, count in sorted(counter.items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {count}')
+
+        for prefix, collector in self._collectors:
+            try:
+                values = collector()
+            except Exception as e:
+                logger.error(f"Metrics collector {prefix} failed: {e}")
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines += [f'# TYPE {prefix}_{key} gauge', f'{prefix}_{key} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+def _histogram_lines(name, histogram, labels):
+    lines = [
+        f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+        for bound, count in zip(histogram.buckets, histogram.counts)
+    ]
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.total}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.total}')
+    return lines
+
+
+def _one_line(statement):
+    return ' '.join(statement.split())
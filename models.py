@@ -39,10 +39,22 @@ class Professional(db.Model):
     # Availability status
     available = db.Column(db.Boolean, default=True)
     
+    # Time-decayed popularity, maintained as analytics are ingested (see popularity.py)
+    popularity = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Keyset pagination of the admin dashboard (newest first)
+        db.Index('ix_professional_created_at_id', 'created_at', 'id'),
+        # Most popular first, overall and per specialty or location
+        db.Index('ix_professional_available_popularity', 'available', 'popularity'),
+        db.Index('ix_professional_specialty_popularity', 'specialty', 'popularity'),
+        db.Index('ix_professional_location_popularity', 'location', 'popularity'),
+    )
+
     def __repr__(self):
         return f'<Professional {self.name} - {self.specialty}>'
 
@@ -67,6 +79,43 @@ class Professional(db.Model):
             return f"https://wa.me/{phone}?text={encoded_message}"
         return None
 
+    def to_dict(self):
+        """Public fields used by the JSON API"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'specialty': self.specialty,
+            'location': self.location,
+            'phone': self.phone,
+            'plan': self.plan,
+            'is_premium': self.is_premium,
+            'photo_url': self.photo_url,
+            'whatsapp_link': self.get_whatsapp_link(),
+            'schedule': self.schedule,
+            'has_insurance_coverage': bool(self.insurance_coverage),
+            'available': self.available,
+        }
+
+class DirectoryState(db.Model):
+    """Single-row counter bumped whenever the professional directory changes"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DirectoryState v{self.version}>'
+
+class DirectoryCounts(db.Model):
+    """Single-row professional counters shown on the admin dashboard"""
+    id = db.Column(db.Integer, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    basic = db.Column(db.Integer, nullable=False, default=0)
+    premium = db.Column(db.Integer, nullable=False, default=0)
+    available = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DirectoryCounts total={self.total}>'
+
 # Specialty constants for easy reference
 SPECIALTIES = [
     'Pediatría',
@@ -103,13 +152,35 @@ class Analytics(db.Model):
     target_id = db.Column(db.Integer)  # Professional ID for profile-related actions
     target_type = db.Column(db.String(50))  # 'professional', 'page', 'search'
     user_ip = db.Column(db.String(45))  # IPv4/IPv6 address
-    user_agent = db.Column(db.Text)  # Browser info
-    referrer = db.Column(db.String(500))  # Where user came from
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user_agent = db.Column(db.Text)  # Browser info (legacy rows; new rows use user_agent_id)
+    referrer = db.Column(db.String(500))  # Where user came from (legacy rows; new rows use referrer_id)
+    user_agent_id = db.Column(db.Integer, db.ForeignKey('user_agent.id'), index=True)
+    referrer_id = db.Column(db.Integer, db.ForeignKey('referrer.id'), index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     def __repr__(self):
         return f'<Analytics {self.action_type} - {self.created_at}>'
 
+class UserAgent(db.Model):
+    """Interned User-Agent strings referenced by Analytics events"""
+    id = db.Column(db.Integer, primary_key=True)
+    value_hash = db.Column(db.String(64), unique=True, nullable=False)  # sha256 of value
+    value = db.Column(db.Text, nullable=False)
+    orphaned_at = db.Column(db.DateTime)  # first seen unreferenced by a prune
+
+    def __repr__(self):
+        return f'<UserAgent {self.id}>'
+
+class Referrer(db.Model):
+    """Interned referrer URLs referenced by Analytics events"""
+    id = db.Column(db.Integer, primary_key=True)
+    value_hash = db.Column(db.String(64), unique=True, nullable=False)  # sha256 of value
+    value = db.Column(db.String(500), nullable=False)
+    orphaned_at = db.Column(db.DateTime)  # first seen unreferenced by a prune
+
+    def __repr__(self):
+        return f'<Referrer {self.id}>'
+
 class Advertisement(db.Model):
     """Model for managing advertisement spaces"""
     id = db.Column(db.Integer, primary_key=True)
@@ -118,7 +189,73 @@ class Advertisement(db.Model):
     position = db.Column(db.String(50), nullable=False)  # 'header', 'sidebar', 'footer', 'between_results'
     is_active = db.Column(db.Boolean, default=True)
     link_url = db.Column(db.String(500))  # Optional link
+    weight = db.Column(db.Integer, nullable=False, default=1)  # Share of rotations within its position
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
         return f'<Advertisement {self.title} - {self.position}>'
+
+class AdvertisementDailyStats(db.Model):
+    """Per-day impression and click counts of each advertisement"""
+    __table_args__ = (
+        db.UniqueConstraint('day', 'advertisement_id', 'event_type', name='uq_advertisement_daily_stats'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    advertisement_id = db.Column(db.Integer, nullable=False, index=True)
+    event_type = db.Column(db.String(20), nullable=False)  # 'impression' or 'click'
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<AdvertisementDailyStats {self.day} #{self.advertisement_id} {self.event_type}={self.count}>'
+
+class DailyAnalytics(db.Model):
+    """Per-day event counts by action type, maintained as events are ingested"""
+    __table_args__ = (db.UniqueConstraint('day', 'action_type', name='uq_daily_analytics_day_action'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    action_type = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyAnalytics {self.day} {self.action_type}={self.count}>'
+
+class ProfessionalDailyAnalytics(db.Model):
+    """Per-day, per-professional event counts by action type"""
+    __table_args__ = (
+        db.UniqueConstraint('day', 'professional_id', 'action_type', name='uq_professional_daily_analytics'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    professional_id = db.Column(db.Integer, nullable=False, index=True)
+    action_type = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ProfessionalDailyAnalytics {self.day} #{self.professional_id} {self.action_type}={self.count}>'
+
+class DailyVisitorSketch(db.Model):
+    """HyperLogLog sketch of each day's distinct visitors (see visitor_sketches)"""
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, unique=True)
+    sketch = db.Column(db.LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f'<DailyVisitorSketch {self.day}>'
+
+class ProfessionalVisitorSketch(db.Model):
+    """HyperLogLog sketch of each day's distinct visitors of a professional's profile"""
+    __table_args__ = (
+        db.UniqueConstraint('day', 'professional_id', name='uq_professional_visitor_sketch'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    professional_id = db.Column(db.Integer, nullable=False, index=True)
+    sketch = db.Column(db.LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f'<ProfessionalVisitorSketch {self.day} #{self.professional_id}>'
@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import request, session
+from flask_login import current_user
+
+CacheEntry = namedtuple('CacheEntry', 'version body etag last_modified stored_at')
+
+
+class PageCache:
+    """LRU/TTL cache of rendered public pages for anonymous visitors.
+
+    Entries are tagged with the directory version they were rendered at, so
+    any admin add, edit or delete invalidates them. Every cached response
+    carries an ``ETag`` and ``Last-Modified`` header and conditional requests
+    get a 304 without re-rendering, unless a dynamic check claims the page
+    (see ``add_dynamic_check``).
+    """
+
+    def __init__(self, app=None, directory_version=None):
+        self.app = None
+        self.directory_version = directory_version
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._dynamic_checks = []
+        self.counters = {'hits': 0, 'misses': 0, 'not_modified': 0, 'bypassed': 0}
+        if app is not None:
+            self.init_app(app, directory_version)
+
+    def init_app(self, app, directory_version=None):
+        app.config.setdefault('PAGE_CACHE_SIZE', int(os.environ.get('PAGE_CACHE_SIZE', 512)))
+        app.config.setdefault('PAGE_CACHE_TTL', float(os.environ.get('PAGE_CACHE_TTL', 300)))
+        if directory_version is not None:
+            self.directory_version = directory_version
+        self.app = app
+        app.extensions['page_cache'] = self
+
+    def add_dynamic_check(self, check):
+        """Register ``check(body)``, telling whether a cached body will be
+        rewritten differently on this response after the view, like ad
+        slots getting an ad. Such responses are sent without validators and
+        never answered with a 304, which would leave the browser's previous
+        rewrite in place."""
+        if check not in self._dynamic_checks:
+            self._dynamic_checks.append(check)
+
+    def serve(self, render):
+        """Return a response for the current page, rendering only on a miss.
+
+        ``render()`` returns the HTML, or ``(html, last_modified)`` when the
+        page depends on a single record; list pages default to the time of
+        the last directory change.
+        """
+        if not self._cacheable():
+            self.counters['bypassed'] += 1
+            html, _ = self._split(render())
+            return html
+
+        key, version, directory_updated_at, entry = self._lookup()
+        if entry is None:
+            entry = self._store(key, version, directory_updated_at, *self._split(render()))
+        return self._respond(entry)
+
+    async def serve_async(self, render):
+        """``serve`` for the async views of ``asgi.py``: ``render()`` is a
+        coroutine function, awaited only on a miss"""
+        if not self._cacheable():
+            self.counters['bypassed'] += 1
+            html, _ = self._split(await render())
+            return html
+
+        # The directory version may be re-read from the database
+        key, version, directory_updated_at, entry = await asyncio.to_thread(self._lookup)
+        if entry is None:
+            entry = self._store(key, version, directory_updated_at, *self._split(await render()))
+        return self._respond(entry)
+
+    def _lookup(self):
+        version, directory_updated_at = self.directory_version.current()
+        key = request.full_path
+        entry = self._get(key, version)
+        if entry is None:
+            self.counters['misses'] += 1
+        else:
+            self.counters['hits'] += 1
+        return key, version, directory_updated_at, entry
+
+    def _store(self, key, version, directory_updated_at, html, last_modified):
+        body = html.encode('utf-8')
+        entry = CacheEntry(
+            version=version,
+            body=body,
+            etag=f'{version}-{hashlib.sha1(body).hexdigest()[:16]}',
+            last_modified=last_modified or directory_updated_at,
+            stored_at=time.monotonic(),
+        )
+        self._put(key, entry)
+        return entry
+
+    def _respond(self, entry):
+        response = self.app.response_class(entry.body, mimetype='text/html')
+        # Proxies may store the page but must revalidate it on every request
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+        if any(check(entry.body) for check in self._dynamic_checks):
+            return response
+        response.set_etag(entry.etag)
+        if entry.last_modified is not None:
+            response.last_modified = entry.last_modified
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            self.counters['not_modified'] += 1
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['size'] = len(self._entries)
+        return stats
+
+    def _cacheable(self):
+        # Pages for admins show their menu, and pending flash messages are
+        # rendered once; neither can be shared. Both live in the session,
+        # which is only read when there is a session cookie: reading it
+        # adds "Vary: Cookie" to the response.
+        if request.method != 'GET':
+            return False
+        if self.app.config['SESSION_COOKIE_NAME'] not in request.cookies:
+            # Without it the visitor is anonymous; storing that as
+            # Flask-Login's user for the request keeps the templates'
+            # ``current_user`` from loading it from the session
+            self.app.login_manager._update_request_context_with_user()
+            return True
+        return not current_user.is_authenticated and '_flashes' not in session
+
+    @staticmethod
+    def _split(result):
+        if isinstance(result, tuple):
+            return result
+        return result, None
+
+    def _get(self, key, version):
+        ttl = self.app.config['PAGE_CACHE_TTL']
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.version != version or time.monotonic() - entry.stored_at > ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.app.config['PAGE_CACHE_SIZE']:
+                self._entries.popitem(last=False)
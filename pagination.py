@@ -0,0 +1,89 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+# What a cursor may hold: the JSON scalars, and datetimes (``{"$dt": ...}``)
+CURSOR_VALUE_TYPES = (str, int, float, bool, type(None), datetime)
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(values):
+    """Serialize the sort key of the last row into an opaque URL-safe token"""
+    def default(value):
+        if isinstance(value, datetime):
+            return {'$dt': value.isoformat()}
+        raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+    raw = json.dumps(list(values), default=default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, length):
+    """Decode a token produced by ``encode_cursor`` into a list of values"""
+    def object_hook(obj):
+        if '$dt' in obj:
+            return datetime.fromisoformat(obj['$dt'])
+        return obj
+
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')), object_hook=object_hook)
+    except (binascii.Error, UnicodeError, ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor('Cursor does not match the sort order')
+    if not all(isinstance(value, CURSOR_VALUE_TYPES) for value in values):
+        raise InvalidCursor('Cursor values must be scalars')
+    return values
+
+
+def keyset_filter(columns, values):
+    """Build the WHERE clause selecting rows strictly after ``values``.
+
+    ``columns`` is a list of ``(expression, descending)`` pairs describing
+    the ORDER BY; the last one must be unique (usually the primary key).
+    """
+    clauses = []
+    for i, (column, descending) in enumerate(columns):
+        equal = [c == v for (c, _), v in zip(columns[:i], values[:i])]
+        after = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, after))
+    return or_(*clauses)
+
+
+def keyset_order(columns):
+    return [column.desc() if descending else column.asc() for column, descending in columns]
+
+
+def paginate_keyset(query, columns, key, cursor=None, per_page=20):
+    """Fetch one page of ``query`` ordered by ``columns``.
+
+    ``key(row)`` returns the sort values of a result row. Returns the rows of
+    the page and the cursor for the next one, or None on the last page.
+    """
+    rows = keyset_page(query, columns, cursor, per_page).all()
+    return split_page(rows, key, per_page)
+
+
+def keyset_page(query, columns, cursor=None, per_page=20):
+    """Restrict a query or ``select()`` to the page after ``cursor``, plus
+    one row telling whether another page follows; ``split_page`` takes
+    the rows it returns"""
+    if cursor:
+        query = query.filter(keyset_filter(columns, decode_cursor(cursor, len(columns))))
+    return query.order_by(*keyset_order(columns)).limit(per_page + 1)
+
+
+def split_page(rows, key, per_page):
+    """Return the rows of the page and the cursor for the next one"""
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(key(rows[-1]))
+    return rows, next_cursor
@@ -0,0 +1,129 @@
+import os
+from collections import Counter
+from datetime import datetime, time
+
+from sqlalchemy import bindparam, inspect, text, update
+
+# Scores are kept relative to this instant ("forward decay"). Event weights
+# double every half-life after it and overflow a float after ~1000 half-lives
+# (39 years at the default 14 days); with a much shorter half-life, move it
+# forward before then and run `flask rebuild-popularity`
+EPOCH = datetime(2025, 1, 1)
+
+# How much each tracked action adds to a professional's score
+ACTION_WEIGHTS = {
+    'profile_view': 1.0,
+    'contact_click': 3.0,
+}
+
+# "Top N" lookups the score is indexed for: overall among available
+# professionals (featured listings), and by specialty or location (search)
+INDEXES = {
+    'ix_professional_available_popularity': ('available', 'popularity'),
+    'ix_professional_specialty_popularity': ('specialty', 'popularity'),
+    'ix_professional_location_popularity': ('location', 'popularity'),
+}
+
+
+class PopularityRanking:
+    """Time-decayed popularity score of each professional.
+
+    Every profile view (and, weighted higher, contact click) adds
+    ``2 ** ((t - EPOCH) / half_life)`` to ``Professional.popularity`` in the
+    same transaction that ingests the event, so the weight of an event
+    relative to newer ones halves every ``POPULARITY_HALF_LIFE_DAYS``
+    without stored scores ever being rewritten. Ordering by the column is
+    therefore ordering by current decayed popularity, and the indexes on
+    it make "top N" a range scan instead of a query over ``Analytics``.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.counters = {'batches': 0, 'updates': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('POPULARITY_HALF_LIFE_DAYS',
+                              float(os.environ.get('POPULARITY_HALF_LIFE_DAYS', 14)))
+        self.app = app
+        app.extensions['popularity_ranking'] = self
+
+    def create(self):
+        """Add the score column and its indexes to a Professional table
+        created before they existed, computing initial scores from the
+        analytics rollups"""
+        from app import db
+
+        columns = {column['name'] for column in inspect(db.engine).get_columns('professional')}
+        with db.engine.begin() as conn:
+            if 'popularity' not in columns:
+                conn.execute(text("ALTER TABLE professional ADD COLUMN popularity FLOAT NOT NULL DEFAULT 0"))
+            for name, indexed in INDEXES.items():
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON professional ({', '.join(indexed)})"))
+        if 'popularity' not in columns:
+            self.rebuild()
+
+    def stats(self):
+        return dict(self.counters)
+
+    def weight(self, when):
+        """Score added by an event of weight 1 at ``when``"""
+        half_life = self.app.config['POPULARITY_HALF_LIFE_DAYS'] * 86400
+        return 2.0 ** ((when - EPOCH).total_seconds() / half_life)
+
+    def record_batch(self, rows):
+        """Add the events of a batch to the scores.
+
+        Registered as an ``analytics_ingestor`` batch handler, so it runs in
+        the same transaction that inserts the raw events.
+        """
+        deltas = Counter()
+        for row in rows:
+            action_weight = ACTION_WEIGHTS.get(row['action_type'])
+            if action_weight and row.get('target_type') == 'professional' and row.get('target_id') is not None:
+                deltas[row['target_id']] += action_weight * self.weight(row['created_at'])
+        self._add(deltas)
+        self.counters['batches'] += 1
+
+    def rebuild(self):
+        """Recompute every score from the per-professional daily rollups,
+        counting each day's events at noon. Returns the number of
+        professionals with a score."""
+        from app import db
+        from models import Professional, ProfessionalDailyAnalytics
+
+        scores = Counter()
+        rows = db.session.query(
+            ProfessionalDailyAnalytics.professional_id,
+            ProfessionalDailyAnalytics.day,
+            ProfessionalDailyAnalytics.action_type,
+            ProfessionalDailyAnalytics.count
+        ).filter(ProfessionalDailyAnalytics.action_type.in_(ACTION_WEIGHTS))
+        for professional_id, day, action_type, count in rows:
+            scores[professional_id] += ACTION_WEIGHTS[action_type] * count * self.weight(datetime.combine(day, time(12)))
+
+        table = Professional.__table__
+        db.session.execute(update(table).values(popularity=0, updated_at=table.c.updated_at))
+        self._add(scores)
+        db.session.commit()
+        return len(scores)
+
+    def _add(self, deltas):
+        from app import db
+        from models import Professional
+
+        if not deltas:
+            return
+        table = Professional.__table__
+        # A Core UPDATE: popularity is not an edit of the profile, so it must
+        # not bump updated_at (page ETags), the directory version or the
+        # search index the way an ORM flush would
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('professional_id')).values(
+                popularity=table.c.popularity + bindparam('delta'),
+                updated_at=table.c.updated_at
+            ),
+            [{'professional_id': professional_id, 'delta': delta} for professional_id, delta in deltas.items()]
+        )
+        self.counters['updates'] += len(deltas)
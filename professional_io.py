@@ -0,0 +1,284 @@
+import csv
+import io
+import json
+
+from sqlalchemy import func, select, tuple_
+from werkzeug.datastructures import MultiDict
+
+# Columns accepted on import, in export order
+IMPORT_FIELDS = [
+    'name', 'specialty', 'location', 'phone', 'plan', 'available',
+    'photo_url', 'address', 'schedule', 'whatsapp', 'contact_type',
+    'insurance_coverage', 'description', 'latitude', 'longitude',
+]
+EXPORT_FIELDS = ['id'] + IMPORT_FIELDS
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+IMPORT_BATCH_SIZE = 200
+EXPORT_CHUNK_SIZE = 500
+
+_FALSE_VALUES = ('', 'false', '0', 'no', 'n', 'f')
+
+
+class ImportFormatError(ValueError):
+    """Raised when an uploaded file cannot be parsed at all"""
+
+
+def iter_rows(stream, filename):
+    """Yield ``(row_number, row, error)`` from a CSV, JSON array or JSON Lines
+    file without reading it all into memory."""
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if filename.lower().endswith('.csv'):
+        return _iter_csv(text_stream)
+    return _iter_json(text_stream)
+
+
+def _iter_csv(text_stream):
+    reader = csv.DictReader(text_stream)
+    if not reader.fieldnames or 'name' not in reader.fieldnames:
+        raise ImportFormatError('El archivo CSV debe tener una fila de encabezado con la columna "name"')
+    # Row 1 is the header
+    for row_number, row in enumerate(reader, start=2):
+        yield row_number, row, None
+
+
+def _iter_json(text_stream, chunk_size=65536):
+    first = text_stream.read(1)
+    while first and first.isspace():
+        first = text_stream.read(1)
+    if not first:
+        return
+    if first != '[':
+        # JSON Lines: one object per line
+        line = first + text_stream.readline()
+        row_number = 1
+        while line:
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield row_number, None, f'JSON inválido: {e}'
+                else:
+                    if isinstance(row, dict):
+                        yield row_number, row, None
+                    else:
+                        yield row_number, None, 'Se esperaba un objeto JSON'
+            row_number += 1
+            line = text_stream.readline()
+        return
+
+    # JSON array: decode one element at a time from a sliding buffer
+    decoder = json.JSONDecoder()
+    buffer = ''
+    row_number = 0
+    exhausted = False
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(','):
+            buffer = buffer[1:]
+            continue
+        if buffer.startswith(']'):
+            return
+        try:
+            if not buffer:
+                raise ValueError('empty buffer')
+            row, end = decoder.raw_decode(buffer)
+        except ValueError:
+            if exhausted:
+                raise ImportFormatError('El archivo JSON está incompleto o mal formado')
+            chunk = text_stream.read(chunk_size)
+            exhausted = not chunk
+            buffer += chunk
+            continue
+        row_number += 1
+        buffer = buffer[end:]
+        if isinstance(row, dict):
+            yield row_number, row, None
+        else:
+            yield row_number, None, 'Se esperaba un objeto JSON'
+
+
+def _form_data(row):
+    """Turn an imported row into form data for ProfessionalForm"""
+    data = MultiDict()
+    for field in IMPORT_FIELDS:
+        value = row.get(field)
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = 'y' if value else ''
+        data[field] = str(value).strip()
+    # Same defaults the add form starts with
+    if 'available' not in data:
+        data['available'] = 'y'
+    elif data['available'].lower() in _FALSE_VALUES:
+        data['available'] = ''
+    if not data.get('plan'):
+        data['plan'] = 'basic'
+    if not data.get('contact_type'):
+        data['contact_type'] = 'phone'
+    return data
+
+
+def professional_values(form):
+    """Model attributes from a validated ProfessionalForm"""
+    return {
+        'name': form.name.data,
+        'specialty': form.specialty.data,
+        'location': form.location.data,
+        'phone': form.phone.data,
+        'plan': form.plan.data,
+        'available': form.available.data,
+        'photo_url': form.photo_url.data or None,
+        'address': form.address.data or None,
+        'schedule': form.schedule.data or None,
+        'whatsapp': form.whatsapp.data or None,
+        'contact_type': form.contact_type.data,
+        'insurance_coverage': form.insurance_coverage.data or None,
+        'description': form.description.data or None,
+        'latitude': form.latitude.data,
+        'longitude': form.longitude.data,
+    }
+
+
+def validate_row(row):
+    """Validate a row with the same rules as the admin form.
+
+    Returns ``(values, errors)``; ``errors`` maps field names to messages.
+    Must run inside a request context, as any FlaskForm.
+    """
+    from forms import ProfessionalForm
+
+    form = ProfessionalForm(formdata=_form_data(row), meta={'csrf': False})
+    if not form.validate():
+        return None, {field: list(messages) for field, messages in form.errors.items()}
+    return professional_values(form), None
+
+
+def import_professionals(rows, batch_size=IMPORT_BATCH_SIZE):
+    """Validate and upsert rows from ``iter_rows`` in batches.
+
+    A row with an ``id`` updates that professional; otherwise it updates the
+    professional with the same name and phone, or creates a new one. Each
+    batch is committed on its own, so an error never undoes earlier batches;
+    a batch that fails is retried row by row to report the rows at fault.
+    Returns a report with created/updated counts and per-row errors.
+    """
+    report = {'rows': 0, 'created': 0, 'updated': 0, 'errors': []}
+    batch = []
+    for row_number, row, error in rows:
+        report['rows'] += 1
+        if error:
+            report['errors'].append({'row': row_number, 'errors': {'_': [error]}})
+            continue
+        values, errors = validate_row(row)
+        if errors:
+            report['errors'].append({'row': row_number, 'errors': errors})
+            continue
+        row_id = str(row.get('id') or '').strip()
+        if row_id and not row_id.isdigit():
+            report['errors'].append({'row': row_number, 'errors': {'id': ['Debe ser un número entero']}})
+            continue
+        batch.append((row_number, int(row_id) if row_id else None, values))
+        if len(batch) >= batch_size:
+            _upsert_batch(batch, report)
+            batch = []
+    if batch:
+        _upsert_batch(batch, report)
+    return report
+
+
+def _upsert_batch(batch, report):
+    from app import db
+    from models import Professional
+
+    ids = [row_id for _, row_id, _ in batch if row_id]
+    keys = [(values['name'], values['phone']) for _, row_id, values in batch if not row_id]
+    by_id = {}
+    by_key = {}
+    if ids:
+        by_id = {p.id: p for p in Professional.query.filter(Professional.id.in_(ids))}
+    if keys:
+        by_key = {
+            (p.name, p.phone): p
+            for p in Professional.query.filter(tuple_(Professional.name, Professional.phone).in_(keys))
+        }
+
+    created = updated = 0
+    errors = []
+    for row_number, row_id, values in batch:
+        if row_id:
+            professional = by_id.get(row_id)
+            if professional is None:
+                errors.append({'row': row_number, 'errors': {'id': [f'No existe un profesional con id {row_id}']}})
+                continue
+        else:
+            professional = by_key.get((values['name'], values['phone']))
+
+        if professional is None:
+            professional = Professional(**values)
+            db.session.add(professional)
+            by_key[(values['name'], values['phone'])] = professional
+            created += 1
+        else:
+            for field, value in values.items():
+                setattr(professional, field, value)
+            professional.updated_at = func.now()
+            updated += 1
+
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        if len(batch) > 1:
+            # Find the offending rows and still save the others
+            for item in batch:
+                _upsert_batch([item], report)
+        else:
+            report['errors'].append({'row': batch[0][0], 'errors': {'_': [f'No se pudo guardar: {_first_line(e)}']}})
+        return
+    report['created'] += created
+    report['updated'] += updated
+    report['errors'].extend(errors)
+
+
+def _first_line(error):
+    # Database errors carry the driver's message in ``orig``, without the SQL
+    return str(getattr(error, 'orig', None) or error).splitlines()[0]
+
+
+def export_professionals(fmt):
+    """Yield the whole directory as CSV or JSON Lines, chunk by chunk.
+
+    Rows are read with ``yield_per`` so PostgreSQL uses a server-side cursor
+    and memory stays flat regardless of table size.
+    """
+    from app import db
+    from models import Professional
+
+    columns = [Professional.__table__.c[field] for field in EXPORT_FIELDS]
+    result = db.session.execute(
+        select(*columns).order_by(Professional.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(EXPORT_FIELDS)
+
+    for partition in result.partitions():
+        for row in partition:
+            record = dict(row._mapping)
+            if fmt == 'csv':
+                record['available'] = 'true' if record['available'] else 'false'
+                writer.writerow(['' if record[field] is None else record[field] for field in EXPORT_FIELDS])
+            else:
+                buffer.write(json.dumps(record, ensure_ascii=False) + '\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
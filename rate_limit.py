@@ -0,0 +1,292 @@
+import asyncio
+import inspect
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import wraps
+from urllib.parse import urlparse
+
+from flask import current_app, jsonify, request
+
+try:
+    import redis
+except ImportError:  # optional: only needed for redis:// storage
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Crawlers, monitors and HTTP libraries; an empty User-Agent counts as a bot
+_BOT_RE = re.compile(
+    r'bot\b|bot/|crawl|spider|slurp|scrap|fetch|monitor|preview|archiver|facebookexternalhit|'
+    r'headless|phantomjs|curl/|wget/|httpie|python-requests|python-urllib|aiohttp|httpx|'
+    r'go-http-client|java/|okhttp|libwww|scrapy|node-fetch|axios',
+    re.IGNORECASE
+)
+
+
+def is_bot(user_agent):
+    """Classify a User-Agent header as automated traffic"""
+    return not user_agent or bool(_BOT_RE.search(user_agent))
+
+
+def client_ip():
+    """Client address, as seen by the first trusted proxy.
+
+    ``ProxyFix`` (``TRUSTED_PROXIES`` in create_app) has already replaced
+    the peer address with the X-Forwarded-For entry that proxy added; the
+    entries to its left are whatever the client sent and never used.
+    """
+    return request.remote_addr
+
+
+def parse_limit(value):
+    """Parse "30/minute" into ``(capacity, refill_per_second)``"""
+    count, _, period = value.partition('/')
+    count = int(count)
+    if period.isdigit():
+        seconds = int(period)
+    else:
+        seconds = _PERIODS[period.strip().rstrip('s')]
+    return count, count / seconds
+
+
+def _refill(tokens, updated_at, now, rate, capacity):
+    if tokens is None:
+        return capacity
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+class MemoryStorage:
+    """Token buckets in this process; fine for a single worker"""
+
+    MAX_KEYS = 100000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, capacity, cost=1, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (None, now))
+            tokens = _refill(tokens, updated_at, now, rate, capacity)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.MAX_KEYS:
+                self._evict(now)
+        return allowed, tokens
+
+    def _evict(self, now):
+        # A bucket idle for an hour is full again, so forgetting it is exact
+        # for any limit that refills within the hour
+        stale = [key for key, (_, updated_at) in self._buckets.items() if now - updated_at > 3600]
+        for key in stale:
+            del self._buckets[key]
+
+
+class SQLiteStorage:
+    """Token buckets in a SQLite file shared by all workers on one host"""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def consume(self, key, rate, capacity, cost=1, now=None):
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM rate_limit WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(row[0] if row else None, row[1] if row else now, now, rate, capacity)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                "INSERT INTO rate_limit (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now)
+            )
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM rate_limit WHERE updated_at < ?", (now - 3600,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, tokens
+
+
+class RedisStorage:
+    """Token buckets in Redis (or any server speaking its protocol) shared by
+    every worker and host. The update runs as one Lua script, so it is
+    atomic without round trips for locking."""
+
+    SCRIPT = """
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local rate, capacity = tonumber(ARGV[1]), tonumber(ARGV[2])
+    local now, cost = tonumber(ARGV[3]), tonumber(ARGV[4])
+    local tokens = tonumber(state[1])
+    if tokens == nil then
+        tokens = capacity
+    else
+        tokens = math.min(capacity, tokens + math.max(0, now - tonumber(state[2])) * rate)
+    end
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError('RATE_LIMIT_STORAGE_URL uses redis:// but the redis package is not installed')
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def consume(self, key, rate, capacity, cost=1, now=None):
+        now = time.time() if now is None else now
+        allowed, tokens = self._script(keys=[f'rate_limit:{key}'], args=[rate, capacity, now, cost])
+        return bool(allowed), float(tokens)
+
+
+def storage_from_url(url):
+    """``memory://``, ``sqlite:///path/to/file.db`` or ``redis://host:6379/0``"""
+    scheme = urlparse(url).scheme
+    if scheme == 'memory':
+        return MemoryStorage()
+    if scheme == 'sqlite':
+        return SQLiteStorage(url[len('sqlite:///'):])
+    if scheme in ('redis', 'rediss', 'unix'):
+        return RedisStorage(url)
+    raise ValueError(f'Unsupported RATE_LIMIT_STORAGE_URL: {url}')
+
+
+class RateLimiter:
+    """Per-IP token-bucket rate limiting for expensive public endpoints.
+
+    Views decorated with ``limit(name)`` draw one token from the client's
+    bucket for that rule before doing any work; an empty bucket gets a
+    short 429 with ``Retry-After`` instead. Rules come from
+    ``RATE_LIMIT_<NAME>`` (e.g. "30/minute": a burst of 30 refilled at 30 per
+    minute), and clients classified as bots use the stricter
+    ``RATE_LIMIT_BOT_<NAME>``. Buckets live in ``RATE_LIMIT_STORAGE_URL``;
+    if the store fails, requests are let through.
+    """
+
+    DEFAULT_LIMITS = {
+        'SEARCH': ('60/minute', '10/minute'),
+        'API': ('120/minute', '20/minute'),
+    }
+
+    def __init__(self, app=None):
+        self.app = None
+        self.storage = None
+        self.counters = {'allowed': 0, 'limited': 0, 'bot_requests': 0, 'storage_errors': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMIT_ENABLED', os.environ.get('RATE_LIMIT_ENABLED', '1') != '0')
+        app.config.setdefault('RATE_LIMIT_STORAGE_URL', os.environ.get('RATE_LIMIT_STORAGE_URL', 'memory://'))
+        for name, (limit, bot_limit) in self.DEFAULT_LIMITS.items():
+            app.config.setdefault(f'RATE_LIMIT_{name}', os.environ.get(f'RATE_LIMIT_{name}', limit))
+            app.config.setdefault(f'RATE_LIMIT_BOT_{name}', os.environ.get(f'RATE_LIMIT_BOT_{name}', bot_limit))
+        self.app = app
+        self.storage = None
+        app.extensions['rate_limiter'] = self
+
+    def _storage(self):
+        # Created on first use so a preloading master opens no files or sockets
+        if self.storage is None:
+            self.storage = storage_from_url(self.app.config['RATE_LIMIT_STORAGE_URL'])
+        return self.storage
+
+    def stats(self):
+        return dict(self.counters)
+
+    def check(self, name):
+        """Draw a token for rule ``name``; return seconds to wait when limited"""
+        if not self.app.config['RATE_LIMIT_ENABLED']:
+            return None
+        bot = is_bot(request.headers.get('User-Agent'))
+        if bot:
+            self.counters['bot_requests'] += 1
+        rule = f"RATE_LIMIT_{'BOT_' if bot else ''}{name.upper()}"
+        capacity, rate = parse_limit(self.app.config[rule])
+        try:
+            allowed, tokens = self._storage().consume(f'{name}:{client_ip()}', rate, capacity)
+        except Exception as e:
+            self.counters['storage_errors'] += 1
+            logger.warning(f"Rate limit storage unavailable, allowing request: {e}")
+            return None
+        if allowed:
+            self.counters['allowed'] += 1
+            return None
+        self.counters['limited'] += 1
+        return max(1, math.ceil((1 - tokens) / rate))
+
+    def limit(self, name):
+        """Decorator applying rule ``name`` to a view, sync or async"""
+        def decorator(view):
+            if inspect.iscoroutinefunction(view):
+                @wraps(view)
+                async def wrapped_async(*args, **kwargs):
+                    # SQLite and Redis buckets block; keep them off the event loop
+                    if isinstance(self._storage(), MemoryStorage):
+                        retry_after = self.check(name)
+                    else:
+                        retry_after = await asyncio.to_thread(self.check, name)
+                    if retry_after is not None:
+                        return self._too_many_requests(retry_after)
+                    return await view(*args, **kwargs)
+                return wrapped_async
+
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                retry_after = self.check(name)
+                if retry_after is not None:
+                    return self._too_many_requests(retry_after)
+                return view(*args, **kwargs)
+            return wrapped
+        return decorator
+
+    @staticmethod
+    def _too_many_requests(retry_after):
+        message = 'Demasiadas solicitudes. Intente nuevamente en unos segundos.'
+        if request.path.startswith('/api/'):
+            response = jsonify({'error': message})
+        else:
+            response = current_app.response_class(message, mimetype='text/plain')
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
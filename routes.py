@@ -1,83 +1,122 @@
-from flask import render_template, request, redirect, url_for, flash, abort, jsonify
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, abort, jsonify, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash, generate_password_hash
-from sqlalchemy import or_, and_, func
-from app import app, db
+from sqlalchemy import or_, and_, func, select
+from app import db, analytics_ingestor, search_index, geo_index, page_cache, login_manager, request_metrics, rate_limiter, autocomplete_index, db_router, directory_stats, ad_server, facet_index
 from models import Admin, Professional, Analytics, Advertisement, SPECIALTIES
-from forms import LoginForm, ProfessionalForm, SearchForm
+from forms import LoginForm, ProfessionalForm, SearchForm, ImportForm
 from datetime import datetime, timedelta
+import hmac
+from pagination import InvalidCursor, encode_cursor, keyset_page, paginate_keyset, split_page
+from rate_limit import client_ip, is_bot
+import analytics_export
+import analytics_rollups
+import professional_io
+import visitor_sketches
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_SORTS = ('relevance', 'popular')
+SEARCH_API_MAX_LIMIT = 50
+NEARBY_DEFAULT_RADIUS_KM = 25.0
+NEARBY_MAX_RADIUS_KM = 200.0
+# Specialties linked from the homepage
+PRIORITY_SPECIALTIES = ['Pediatría', 'Ginecología', 'Odontología', 'Psicología']
+
+bp = Blueprint('main', __name__)
 
 def track_analytics(action_type, target_id=None, target_type=None):
-    """Helper function to track user analytics"""
+    """Helper function to track user analytics.
+
+    Events are queued and written in batches by ``analytics_ingestor`` so
+    public pages never wait on an analytics commit. Crawlers are not
+    tracked.
+    """
+    user_agent = request.headers.get('User-Agent')
+    if is_bot(user_agent):
+        return
     try:
-        analytics = Analytics(
-            action_type=action_type,
+        analytics_ingestor.track(
+            action_type,
             target_id=target_id,
             target_type=target_type,
-            user_ip=request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr),
-            user_agent=request.headers.get('User-Agent'),
+            user_ip=client_ip(),
+            user_agent=user_agent,
             referrer=request.headers.get('Referer')
         )
-        db.session.add(analytics)
-        db.session.commit()
     except Exception as e:
         print(f"Analytics tracking error: {e}")
 
-@app.route('/')
+@bp.route('/')
+@db_router.replica_reads
 def index():
     """Homepage with search and quick access categories"""
-    form = SearchForm()
+    response = page_cache.serve(render_index)
     
-    # Get quick access categories with counts
-    quick_categories = []
-    priority_specialties = ['Pediatría', 'Ginecología', 'Odontología', 'Psicología']
+    # Track page view, after the reads replica_reads may retry
+    track_analytics('page_view', target_type='homepage')
     
-    for specialty in priority_specialties:
-        count = Professional.query.filter_by(specialty=specialty, available=True).count()
-        quick_categories.append({
-            'name': specialty,
-            'count': count,
-            'url': url_for('search', specialty=specialty)
-        })
+    return response
+
+def render_index():
+    form = SearchForm()
     
-    # Get some featured professionals (only available ones)
-    featured_professionals = Professional.query.filter_by(available=True).limit(6).all()
+    # Get quick access categories with counts
+    counts = facet_index.facet_counts('specialty', available_only=True)
     
-    # Track page view
-    track_analytics('page_view', target_type='homepage')
+    # Featured professionals: the most popular available ones
+    featured_professionals = Professional.query.filter_by(available=True).order_by(
+        Professional.popularity.desc(), Professional.id
+    ).limit(6).all()
     
     return render_template('index.html', 
                          form=form, 
-                         quick_categories=quick_categories,
+                         quick_categories=quick_categories(counts),
                          featured_professionals=featured_professionals)
 
-@app.route('/buscar')
-def search():
-    """Search professionals with filters"""
-    form = SearchForm()
-    
-    # Get search parameters from URL or form
-    query = request.args.get('query', '').strip()
-    specialty = request.args.get('specialty', '')
-    location = request.args.get('location', '')
-    available_only = request.args.get('available_only', 'true').lower() == 'true'
+def quick_categories(counts):
+    """Homepage quick access categories from ``{specialty: count}``"""
+    return [
+        {
+            'name': specialty,
+            'count': counts.get(specialty, 0),
+            'url': url_for('main.search', specialty=specialty)
+        }
+        for specialty in PRIORITY_SPECIALTIES
+    ]
+
+def filter_professionals(professionals_query, specialty, location, available_only):
+    """Apply the specialty, location and availability filters"""
+    if specialty:
+        professionals_query = professionals_query.filter(Professional.specialty == specialty)
     
-    # Track search analytics if there are search parameters
-    if query or specialty or location:
-        track_analytics('search', target_type='search')
+    if location:
+        professionals_query = professionals_query.filter(Professional.location == location)
     
-    # Populate form with current values
-    form.query.data = query
-    form.specialty.data = specialty
-    form.location.data = location
-    form.available_only.data = available_only
+    if available_only:
+        professionals_query = professionals_query.filter(Professional.available == True)
     
-    # Build query
-    professionals_query = Professional.query
+    return professionals_query
+
+def search_statement(query, specialty, location, available_only, cursor=None, per_page=SEARCH_PAGE_SIZE,
+                     sort='relevance'):
+    """Build the SELECT for one keyset page of search results.
+
+    Returns the statement, whose rows start with the professional, and the
+    sort key of a row for ``split_page``. Results are ordered by relevance
+    (text queries only), or by time-decayed popularity with ``sort='popular'``,
+    then plan (premium first), then name, with the id as a unique
+    tie-breaker. Raises InvalidCursor if ``cursor`` is malformed.
+    """
+    statement = select(Professional)
     
     # Apply filters
-    if query:
-        professionals_query = professionals_query.filter(
+    match = search_index.match(query) if query else None
+    if match is not None:
+        statement = statement.join(
+            match, match.c.professional_id == Professional.id
+        ).add_columns(match.c.rank)
+    elif query:
+        statement = statement.filter(
             or_(
                 Professional.name.ilike(f'%{query}%'),
                 Professional.specialty.ilike(f'%{query}%'),
@@ -85,43 +124,232 @@ def search():
             )
         )
     
-    if specialty:
-        professionals_query = professionals_query.filter(Professional.specialty == specialty)
+    statement = filter_professionals(statement, specialty, location, available_only)
     
-    if location:
-        professionals_query = professionals_query.filter(Professional.location == location)
+    columns = [
+        (func.coalesce(Professional.plan, 'basic'), True),  # premium first
+        (Professional.name, False),
+        (Professional.id, False),
+    ]
+    if sort == 'popular':
+        columns.insert(0, (Professional.popularity, True))
+        key = lambda row: (row[0].popularity, row[0].plan or 'basic', row[0].name, row[0].id)
+    elif match is None:
+        key = lambda row: (row[0].plan or 'basic', row[0].name, row[0].id)
+    else:
+        columns.insert(0, (match.c.rank, False))
+        key = lambda row: (row.rank, row[0].plan or 'basic', row[0].name, row[0].id)
+    return keyset_page(statement, columns, cursor=cursor, per_page=per_page), key
+
+def search_professionals(query, specialty, location, available_only, cursor=None, per_page=SEARCH_PAGE_SIZE,
+                         sort='relevance'):
+    """Return one keyset-paginated page of search results and the next cursor.
+
+    Raises InvalidCursor if ``cursor`` is malformed.
+    """
+    statement, key = search_statement(query, specialty, location, available_only, cursor, per_page, sort)
+    rows, next_cursor = split_page(db.session.execute(statement).all(), key, per_page)
+    return [row[0] for row in rows], next_cursor
+
+def get_search_args():
+    """Read the search filters shared by /buscar and /api/buscar"""
+    return (
+        request.args.get('query', '').strip(),
+        request.args.get('specialty', ''),
+        request.args.get('location', ''),
+        request.args.get('available_only', 'true').lower() == 'true',
+    )
+
+def get_sort_arg():
+    """Search result order: 'relevance' (default) or 'popular'"""
+    sort = request.args.get('sort', '')
+    return sort if sort in SEARCH_SORTS else 'relevance'
+
+@bp.route('/buscar')
+@rate_limiter.limit('search')
+@db_router.replica_reads
+def search():
+    """Search professionals with filters"""
+    # Get search parameters from URL or form
+    query, specialty, location, available_only = get_search_args()
+    sort = get_sort_arg()
+    cursor = request.args.get('cursor') or None
     
-    if available_only:
-        professionals_query = professionals_query.filter(Professional.available == True)
+    response = page_cache.serve(
+        lambda: render_search(query, specialty, location, available_only, cursor, sort)
+    )
     
-    # Order by plan (premium first) then by name
-    professionals = professionals_query.order_by(
-        Professional.plan.desc(),  # premium first
-        Professional.name
-    ).all()
+    # Track search analytics if there are search parameters (first page
+    # only), after the reads replica_reads may retry
+    if (query or specialty or location) and not cursor:
+        track_analytics('search', target_type='search')
+    
+    return response
+
+def render_search(query, specialty, location, available_only, cursor, sort):
+    try:
+        professionals, next_cursor = search_professionals(
+            query, specialty, location, available_only, cursor=cursor, sort=sort
+        )
+    except InvalidCursor:
+        professionals, next_cursor = search_professionals(
+            query, specialty, location, available_only, sort=sort
+        )
+    
+    return render_search_results(professionals, next_cursor, query, specialty, location, available_only, sort)
+
+def render_search_results(professionals, next_cursor, query, specialty, location, available_only, sort):
+    form = SearchForm()
+    
+    # Populate form with current values
+    form.query.data = query
+    form.specialty.data = specialty
+    form.location.data = location
+    form.available_only.data = available_only
+    form.sort.data = sort
+    
+    # Without a text query the filters alone decide the results, so the
+    # facet index can give their exact total and the count behind every
+    # other option of each dropdown
+    total = None
+    if not query:
+        total = facet_index.count(specialty or None, location or None, available_only)
+        add_facet_counts(form.specialty, facet_index.facet_counts(
+            'specialty', location=location or None, available_only=available_only))
+        add_facet_counts(form.location, facet_index.facet_counts(
+            'location', specialty=specialty or None, available_only=available_only))
     
     return render_template('search.html', 
                          form=form, 
                          professionals=professionals,
+                         next_cursor=next_cursor,
                          query=query,
                          specialty=specialty,
-                         location=location)
+                         location=location,
+                         available_only=available_only,
+                         sort=sort,
+                         total=total)
+
+def add_facet_counts(field, counts):
+    """Append ``counts`` ({value: n}) to the labels of a filter select"""
+    field.choices = [
+        (value, f'{label} ({counts.get(value, 0)})' if value else label)
+        for value, label in field.choices
+    ]
+
+@bp.route('/api/buscar')
+@rate_limiter.limit('api')
+def api_search():
+    """JSON search results, one keyset page at a time"""
+    query, specialty, location, available_only = get_search_args()
+    cursor = request.args.get('cursor') or None
+    limit = get_api_limit()
+    
+    if (query or specialty or location) and not cursor:
+        track_analytics('search', target_type='search')
+    
+    try:
+        professionals, next_cursor = search_professionals(
+            query, specialty, location, available_only, cursor=cursor, per_page=limit, sort=get_sort_arg()
+        )
+    except InvalidCursor:
+        return jsonify({'error': 'Cursor inválido'}), 400
+    
+    results = [professional_result(professional) for professional in professionals]
+    return jsonify({'results': results, 'next_cursor': next_cursor})
+
+def get_api_limit():
+    """Page size requested from a JSON API, within bounds"""
+    limit = request.args.get('limit', SEARCH_PAGE_SIZE, type=int)
+    return max(1, min(limit, SEARCH_API_MAX_LIMIT))
+
+def professional_result(professional):
+    """A professional as returned by the JSON APIs"""
+    data = professional.to_dict()
+    data['url'] = url_for('main.professional_detail', professional_id=professional.id)
+    return data
+
+@bp.route('/api/autocomplete')
+def api_autocomplete():
+    """Search box suggestions, served from memory"""
+    query = request.args.get('q', '').strip()[:100]
+    suggestions = autocomplete_index.suggest(query)
+    for suggestion in suggestions:
+        if suggestion['type'] == 'professional':
+            suggestion['url'] = url_for('main.professional_detail', professional_id=suggestion['id'])
+        else:
+            suggestion['url'] = url_for('main.search', **{suggestion['type']: suggestion['label']})
+    response = jsonify({'query': query, 'suggestions': suggestions})
+    response.cache_control.public = True
+    response.cache_control.max_age = 60
+    return response
 
-@app.route('/profesional/<int:professional_id>')
+@bp.route('/api/cerca')
+@rate_limiter.limit('api')
+def api_nearby():
+    """Professionals closest to a point, sorted by distance"""
+    point = get_point_args()
+    if point is None:
+        return jsonify({'error': 'Coordenadas inválidas'}), 400
+    
+    lat, lng, radius_km = point
+    limit = get_api_limit()
+    _, specialty, location, available_only = get_search_args()
+    
+    track_analytics('search', target_type='search')
+    
+    professionals_query = filter_professionals(Professional.query, specialty, location, available_only)
+    nearby = geo_index.nearby(professionals_query, lat, lng, radius_km, limit)
+    return jsonify({'results': nearby_results(nearby), 'radius_km': radius_km})
+
+def get_point_args():
+    """Read ``(lat, lng, radius_km)`` for /api/cerca; None when the
+    coordinates are missing or out of range"""
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    radius_km = request.args.get('radius_km', NEARBY_DEFAULT_RADIUS_KM, type=float)
+    return lat, lng, max(0.1, min(radius_km, NEARBY_MAX_RADIUS_KM))
+
+def nearby_results(nearby):
+    results = []
+    for professional, distance in nearby:
+        data = professional_result(professional)
+        data['distance_km'] = round(distance, 2)
+        results.append(data)
+    return results
+
+@bp.route('/profesional/<int:professional_id>')
+@db_router.replica_reads
 def professional_detail(professional_id):
     """Individual professional profile page"""
-    professional = Professional.query.filter_by(id=professional_id, available=True).first_or_404()
+    response = page_cache.serve(lambda: render_professional(professional_id))
     
-    # Track profile view
+    # Track profile view (only reached if the profile exists)
     track_analytics('profile_view', target_id=professional_id, target_type='professional')
     
-    return render_template('professional.html', professional=professional)
+    return response
 
-@app.route('/login', methods=['GET', 'POST'])
+def render_professional(professional_id):
+    professional = Professional.query.filter_by(id=professional_id, available=True).first_or_404()
+    html = render_template('professional.html', professional=professional)
+    return html, professional.updated_at
+
+@bp.route('/anuncio/<int:ad_id>')
+def advertisement_click(ad_id):
+    """Count a click on an advertisement and send the visitor to its link"""
+    link_url = ad_server.link(ad_id)
+    if not link_url:
+        abort(404)
+    ad_server.record(ad_id, 'click')
+    return redirect(link_url)
+
+@bp.route('/login', methods=['GET', 'POST'])
 def admin_login():
     """Admin login page"""
     if current_user.is_authenticated:
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     
     form = LoginForm()
     if form.validate_on_submit():
@@ -130,25 +358,24 @@ def admin_login():
             login_user(admin)
             next_page = request.args.get('next')
             flash('Sesión iniciada correctamente', 'success')
-            return redirect(next_page) if next_page else redirect(url_for('admin_dashboard'))
+            return redirect(next_page) if next_page else redirect(url_for('main.admin_dashboard'))
         else:
             flash('Usuario o contraseña incorrectos', 'error')
     
     return render_template('admin/login.html', form=form)
 
-@app.route('/admin/logout')
+@bp.route('/admin/logout')
 @login_required
 def admin_logout():
     """Admin logout"""
     logout_user()
     flash('Sesión cerrada correctamente', 'info')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/admin')
+@bp.route('/admin')
 @login_required
 def admin_dashboard():
     """Admin dashboard with professional management"""
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '').strip()
     
     # Build query
@@ -162,56 +389,59 @@ def admin_dashboard():
             )
         )
     
-    professionals = query.order_by(Professional.created_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    # Newest first, by keyset on (created_at, id): ``cursor`` pages forward,
+    # ``before`` pages back
+    columns = [(Professional.created_at, True), (Professional.id, True)]
+    key = lambda p: (p.created_at, p.id)
+    cursor = request.args.get('cursor') or None
+    before = request.args.get('before') or None
+    try:
+        if before:
+            reversed_columns = [(column, not descending) for column, descending in columns]
+            professionals, prev_cursor = paginate_keyset(query, reversed_columns, key, cursor=before, per_page=20)
+            professionals.reverse()
+            next_cursor = encode_cursor(key(professionals[-1])) if professionals else None
+        else:
+            professionals, next_cursor = paginate_keyset(query, columns, key, cursor=cursor, per_page=20)
+            prev_cursor = encode_cursor(key(professionals[0])) if cursor and professionals else None
+    except InvalidCursor:
+        return redirect(url_for('main.admin_dashboard', search=search or None))
     
-    # Statistics
-    stats = {
-        'total': Professional.query.count(),
-        'basic': Professional.query.filter_by(plan='basic').count(),
-        'premium': Professional.query.filter_by(plan='premium').count(),
-        'available': Professional.query.filter_by(available=True).count()
+    # Statistics, from counters kept up to date on every change
+    stats = directory_stats.current()
+    breakdown = {
+        facet: [
+            (value, total, facet_index.count(available_only=True, **{facet: value}))
+            for value, total in sorted(facet_index.facet_counts(facet).items())
+        ]
+        for facet in ('specialty', 'location')
     }
     
     return render_template('admin/dashboard.html', 
                          professionals=professionals, 
+                         next_cursor=next_cursor,
+                         prev_cursor=prev_cursor,
                          stats=stats,
+                         breakdown=breakdown,
                          search=search)
 
-@app.route('/admin/profesional/nuevo', methods=['GET', 'POST'])
+@bp.route('/admin/profesional/nuevo', methods=['GET', 'POST'])
 @login_required
 def admin_add_professional():
     """Add new professional"""
     form = ProfessionalForm()
     
     if form.validate_on_submit():
-        professional = Professional(
-            name=form.name.data,
-            specialty=form.specialty.data,
-            location=form.location.data,
-            phone=form.phone.data,
-            plan=form.plan.data,
-            available=form.available.data,
-            photo_url=form.photo_url.data or None,
-            address=form.address.data or None,
-            schedule=form.schedule.data or None,
-            whatsapp=form.whatsapp.data or None,
-            contact_type=form.contact_type.data,
-            insurance_coverage=form.insurance_coverage.data or None,
-            description=form.description.data or None,
-            latitude=form.latitude.data,
-            longitude=form.longitude.data
-        )
+        professional = Professional(**professional_io.professional_values(form))
         
         db.session.add(professional)
         db.session.commit()
         flash(f'Profesional {professional.name} agregado correctamente', 'success')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     
     return render_template('admin/professional_form.html', form=form, title='Agregar Profesional')
 
-@app.route('/admin/profesional/<int:professional_id>/editar', methods=['GET', 'POST'])
+@bp.route('/admin/profesional/<int:professional_id>/editar', methods=['GET', 'POST'])
 @login_required
 def admin_edit_professional(professional_id):
     """Edit existing professional"""
@@ -223,14 +453,14 @@ def admin_edit_professional(professional_id):
         professional.updated_at = db.func.now()
         db.session.commit()
         flash(f'Profesional {professional.name} actualizado correctamente', 'success')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     
     return render_template('admin/professional_form.html', 
                          form=form, 
                          title='Editar Profesional',
                          professional=professional)
 
-@app.route('/admin/profesional/<int:professional_id>/eliminar', methods=['POST'])
+@bp.route('/admin/profesional/<int:professional_id>/eliminar', methods=['POST'])
 @login_required
 def admin_delete_professional(professional_id):
     """Delete professional"""
@@ -239,92 +469,177 @@ def admin_delete_professional(professional_id):
     db.session.delete(professional)
     db.session.commit()
     flash(f'Profesional {name} eliminado correctamente', 'success')
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('main.admin_dashboard'))
 
-@app.errorhandler(404)
+@bp.route('/admin/profesionales/importar', methods=['GET', 'POST'])
+@login_required
+def admin_import_professionals():
+    """Bulk import professionals from a CSV or JSON file"""
+    form = ImportForm()
+    report = None
+    
+    if form.validate_on_submit():
+        upload = form.file.data
+        try:
+            report = professional_io.import_professionals(
+                professional_io.iter_rows(upload.stream, upload.filename)
+            )
+        except professional_io.ImportFormatError as e:
+            flash(str(e), 'error')
+        else:
+            flash(f"Importación finalizada: {report['created']} creados, {report['updated']} actualizados, "
+                  f"{len(report['errors'])} filas con errores",
+                  'warning' if report['errors'] else 'success')
+    
+    return render_template('admin/import.html', form=form, report=report)
+
+@bp.route('/admin/profesionales/exportar')
+@login_required
+def admin_export_professionals():
+    """Stream the whole directory as CSV or JSON Lines"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in professional_io.EXPORT_FORMATS:
+        abort(400)
+    
+    filename = f"profesionales-{datetime.utcnow():%Y%m%d}.{fmt}"
+    return Response(
+        stream_with_context(professional_io.export_professionals(fmt)),
+        mimetype=professional_io.EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template('404.html'), 404
 
-@app.route('/admin/analytics')
+def parse_date_arg(name, default):
+    """Read a YYYY-MM-DD query argument, falling back to ``default``"""
+    value = request.args.get(name, '').strip()
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return default
+
+@bp.route('/admin/analytics')
 @login_required
 def admin_analytics():
     """Analytics dashboard for admin"""
+    # Make events still sitting in the ingestion queue visible right away;
+    # read on the primary, as a replica may not have them yet
+    analytics_ingestor.flush()
+    ad_server.flush()
+    
+    # Get date range (last 30 days by default), inclusive on both ends
+    end_date = parse_date_arg('end', datetime.utcnow().date())
+    start_date = parse_date_arg('start', end_date - timedelta(days=30))
+    if start_date > end_date:
+        start_date, end_date = end_date, start_date
+    
     try:
-        # Get date range (last 30 days by default)
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=30)
-        
-        # Basic stats
-        total_page_views = Analytics.query.filter(
-            Analytics.action_type == 'page_view',
-            Analytics.created_at >= start_date
-        ).count()
-        
-        total_profile_views = Analytics.query.filter(
-            Analytics.action_type == 'profile_view',
-            Analytics.created_at >= start_date
-        ).count()
-        
-        total_searches = Analytics.query.filter(
-            Analytics.action_type == 'search',
-            Analytics.created_at >= start_date
-        ).count()
-        
-        # Most viewed professionals
-        popular_professionals = db.session.query(
-            Professional.name,
-            Professional.specialty,
-            func.count(Analytics.id).label('views')
-        ).join(
-            Analytics, Professional.id == Analytics.target_id
-        ).filter(
-            Analytics.action_type == 'profile_view',
-            Analytics.created_at >= start_date
-        ).group_by(
-            Professional.id, Professional.name, Professional.specialty
-        ).order_by(
-            func.count(Analytics.id).desc()
-        ).limit(10).all()
-        
-        # Daily views for chart
-        daily_views = db.session.query(
-            func.date(Analytics.created_at).label('date'),
-            func.count(Analytics.id).label('views')
-        ).filter(
-            Analytics.created_at >= start_date,
-            Analytics.action_type.in_(['page_view', 'profile_view'])
-        ).group_by(
-            func.date(Analytics.created_at)
-        ).order_by(
-            func.date(Analytics.created_at)
-        ).all()
+        # Everything below reads the daily rollups, never the raw events
+        totals = analytics_rollups.action_totals(start_date, end_date)
+        popular_professionals = analytics_rollups.popular_professionals(start_date, end_date)
+        daily_views = analytics_rollups.daily_views(start_date, end_date)
+        # Distinct visitors come from merged HyperLogLog sketches, not raw IPs
+        unique_visitors, daily_unique_visitors = visitor_sketches.unique_visitors(start_date, end_date)
+        professional_visitors = visitor_sketches.professional_unique_visitors(
+            start_date, end_date, [prof.id for prof in popular_professionals]
+        )
+        ad_report = ad_server.report(start_date, end_date)
         
         return render_template('admin/analytics.html',
-                             total_page_views=total_page_views,
-                             total_profile_views=total_profile_views,
-                             total_searches=total_searches,
+                             total_page_views=totals.get('page_view', 0),
+                             total_profile_views=totals.get('profile_view', 0),
+                             total_searches=totals.get('search', 0),
+                             unique_visitors=unique_visitors,
                              popular_professionals=popular_professionals,
+                             professional_visitors=professional_visitors,
                              daily_views=daily_views,
+                             daily_unique_visitors=daily_unique_visitors,
+                             ad_report=ad_report,
                              start_date=start_date,
-                             end_date=end_date)
+                             end_date=end_date,
+                             action_types=analytics_export.ACTION_TYPES,
+                             ingest_stats=analytics_ingestor.stats())
     except Exception as e:
-        app.logger.error(f"Error in analytics: {e}")
+        current_app.logger.error(f"Error in analytics: {e}")
         flash('Error al cargar las estadísticas. Por favor, intente nuevamente.', 'error')
         return render_template('admin/analytics.html',
                              total_page_views=0,
                              total_profile_views=0,
                              total_searches=0,
+                             unique_visitors=0,
                              popular_professionals=[],
+                             professional_visitors={},
                              daily_views=[],
-                             start_date=datetime.utcnow() - timedelta(days=30),
-                             end_date=datetime.utcnow())
+                             daily_unique_visitors={},
+                             ad_report=[],
+                             start_date=start_date,
+                             end_date=end_date,
+                             action_types=analytics_export.ACTION_TYPES,
+                             ingest_stats=analytics_ingestor.stats())
+
+@bp.route('/admin/analytics/export')
+@login_required
+def admin_analytics_export():
+    """Stream raw analytics events as CSV or JSON Lines.
+
+    Filters: ``start``/``end`` (YYYY-MM-DD, inclusive), ``action`` (may be
+    repeated) and ``professional_id``. At most ``limit`` events
+    (``ANALYTICS_EXPORT_MAX_ROWS`` by default) are sent per response; when
+    more remain, a final record points to the next chunk, which resumes
+    after the last event sent (see ``analytics_export.export_events``).
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in analytics_export.EXPORT_FORMATS:
+        abort(400)
+    actions = [action for action in request.args.getlist('action') if action]
+    if any(action not in analytics_export.ACTION_TYPES for action in actions):
+        abort(400)
+    max_rows = current_app.config['ANALYTICS_EXPORT_MAX_ROWS']
+    limit = max(1, min(request.args.get('limit', max_rows, type=int), max_rows))
+    start_date = parse_date_arg('start', None)
+    end_date = parse_date_arg('end', None)
+    after_id = request.args.get('after_id', 0, type=int)
+    
+    analytics_ingestor.flush()
+    filters = analytics_export.event_filters(
+        start_date, end_date, actions,
+        professional_id=request.args.get('professional_id', type=int),
+        after_id=after_id
+    )
+    
+    def next_url(last_id):
+        args = request.args.to_dict(flat=False)
+        args['after_id'] = last_id
+        return url_for('main.admin_analytics_export', _external=True, **args)
+    
+    period = '-'.join(f'{d:%Y%m%d}' for d in (start_date, end_date) if d) or 'todo'
+    filename = f"analytics-{period}{f'-desde-{after_id}' if after_id else ''}.{fmt}"
+    return Response(
+        stream_with_context(analytics_export.export_events(fmt, filters, limit, next_url)),
+        mimetype=analytics_export.EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@bp.route('/admin/metrics')
+def admin_metrics():
+    """Prometheus metrics for logged-in admins, or scrapers sending
+    ``Authorization: Bearer <METRICS_TOKEN>``"""
+    token = current_app.config.get('METRICS_TOKEN')
+    authorized = bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorized and not current_user.is_authenticated:
+        return login_manager.unauthorized()
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return render_template('500.html'), 500
 
-@app.route('/test-static')
+@bp.route('/test-static')
 def test_static():
     """Test route to verify static files are being served"""
     return '''
@@ -0,0 +1,188 @@
+import logging
+import re
+import unicodedata
+
+from sqlalchemy import Float, Integer, event, inspect, text
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize_text(value):
+    """Lowercase and strip accents so "Pediatría" and "pediatria" match"""
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(value):
+    """Split accent-folded text into index terms"""
+    return _WORD_RE.findall(normalize_text(value))
+
+
+class SearchIndex:
+    """Full-text index over Professional name, specialty and description.
+
+    Uses an FTS5 virtual table on SQLite and a side table holding a weighted
+    ``tsvector`` with a GIN index on PostgreSQL. Text is accent-folded in Python before it
+    is indexed, so both backends see the same normalized terms. The index is
+    kept in sync from mapper events, inside the same transaction as the
+    admin add/edit/delete that changed the row.
+    """
+
+    SQLITE_TABLE = 'professional_fts'
+    POSTGRES_TABLE = 'professional_search'
+
+    def __init__(self, app=None):
+        self.app = None
+        self._available = None
+        self.dialect = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from models import Professional
+
+        self.app = app
+        app.extensions['search_index'] = self
+        if not event.contains(Professional, 'after_insert', self._after_save):
+            event.listen(Professional, 'after_insert', self._after_save)
+            event.listen(Professional, 'after_update', self._after_save)
+            event.listen(Professional, 'after_delete', self._after_delete)
+
+    @property
+    def available(self):
+        """Whether the index exists; checked once per process on first use,
+        since ``create()`` runs from ``flask init-db``, not in every worker"""
+        if self._available is None:
+            from app import db
+
+            with db.engine.connect() as conn:
+                self._detect(conn)
+        return self._available
+
+    def _detect(self, conn):
+        self.dialect = conn.dialect.name
+        self._available = self.dialect in ('sqlite', 'postgresql') and inspect(conn).has_table(self._table)
+
+    def create(self):
+        """Create the index structures if needed and backfill an empty index"""
+        from app import db
+
+        self.dialect = db.engine.dialect.name
+        try:
+            with db.engine.begin() as conn:
+                if self.dialect == 'sqlite':
+                    conn.execute(text(
+                        f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.SQLITE_TABLE} "
+                        f"USING fts5(name, specialty, description, tokenize='unicode61 remove_diacritics 2')"
+                    ))
+                elif self.dialect == 'postgresql':
+                    conn.execute(text(
+                        f"CREATE TABLE IF NOT EXISTS {self.POSTGRES_TABLE} ("
+                        f"professional_id INTEGER PRIMARY KEY REFERENCES professional(id) ON DELETE CASCADE, "
+                        f"document TSVECTOR NOT NULL)"
+                    ))
+                    conn.execute(text(
+                        f"CREATE INDEX IF NOT EXISTS ix_{self.POSTGRES_TABLE}_document "
+                        f"ON {self.POSTGRES_TABLE} USING GIN (document)"
+                    ))
+                else:
+                    logger.info(f"Full-text search not supported on {self.dialect}, using LIKE")
+                    self._available = False
+                    return
+            self._available = True
+        except Exception as e:
+            logger.warning(f"Full-text index unavailable, falling back to LIKE search: {e}")
+            self._available = False
+            return
+
+        with db.engine.connect() as conn:
+            indexed = conn.execute(text(f"SELECT COUNT(*) FROM {self._table}")).scalar()
+        if not indexed:
+            self.rebuild()
+
+    def rebuild(self):
+        """Re-index every professional from scratch"""
+        from app import db
+        from models import Professional
+
+        if not self.available:
+            return 0
+        rows = db.session.query(
+            Professional.id, Professional.name, Professional.specialty, Professional.description
+        ).all()
+        with db.engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {self._table}"))
+            for row in rows:
+                self._index_row(conn, row.id, row.name, row.specialty, row.description)
+        return len(rows)
+
+    def match(self, query):
+        """Return a selectable of ``(professional_id, rank)`` for a user query.
+
+        Every term is prefix-matched and all terms must match. Lower ranks are
+        better on both backends. Returns None when the query has no terms or
+        the index is unavailable, so callers can fall back to LIKE.
+        """
+        terms = tokenize(query)
+        if not terms or not self.available:
+            return None
+        if self.dialect == 'sqlite':
+            return text(
+                f"SELECT rowid AS professional_id, bm25({self.SQLITE_TABLE}, 10.0, 5.0, 1.0) AS rank "
+                f"FROM {self.SQLITE_TABLE} WHERE {self.SQLITE_TABLE} MATCH :terms"
+            ).bindparams(terms=' '.join(f'"{t}"*' for t in terms)).columns(
+                professional_id=Integer, rank=Float
+            ).subquery('search_match')
+        return text(
+            f"SELECT professional_id, -ts_rank(document, to_tsquery('simple', :terms)) AS rank "
+            f"FROM {self.POSTGRES_TABLE} WHERE document @@ to_tsquery('simple', :terms)"
+        ).bindparams(terms=' & '.join(f'{t}:*' for t in terms)).columns(
+            professional_id=Integer, rank=Float
+        ).subquery('search_match')
+
+    @property
+    def _table(self):
+        return self.SQLITE_TABLE if self.dialect == 'sqlite' else self.POSTGRES_TABLE
+
+    def _index_row(self, conn, professional_id, name, specialty, description):
+        params = {
+            'id': professional_id,
+            'name': normalize_text(name),
+            'specialty': normalize_text(specialty),
+            'description': normalize_text(description),
+        }
+        if self.dialect == 'sqlite':
+            conn.execute(text(f"DELETE FROM {self.SQLITE_TABLE} WHERE rowid = :id"), params)
+            conn.execute(text(
+                f"INSERT INTO {self.SQLITE_TABLE} (rowid, name, specialty, description) "
+                f"VALUES (:id, :name, :specialty, :description)"
+            ), params)
+        else:
+            conn.execute(text(
+                f"INSERT INTO {self.POSTGRES_TABLE} (professional_id, document) VALUES (:id, "
+                f"setweight(to_tsvector('simple', :name), 'A') || "
+                f"setweight(to_tsvector('simple', :specialty), 'B') || "
+                f"setweight(to_tsvector('simple', :description), 'C')) "
+                f"ON CONFLICT (professional_id) DO UPDATE SET document = EXCLUDED.document"
+            ), params)
+
+    def _after_save(self, mapper, connection, target):
+        if self._available is None:
+            self._detect(connection)
+        if self._available:
+            self._index_row(connection, target.id, target.name, target.specialty, target.description)
+
+    def _after_delete(self, mapper, connection, target):
+        if self._available is None:
+            self._detect(connection)
+        if self._available:
+            connection.execute(
+                text(f"DELETE FROM {self._table} WHERE "
+                     f"{'rowid' if self.dialect == 'sqlite' else 'professional_id'} = :id"),
+                {'id': target.id}
+            )
+
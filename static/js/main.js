@@ -53,11 +53,20 @@ document.addEventListener('DOMContentLoaded', function() {
     // Search form enhancements
     enhanceSearchForm();
 
+    // Name, specialty and location suggestions from /api/autocomplete
+    setupAutocomplete();
+
     // Professional form enhancements
     enhanceProfessionalForm();
 
     // Add loading states to forms
     addLoadingStates();
+
+    // Incremental loading of search results
+    setupLoadMoreResults();
+
+    // "Near me" search using the browser location
+    setupNearbySearch();
 });
 
 // Create back to top button
@@ -120,7 +129,6 @@ function enhanceSearchForm() {
     var searchForm = document.querySelector('form[action*="search"]');
     if (!searchForm) return;
 
-    var queryInput = searchForm.querySelector('input[name="query"]');
     var specialtySelect = searchForm.querySelector('select[name="specialty"]');
     var locationSelect = searchForm.querySelector('select[name="location"]');
 
@@ -140,41 +148,52 @@ function enhanceSearchForm() {
             }
         });
     }
+}
 
-    // Add search suggestions (simple implementation)
-    if (queryInput) {
-        var suggestions = [
-            'Pediatría', 'Ginecología', 'Odontología', 'Psicología',
-            'Medicina General', 'Cardiología', 'Dermatología'
-        ];
+// Suggest professionals, specialties and locations while typing in a search box
+function setupAutocomplete() {
+    var inputs = document.querySelectorAll('form[method="GET"] input[name="query"]');
+    var labels = {specialty: 'Especialidad', location: 'Localidad', professional: 'Profesional'};
+
+    inputs.forEach(function(queryInput, index) {
+        var datalist = document.createElement('datalist');
+        datalist.id = 'searchSuggestions' + index;
+        document.body.appendChild(datalist);
+        queryInput.setAttribute('list', datalist.id);
+        queryInput.setAttribute('autocomplete', 'off');
+
+        var controller = null;
+        var urls = {};
 
         queryInput.addEventListener('input', function() {
-            var value = this.value.toLowerCase();
-            var existingDatalist = document.getElementById('searchSuggestions');
-            
-            if (existingDatalist) {
-                existingDatalist.remove();
+            var value = this.value.trim();
+            // Picking a suggestion fills the box with its label; go straight to it
+            if (urls[value]) {
+                window.location.href = urls[value];
+                return;
             }
-
-            if (value.length > 2) {
-                var datalist = document.createElement('datalist');
-                datalist.id = 'searchSuggestions';
-                
-                suggestions.forEach(function(suggestion) {
-                    if (suggestion.toLowerCase().includes(value)) {
+            if (controller) controller.abort();
+            if (!value) {
+                datalist.replaceChildren();
+                return;
+            }
+            controller = new AbortController();
+            fetch('/api/autocomplete?q=' + encodeURIComponent(value), {signal: controller.signal})
+                .then(function(response) { return response.json(); })
+                .then(function(data) {
+                    urls = {};
+                    datalist.replaceChildren();
+                    data.suggestions.forEach(function(suggestion) {
                         var option = document.createElement('option');
-                        option.value = suggestion;
+                        option.value = suggestion.label;
+                        option.label = labels[suggestion.type] || '';
+                        urls[suggestion.label] = suggestion.url;
                         datalist.appendChild(option);
-                    }
-                });
-
-                if (datalist.children.length > 0) {
-                    document.body.appendChild(datalist);
-                    queryInput.setAttribute('list', 'searchSuggestions');
-                }
-            }
+                    });
+                })
+                .catch(function() {});
         });
-    }
+    });
 }
 
 // Enhance professional form
@@ -258,6 +277,202 @@ function enhanceProfessionalForm() {
     }
 }
 
+// Load further search result pages from /api/buscar instead of reloading the page
+function setupLoadMoreResults() {
+    var loadMoreButton = document.getElementById('loadMoreResults');
+    var resultsContainer = document.getElementById('searchResults');
+    if (!loadMoreButton || !resultsContainer) return;
+
+    var resultsCount = document.getElementById('resultsCount');
+    var shown = resultsContainer.children.length;
+
+    loadMoreButton.addEventListener('click', function(e) {
+        e.preventDefault();
+        var cursor = loadMoreButton.dataset.cursor;
+        if (!cursor || loadMoreButton.classList.contains('disabled')) return;
+
+        var originalHtml = loadMoreButton.innerHTML;
+        loadMoreButton.classList.add('disabled');
+        loadMoreButton.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>Cargando...';
+
+        var url = loadMoreButton.dataset.apiUrl + '&cursor=' + encodeURIComponent(cursor);
+        fetch(url, { headers: { 'Accept': 'application/json' } })
+            .then(function(response) {
+                if (!response.ok) throw new Error('HTTP ' + response.status);
+                return response.json();
+            })
+            .then(function(data) {
+                data.results.forEach(function(professional) {
+                    resultsContainer.appendChild(buildProfessionalResultCard(professional));
+                });
+                shown += data.results.length;
+
+                if (data.next_cursor) {
+                    loadMoreButton.dataset.cursor = data.next_cursor;
+                    loadMoreButton.classList.remove('disabled');
+                    loadMoreButton.innerHTML = originalHtml;
+                } else {
+                    loadMoreButton.parentNode.remove();
+                }
+                if (resultsCount) {
+                    resultsCount.textContent = shown + (data.next_cursor ? '+' : '');
+                }
+            })
+            .catch(function() {
+                loadMoreButton.classList.remove('disabled');
+                loadMoreButton.innerHTML = originalHtml;
+                showNotification('No se pudieron cargar más resultados', 'danger');
+            });
+    });
+}
+
+// Show professionals closest to the user's location, using /api/cerca
+function setupNearbySearch() {
+    var nearbyButton = document.getElementById('nearbySearch');
+    var section = document.getElementById('nearbyResultsSection');
+    var container = document.getElementById('nearbyResults');
+    if (!nearbyButton || !section || !container || !navigator.geolocation) return;
+
+    nearbyButton.classList.remove('d-none');
+    nearbyButton.addEventListener('click', function() {
+        var originalHtml = nearbyButton.innerHTML;
+        nearbyButton.disabled = true;
+        nearbyButton.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>Buscando...';
+
+        function restoreButton() {
+            nearbyButton.disabled = false;
+            nearbyButton.innerHTML = originalHtml;
+        }
+
+        navigator.geolocation.getCurrentPosition(function(position) {
+            var form = nearbyButton.closest('form');
+            var params = new URLSearchParams({
+                lat: position.coords.latitude,
+                lng: position.coords.longitude
+            });
+            ['specialty', 'location'].forEach(function(name) {
+                var field = form && form.querySelector('[name="' + name + '"]');
+                if (field && field.value) params.set(name, field.value);
+            });
+            var availableOnly = form && form.querySelector('input[name="available_only"]');
+            params.set('available_only', availableOnly && !availableOnly.checked ? 'false' : 'true');
+
+            fetch(nearbyButton.dataset.apiUrl + '?' + params.toString(), { headers: { 'Accept': 'application/json' } })
+                .then(function(response) {
+                    if (!response.ok) throw new Error('HTTP ' + response.status);
+                    return response.json();
+                })
+                .then(function(data) {
+                    container.innerHTML = '';
+                    if (data.results.length === 0) {
+                        var empty = document.createElement('p');
+                        empty.className = 'text-muted';
+                        empty.textContent = 'No hay profesionales con ubicación en un radio de ' + data.radius_km + ' km.';
+                        container.appendChild(empty);
+                    }
+                    data.results.forEach(function(professional) {
+                        container.appendChild(buildProfessionalResultCard(professional));
+                    });
+                    section.classList.remove('d-none');
+                    section.scrollIntoView({ behavior: 'smooth', block: 'start' });
+                    restoreButton();
+                })
+                .catch(function() {
+                    restoreButton();
+                    showNotification('No se pudo realizar la búsqueda por cercanía', 'danger');
+                });
+        }, function() {
+            restoreButton();
+            showNotification('No se pudo obtener tu ubicación', 'warning');
+        });
+    });
+}
+
+// Build a search result card matching the markup in search.html
+function buildProfessionalResultCard(professional) {
+    function element(tag, className, text) {
+        var el = document.createElement(tag);
+        if (className) el.className = className;
+        if (text) el.textContent = text;
+        return el;
+    }
+
+    function withIcon(tag, className, iconClass, text) {
+        var el = element(tag, className);
+        el.appendChild(element('i', iconClass));
+        el.appendChild(document.createTextNode(' ' + text));
+        return el;
+    }
+
+    var column = element('div', 'col-lg-6');
+    var card = element('div', 'card h-100 shadow-sm professional-result-card');
+    var body = element('div', 'card-body');
+    var row = element('div', 'd-flex align-items-start');
+
+    if (professional.photo_url) {
+        var photo = element('img', 'rounded-circle me-3 professional-photo');
+        photo.src = professional.photo_url;
+        photo.alt = professional.name;
+        row.appendChild(photo);
+    } else {
+        var placeholder = element('div', 'rounded-circle bg-primary text-white d-flex align-items-center justify-content-center me-3 professional-photo-placeholder');
+        placeholder.appendChild(element('i', 'fas fa-user'));
+        row.appendChild(placeholder);
+    }
+
+    var info = element('div', 'flex-grow-1');
+    var header = element('div', 'mb-2');
+    header.appendChild(element('h5', 'card-title mb-0', professional.name));
+    info.appendChild(header);
+    info.appendChild(withIcon('p', 'text-primary mb-1', 'fas fa-stethoscope me-1', professional.specialty));
+    var locationText = professional.location;
+    if (professional.distance_km !== undefined) {
+        locationText += ' · a ' + professional.distance_km.toFixed(1) + ' km';
+    }
+    info.appendChild(withIcon('p', 'text-muted mb-2', 'fas fa-map-marker-alt me-1', locationText));
+
+    var contact = element('div', 'contact-info mb-3');
+    var phoneLine = element('p', 'mb-1');
+    phoneLine.appendChild(element('i', 'fas fa-phone me-1 text-success'));
+    var phoneLink = element('a', 'text-decoration-none', professional.phone);
+    phoneLink.href = 'tel:' + professional.phone;
+    phoneLine.appendChild(document.createTextNode(' '));
+    phoneLine.appendChild(phoneLink);
+    contact.appendChild(phoneLine);
+
+    if (professional.whatsapp_link) {
+        var whatsappLine = element('p', 'mb-1');
+        var whatsappLink = withIcon('a', 'btn btn-sm btn-success text-decoration-none', 'fab fa-whatsapp me-1', 'WhatsApp');
+        whatsappLink.href = professional.whatsapp_link;
+        whatsappLink.target = '_blank';
+        whatsappLine.appendChild(whatsappLink);
+        contact.appendChild(whatsappLine);
+    }
+    info.appendChild(contact);
+
+    if (professional.schedule) {
+        var schedule = professional.schedule.length > 50 ? professional.schedule.slice(0, 50) + '...' : professional.schedule;
+        info.appendChild(withIcon('p', 'small text-muted mb-1', 'fas fa-clock me-1', schedule));
+    }
+
+    if (professional.has_insurance_coverage) {
+        info.appendChild(withIcon('p', 'small text-muted mb-1', 'fas fa-shield-alt me-1', 'Obras sociales disponibles'));
+    }
+
+    var actions = element('div', 'mt-3');
+    var profileLink = element('a', 'btn btn-primary btn-sm', 'Ver Perfil Completo ');
+    profileLink.href = professional.url;
+    profileLink.appendChild(element('i', 'fas fa-arrow-right ms-1'));
+    actions.appendChild(profileLink);
+    info.appendChild(actions);
+
+    row.appendChild(info);
+    body.appendChild(row);
+    card.appendChild(body);
+    column.appendChild(card);
+    return column;
+}
+
 // Add loading states to forms
 function addLoadingStates() {
     var forms = document.querySelectorAll('form');
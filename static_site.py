@@ -0,0 +1,277 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from xml.sax.saxutils import escape
+
+from flask import url_for
+from werkzeug.exceptions import NotFound
+
+logger = logging.getLogger(__name__)
+
+# Written next to the pages: the files of the last build and the specialty and
+# location of each professional then, so an edit can find the searches it left
+MANIFEST_NAME = '.static-site.json'
+
+
+def page_file(url):
+    """Output file of the page at ``url`` (path plus optional query string).
+
+    ``/`` and ``/profesional/<id>`` become ``index.html`` files in their
+    directory; a filtered search becomes ``buscar/<query string>.html``.
+    """
+    path, _, query = url.partition('?')
+    path = path.strip('/')
+    if query:
+        return f'{path}/{query}.html'
+    return f'{path}/index.html' if path else 'index.html'
+
+
+def search_combos(professional, combos):
+    """Search filters ``(specialty, location)`` among ``combos`` whose page
+    may list ``professional`` or count it in its filter dropdowns: those
+    sharing its specialty or location, or with either filter unset"""
+    specialty, location = professional
+    return {combo for combo in combos if combo[0] in ('', specialty) or combo[1] in ('', location)}
+
+
+class StaticSite:
+    """Pre-rendered copy of the public pages, for nginx or a CDN.
+
+    ``build`` renders the homepage, the search page of every specialty x
+    location combination (either may be "all") and the profile of every
+    available professional with the regular templates and ``url_for``,
+    and writes them with a ``sitemap.xml`` into ``STATIC_SITE_DIR``.
+    Afterwards, every local commit that adds, edits or deletes
+    professionals re-renders in the background only the pages they appear
+    on: their profiles, the homepage and the searches sharing their old or
+    new specialty or location, whose dropdowns count them. Files are
+    replaced atomically, so the web server never sees a partial page. Bulk imports and the popularity
+    ranking do not trigger regeneration; rebuild after them.
+
+    The server maps URLs to files with ``page_file``; with nginx::
+
+        location = /buscar {
+            set $page /buscar/index.html;
+            if ($args) { set $page /buscar/$args.html; }
+            try_files $page @app;
+        }
+        location / { try_files $uri/index.html @app; }
+    """
+
+    def __init__(self, app=None, directory_version=None):
+        self.app = None
+        self.directory_version = directory_version
+        self._lock = threading.Lock()
+        self.counters = {'builds': 0, 'regenerations': 0, 'pages_written': 0, 'failed': 0}
+        if app is not None:
+            self.init_app(app, directory_version)
+
+    def init_app(self, app, directory_version=None):
+        app.config.setdefault('STATIC_SITE_DIR', os.environ.get('STATIC_SITE_DIR'))
+        # Absolute base of the URLs in sitemap.xml
+        app.config.setdefault('STATIC_SITE_URL', os.environ.get('STATIC_SITE_URL', 'http://localhost'))
+        if directory_version is not None:
+            self.directory_version = directory_version
+        self.app = app
+        app.extensions['static_site'] = self
+        if self.directory_version is not None:
+            self.directory_version.on_change(self._on_change)
+
+    @property
+    def output_dir(self):
+        return self.app.config['STATIC_SITE_DIR'] or os.path.join(self.app.instance_path, 'static_site')
+
+    def stats(self):
+        return dict(self.counters)
+
+    def build(self):
+        """Render every public page. Returns a report dict."""
+        from models import Professional
+
+        started = time.perf_counter()
+        with self._lock:
+            previous = self._load_manifest()
+            professionals = {
+                str(professional_id): [specialty, location]
+                for professional_id, specialty, location in Professional.query.with_entities(
+                    Professional.id, Professional.specialty, Professional.location
+                ).filter_by(available=True).order_by(Professional.id)
+            }
+            written = self._render(
+                [self._index_page()]
+                + [self._search_page(specialty, location) for specialty, location in self._combos()]
+                + [self._profile_page(int(professional_id)) for professional_id in professionals]
+            )
+            manifest = {'pages': sorted(written), 'professionals': professionals}
+            removed = self._remove(set(previous['pages']) - set(written)) if previous else 0
+            self._write_sitemap()
+            self._save_manifest(manifest)
+            self.counters['builds'] += 1
+        return self._report(started, written, removed)
+
+    def regenerate(self, changed):
+        """Re-render the pages affected by ``changed`` ({id: 'saved' or
+        'deleted'}, as passed to ``DirectoryVersion`` listeners). Returns a
+        report dict, or None when no build exists yet."""
+        from models import Professional
+
+        started = time.perf_counter()
+        with self._lock:
+            manifest = self._load_manifest()
+            if manifest is None:
+                return None
+            current = {
+                professional.id: professional
+                for professional in Professional.query.filter(Professional.id.in_(list(changed)))
+            }
+            all_combos = self._combos()
+            combos = set()
+            pages = [self._index_page()]
+            gone = []
+            for professional_id in changed:
+                old = manifest['professionals'].pop(str(professional_id), None)
+                if old:
+                    combos |= search_combos(old, all_combos)
+                professional = current.get(professional_id)
+                if professional is not None and professional.available:
+                    new = [professional.specialty, professional.location]
+                    manifest['professionals'][str(professional_id)] = new
+                    combos |= search_combos(new, all_combos)
+                    pages.append(self._profile_page(professional_id))
+                else:
+                    gone.append(page_file(self._profile_page(professional_id)[0]))
+            pages += [self._search_page(*combo) for combo in all_combos if combo in combos]
+
+            written = self._render(pages)
+            removed = self._remove(gone)
+            manifest['pages'] = sorted((set(manifest['pages']) | set(written)) - set(gone))
+            self._write_sitemap()
+            self._save_manifest(manifest)
+            self.counters['regenerations'] += 1
+        return self._report(started, written, removed)
+
+    def _on_change(self, changed):
+        if not self.app.config['STATIC_SITE_DIR']:
+            return
+        # Called after the admin's commit; render on a thread so the admin
+        # request does not wait, with its own app context and session
+        threading.Thread(
+            target=self._regenerate_in_background, args=(dict(changed),), name='static-site', daemon=True
+        ).start()
+
+    def _regenerate_in_background(self, changed):
+        with self.app.app_context():
+            try:
+                report = self.regenerate(changed)
+                if report is not None:
+                    logger.info(f"Static site: regenerated {report['pages']} pages in {report['seconds']:.2f}s")
+            except Exception as e:
+                self.counters['failed'] += 1
+                logger.error(f"Static site regeneration failed: {e}")
+
+    @staticmethod
+    def _combos():
+        from models import LOCATIONS, SPECIALTIES
+
+        return [(specialty, location) for specialty in [''] + SPECIALTIES for location in [''] + LOCATIONS]
+
+    # Pages are (url, render) pairs; render runs in a request for url
+    def _index_page(self):
+        import routes
+
+        return '/', routes.render_index
+
+    def _search_page(self, specialty, location):
+        import routes
+
+        with self.app.test_request_context():
+            url = url_for('main.search', specialty=specialty or None, location=location or None)
+        return url, lambda: routes.render_search('', specialty, location, True, None, 'relevance')
+
+    def _profile_page(self, professional_id):
+        import routes
+
+        with self.app.test_request_context():
+            url = url_for('main.professional_detail', professional_id=professional_id)
+        return url, lambda: routes.render_professional(professional_id)[0]
+
+    def _render(self, pages):
+        written = []
+        for url, render in pages:
+            try:
+                with self.app.test_request_context(url, base_url=self.app.config['STATIC_SITE_URL']):
+                    html = render()
+            except NotFound:
+                # Hidden or deleted since the page list was read
+                self._remove([page_file(url)])
+                continue
+            self._write(page_file(url), html.encode('utf-8'))
+            written.append(page_file(url))
+        self.counters['pages_written'] += len(written)
+        return written
+
+    def _write_sitemap(self):
+        from models import Professional
+
+        base = self.app.config['STATIC_SITE_URL'].rstrip('/')
+        entries = []
+        with self.app.test_request_context(base_url=base):
+            entries.append((url_for('main.index'), None))
+            entries += [(self._search_page(*combo)[0], None) for combo in self._combos()]
+            for professional_id, updated_at in Professional.query.with_entities(
+                Professional.id, Professional.updated_at
+            ).filter_by(available=True).order_by(Professional.id):
+                entries.append((url_for('main.professional_detail', professional_id=professional_id), updated_at))
+
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+        for url, updated_at in entries:
+            lastmod = f'<lastmod>{updated_at:%Y-%m-%d}</lastmod>' if updated_at else ''
+            lines.append(f'<url><loc>{escape(base + url)}</loc>{lastmod}</url>')
+        lines.append('</urlset>')
+        self._write('sitemap.xml', '\n'.join(lines).encode('utf-8'))
+
+    def _write(self, name, data):
+        path = os.path.join(self.output_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _remove(self, names):
+        removed = 0
+        for name in names:
+            try:
+                os.unlink(os.path.join(self.output_dir, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.output_dir, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _save_manifest(self, manifest):
+        self._write(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+
+    def _report(self, started, written, removed):
+        return {
+            'pages': len(written),
+            'removed': removed,
+            'bytes': sum(os.path.getsize(os.path.join(self.output_dir, name)) for name in written),
+            'seconds': time.perf_counter() - started,
+            'output_dir': self.output_dir,
+        }
@@ -0,0 +1,167 @@
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+PROFESSIONAL_BATCH_SIZE = 5000
+ANALYTICS_BATCH_SIZE = 10000
+
+FIRST_NAMES = [
+    'María', 'José', 'Ana', 'Juan', 'Lucía', 'Carlos', 'Sofía', 'Martín', 'Valentina', 'Diego',
+    'Camila', 'Federico', 'Julieta', 'Pablo', 'Florencia', 'Nicolás', 'Agustina', 'Matías',
+    'Romina', 'Sebastián', 'Gabriela', 'Andrés', 'Natalia', 'Facundo', 'Paula', 'Ignacio',
+]
+LAST_NAMES = [
+    'González', 'Rodríguez', 'Gómez', 'Fernández', 'López', 'Díaz', 'Martínez', 'Pérez',
+    'García', 'Sánchez', 'Romero', 'Sosa', 'Torres', 'Álvarez', 'Ruiz', 'Ramírez', 'Flores',
+    'Benítez', 'Acosta', 'Medina', 'Herrera', 'Suárez', 'Aguirre', 'Giménez', 'Gutiérrez',
+]
+INSURANCES = ['OSEP', 'PAMI', 'OSDE', 'Swiss Medical', 'Galeno', 'IOSFA', 'Sancor Salud']
+
+# Approximate town centres, so generated coordinates cluster like real ones
+LOCATION_CENTERS = {
+    'San Carlos': (-33.7740, -69.0470),
+    'Tunuyán': (-33.5770, -69.0150),
+    'Tupungato': (-33.3710, -69.1480),
+}
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+    'Mozilla/5.0 (Linux; Android 14; SM-A546E) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_1) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15',
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+]
+REFERRERS = [None, 'https://www.google.com/', 'https://www.facebook.com/', 'https://l.instagram.com/']
+
+# Relative frequency of each action type in generated traffic
+ACTION_WEIGHTS = {'page_view': 40, 'search': 30, 'profile_view': 25, 'contact_click': 5}
+
+
+def _professional_row(rng, now, specialties):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    location = rng.choice(list(LOCATION_CENTERS))
+    premium = rng.random() < 0.2
+    phone = f'0261 {rng.randint(400, 499)}-{rng.randint(1000, 9999)}'
+    created_at = now - timedelta(days=rng.randint(0, 730), seconds=rng.randint(0, 86399))
+    row = {
+        'name': f'{"Dra." if rng.random() < 0.5 else "Dr."} {first} {last}',
+        'specialty': rng.choice(specialties),
+        'location': location,
+        'phone': phone,
+        'plan': 'premium' if premium else 'basic',
+        'available': rng.random() < 0.85,
+        'contact_type': rng.choice(['phone', 'whatsapp', 'both']),
+        'photo_url': None,
+        'address': None,
+        'schedule': None,
+        'whatsapp': None,
+        'insurance_coverage': None,
+        'description': None,
+        'latitude': None,
+        'longitude': None,
+        'created_at': created_at,
+        'updated_at': created_at,
+    }
+    if premium:
+        lat, lng = LOCATION_CENTERS[location]
+        row.update(
+            address=f'Calle {rng.choice(LAST_NAMES)} {rng.randint(1, 2500)}, {location}',
+            schedule='Lunes a Viernes de 9 a 13 y de 17 a 20',
+            whatsapp=phone,
+            insurance_coverage=', '.join(rng.sample(INSURANCES, rng.randint(1, 4))),
+            description=f'Atención de {row["specialty"].lower()} en {location}. Turnos programados.',
+            latitude=lat + rng.gauss(0, 0.03),
+            longitude=lng + rng.gauss(0, 0.03),
+        )
+    return row
+
+
+def generate_professionals(count, batch_size=PROFESSIONAL_BATCH_SIZE, seed=None):
+    """Insert ``count`` synthetic professionals spread over SPECIALTIES and
+    LOCATIONS. Rows go in with bulk Core inserts, so the search and spatial
+    indexes are rebuilt once at the end instead of row by row."""
+    from app import db, directory_stats, directory_version, geo_index, search_index
+    from models import SPECIALTIES, Professional
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    inserted = 0
+    while inserted < count:
+        rows = [_professional_row(rng, now, SPECIALTIES) for _ in range(min(batch_size, count - inserted))]
+        db.session.execute(insert(Professional), rows)
+        db.session.commit()
+        inserted += len(rows)
+
+    directory_version.bump(db.session.connection())
+    directory_stats.recompute(db.session.connection())
+    db.session.commit()
+    directory_version.invalidate()
+    search_index.rebuild()
+    geo_index.rebuild()
+    return inserted
+
+
+def generate_analytics(count, days=90, batch_size=ANALYTICS_BATCH_SIZE, seed=None):
+    """Insert ``count`` synthetic events spread over the last ``days`` days.
+
+    Rollups, visitor sketches and popularity scores are updated batch by
+    batch exactly as live ingestion does, so the dashboard and rankings
+    match the raw events without a rebuild.
+    """
+    import visitor_sketches
+    from analytics_rollups import record_batch
+    from analytics_retention import intern_values
+    from app import db, popularity_ranking
+    from models import Analytics, Professional, Referrer, UserAgent
+
+    professional_ids = db.session.execute(select(Professional.id)).scalars().all()
+    if not professional_ids:
+        raise ValueError('Generate professionals before analytics events')
+    user_agents = {agent_id: value for value, agent_id in intern_values(UserAgent, USER_AGENTS).items()}
+    user_agent_ids = list(user_agents)
+    referrer_ids = list(intern_values(Referrer, [r for r in REFERRERS if r]).values()) + [None]
+    db.session.commit()
+
+    rng = random.Random(seed)
+    actions, weights = zip(*ACTION_WEIGHTS.items())
+    end = datetime.utcnow()
+    span = days * 86400
+    inserted = 0
+    while inserted < count:
+        size = min(batch_size, count - inserted)
+        rows = []
+        for action in rng.choices(actions, weights, k=size):
+            row = {
+                'action_type': action,
+                'target_id': None,
+                'target_type': {'page_view': 'homepage', 'search': 'search'}.get(action, 'professional'),
+                'user_ip': f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+                'user_agent_id': rng.choice(user_agent_ids),
+                'referrer_id': rng.choice(referrer_ids),
+                'created_at': end - timedelta(seconds=rng.randint(0, span)),
+            }
+            if row['target_type'] == 'professional':
+                row['target_id'] = rng.choice(professional_ids)
+            rows.append(row)
+        db.session.execute(insert(Analytics), rows)
+        record_batch(rows)
+        popularity_ranking.record_batch(rows)
+        # Sketches identify visitors by User-Agent text, as tracked live
+        visitor_sketches.record_batch(
+            dict(row, user_agent=user_agents[row['user_agent_id']]) for row in rows
+        )
+        db.session.commit()
+        inserted += size
+    return inserted
+
+
+def table_counts():
+    """Row counts of the tables the generator fills"""
+    from app import db
+    from models import Analytics, Professional
+
+    return {
+        'professionals': db.session.query(func.count(Professional.id)).scalar(),
+        'analytics': db.session.query(func.count(Analytics.id)).scalar(),
+    }
@@ -0,0 +1,49 @@
+import pytest
+
+from app import create_app, db
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """The application on a fresh SQLite file, schema created as by ``flask init-db``"""
+    from commands import init_db
+
+    path = tmp_path_factory.mktemp('db') / 'test.db'
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SQLALCHEMY_BINDS': {},
+        'RATE_LIMIT_ENABLED': False,
+        'STATIC_SITE_DIR': None,
+        'WTF_CSRF_ENABLED': False,
+    })
+    with app.app_context():
+        init_db()
+    return app
+
+
+@pytest.fixture
+def session(app):
+    """``db.session`` in an app context, with every professional deleted afterwards"""
+    from models import Professional
+
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+        for professional in Professional.query:
+            db.session.delete(professional)
+        db.session.commit()
+
+
+@pytest.fixture
+def admin_client(app):
+    """A test client logged in as an admin"""
+    from commands import create_admin
+    from models import Admin
+
+    with app.app_context():
+        if not Admin.query.filter_by(username='test').first():
+            create_admin('test', 'test@example.com', 'secret')
+    client = app.test_client()
+    client.post('/login', data={'username': 'test', 'password': 'secret'})
+    return client
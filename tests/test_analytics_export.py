@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+
+ACTIONS = ['page_view', 'profile_view', 'search']
+
+
+@pytest.fixture(scope='module')
+def events(app):
+    """Ids of 50 raw events, one per minute, cycling through ``ACTIONS``"""
+    from models import Analytics
+
+    with app.app_context():
+        start = datetime(2025, 5, 1)
+        rows = [
+            Analytics(action_type=ACTIONS[i % 3], target_type='page', user_ip='10.0.0.1',
+                      user_agent='Mozilla/5.0', created_at=start + timedelta(minutes=i))
+            for i in range(50)
+        ]
+        db.session.add_all(rows)
+        db.session.commit()
+        ids = [row.id for row in rows]
+    yield ids
+    with app.app_context():
+        Analytics.query.filter(Analytics.id.in_(ids)).delete()
+        db.session.commit()
+
+
+def read_chunk(client, url, fmt):
+    """The event ids of one export response and its next chunk URL, if any"""
+    response = client.get(url)
+    assert response.status_code == 200
+    text = response.get_data(as_text=True)
+    if fmt == 'csv':
+        lines = text.splitlines()
+        next_url = lines.pop()[len('# next: '):] if lines[-1].startswith('# next: ') else None
+        rows = list(csv.DictReader(io.StringIO('\n'.join(lines))))
+        return [int(row['id']) for row in rows], next_url
+    records = [json.loads(line) for line in text.splitlines()]
+    next_url = records.pop()['next'] if records and 'next' in records[-1] else None
+    return [record['id'] for record in records], next_url
+
+
+def export_all(client, url, fmt):
+    ids, chunks = [], 0
+    while url:
+        chunk, url = read_chunk(client, url, fmt)
+        ids += chunk
+        chunks += 1
+    return ids, chunks
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'jsonl'])
+@pytest.mark.parametrize('limit', [1, 7, 25, 50, 1000])
+def test_chunks_resume_without_gaps_or_duplicates(admin_client, events, fmt, limit):
+    ids, chunks = export_all(admin_client, f'/admin/analytics/export?format={fmt}&limit={limit}', fmt)
+    assert ids == events
+    # A chunk that ends exactly at the last event has no pointer after it
+    assert chunks == -(-len(events) // limit)
+
+
+def test_chunks_of_filtered_export(admin_client, events):
+    url = '/admin/analytics/export?format=jsonl&limit=4&action=search&action=page_view'
+    ids, _ = export_all(admin_client, url, 'jsonl')
+    assert ids == [event_id for i, event_id in enumerate(events) if ACTIONS[i % 3] != 'profile_view']
+
+
+def test_next_record_resumes_after_last_event(admin_client, events):
+    _, next_url = read_chunk(admin_client, '/admin/analytics/export?format=jsonl&limit=10', 'jsonl')
+    assert f'after_id={events[9]}' in next_url
+    assert 'limit=10' in next_url
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+import analytics_retention
+from analytics_retention import INTERN_CACHE_TTL, LOOKUP_GRACE, intern_values, prune
+from app import db
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; rv:115.0) Gecko/20100101 Firefox/115.0'
+
+
+@pytest.fixture
+def context(app):
+    from models import Analytics, UserAgent
+
+    with app.app_context():
+        analytics_retention._intern_cache.clear()
+        yield
+        db.session.rollback()
+        Analytics.query.delete()
+        UserAgent.query.delete()
+        db.session.commit()
+
+
+def add_event(user_agent_id, created_at):
+    from models import Analytics
+
+    db.session.add(Analytics(action_type='page_view', target_type='page', user_ip='10.0.0.1',
+                             user_agent_id=user_agent_id, created_at=created_at))
+    db.session.commit()
+
+
+def test_lookup_cached_by_another_worker_survives_prune(context):
+    from models import UserAgent
+
+    ua_id = intern_values(UserAgent, [USER_AGENT])[USER_AGENT]
+    add_event(ua_id, datetime.utcnow() - timedelta(days=400))
+    # Another worker interned the same value and keeps its id cached
+    other_worker = dict(analytics_retention._intern_cache)
+
+    report = prune(90)
+    assert report['rows_deleted'] == 1
+    assert report['lookup_rows_deleted'] == 0
+    assert db.session.get(UserAgent, ua_id).orphaned_at is not None
+
+    # That worker logs a new event with its cached id, which still exists
+    analytics_retention._intern_cache.update(other_worker)
+    assert intern_values(UserAgent, [USER_AGENT])[USER_AGENT] == ua_id
+    add_event(ua_id, datetime.utcnow())
+
+    # Referenced again, so no longer marked nor deleted however old the mark
+    db.session.execute(update(UserAgent).values(orphaned_at=datetime.utcnow() - 2 * LOOKUP_GRACE))
+    db.session.commit()
+    assert prune(90)['lookup_rows_deleted'] == 0
+    assert db.session.get(UserAgent, ua_id).orphaned_at is None
+
+
+def test_orphaned_lookup_is_deleted_after_grace(context, monkeypatch):
+    from models import UserAgent
+
+    ua_id = intern_values(UserAgent, [USER_AGENT])[USER_AGENT]
+    add_event(ua_id, datetime.utcnow() - timedelta(days=400))
+    other_worker = dict(analytics_retention._intern_cache)
+    prune(90)
+
+    db.session.execute(update(UserAgent).values(orphaned_at=datetime.utcnow() - LOOKUP_GRACE * 1.5))
+    db.session.commit()
+    assert prune(90)['lookup_rows_deleted'] == 1
+    db.session.expire_all()
+    assert db.session.get(UserAgent, ua_id) is None
+
+    # By then the other worker's cache entry has expired: the value is
+    # looked up again and interned anew instead of reusing the deleted id
+    assert LOOKUP_GRACE.total_seconds() > INTERN_CACHE_TTL
+    analytics_retention._intern_cache.update(other_worker)
+    now = analytics_retention.monotonic()
+    monkeypatch.setattr(analytics_retention, 'monotonic', lambda: now + INTERN_CACHE_TTL + 1)
+    new_id = intern_values(UserAgent, [USER_AGENT])[USER_AGENT]
+    assert db.session.get(UserAgent, new_id) is not None
@@ -0,0 +1,91 @@
+from itertools import product
+
+from sqlalchemy import func
+
+from app import facet_index
+from models import LOCATIONS, SPECIALTIES, Professional
+
+SOME_SPECIALTIES = SPECIALTIES[:4]
+
+
+def add_professionals(session, n):
+    professionals = [
+        Professional(
+            name=f'Profesional {i}',
+            specialty=SOME_SPECIALTIES[i % 4],
+            location=LOCATIONS[i % 3],
+            phone='2622000000',
+            plan=('basic', 'premium', None)[i % 5 % 3],
+            available=i % 7 != 0,
+        )
+        for i in range(n)
+    ]
+    session.add_all(professionals)
+    session.commit()
+    return professionals
+
+
+def assert_counts_match_db(session):
+    groups = session.query(
+        Professional.specialty, Professional.location, Professional.available,
+        func.coalesce(Professional.plan, 'basic'), func.count(Professional.id)
+    ).group_by(Professional.specialty, Professional.location, Professional.available, Professional.plan).all()
+
+    def sql_count(specialty, location, available_only, plan):
+        return sum(
+            n for s, l, a, p, n in groups
+            if specialty in (None, s) and location in (None, l) and (a or not available_only) and plan in (None, p)
+        )
+
+    for specialty, location, available_only, plan in product(
+        [None] + SPECIALTIES, [None] + LOCATIONS, [False, True], [None, 'basic', 'premium']
+    ):
+        assert facet_index.count(specialty, location, available_only, plan) == \
+            sql_count(specialty, location, available_only, plan)
+
+    for available_only, location in product([False, True], [None] + LOCATIONS):
+        expected = {specialty: sql_count(specialty, location, available_only, None) for specialty in SPECIALTIES}
+        counts = facet_index.facet_counts('specialty', location=location, available_only=available_only)
+        assert counts == {specialty: n for specialty, n in expected.items() if n}
+
+
+def test_counts_match_db(session):
+    add_professionals(session, 60)
+    assert_counts_match_db(session)
+
+
+def test_counts_follow_changes(session):
+    professionals = add_professionals(session, 60)
+    assert_counts_match_db(session)
+    full_loads = facet_index.counters['full_loads']
+
+    professionals[1].specialty = SOME_SPECIALTIES[0]
+    professionals[2].available = False
+    professionals[3].plan = 'premium'
+    session.commit()
+    assert_counts_match_db(session)
+    # Edits are applied without reloading everything
+    assert facet_index.counters['full_loads'] == full_loads
+
+    add_professionals(session, 5)
+    assert_counts_match_db(session)
+
+    session.delete(professionals[4])
+    session.delete(professionals[5])
+    session.commit()
+    assert_counts_match_db(session)
+    assert facet_index.count() == session.query(Professional).count()
+
+
+def test_snapshot_is_replaced_not_mutated(session):
+    add_professionals(session, 10)
+    before = facet_index.snapshot()
+    counts = {facet: dict(values) for facet, values in before.bitmaps.items()}
+
+    professional = session.query(Professional).first()
+    professional.location = LOCATIONS[(LOCATIONS.index(professional.location) + 1) % 3]
+    session.commit()
+
+    assert facet_index.snapshot() is not before
+    # A reader still holding the old snapshot sees it unchanged
+    assert {facet: dict(values) for facet, values in before.bitmaps.items()} == counts
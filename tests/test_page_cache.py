@@ -0,0 +1,66 @@
+import pytest
+
+from app import ad_server, db, page_cache
+
+BROWSER = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0'}
+
+
+@pytest.fixture
+def client(app):
+    page_cache.clear()
+    return app.test_client()
+
+
+@pytest.fixture
+def header_ad(app):
+    from models import Advertisement
+
+    with app.app_context():
+        ad = Advertisement(title='Clínica', content='Anuncio de prueba', position='header', is_active=True)
+        db.session.add(ad)
+        db.session.commit()
+        yield ad.id
+        Advertisement.query.delete()
+        db.session.commit()
+
+
+@pytest.mark.parametrize('url', ['/', '/buscar?specialty=Pediatría'])
+def test_conditional_get_without_active_ads(client, url):
+    response = client.get(url, headers=BROWSER)
+    assert response.status_code == 200
+    assert response.headers.get('ETag')
+    assert response.headers.get('Last-Modified')
+
+    revalidated = client.get(url, headers={**BROWSER, 'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+def test_page_with_active_ad_is_never_revalidated(client, header_ad):
+    before = client.get('/', headers=BROWSER)
+    assert 'Anuncio de prueba' in before.get_data(as_text=True)
+    assert before.headers.get('ETag') is None
+
+    impressions = ad_server.counters['impressions']
+    cached = page_cache.stats()['hits']
+    response = client.get('/', headers={**BROWSER, 'If-None-Match': '"anything"',
+                                        'If-Modified-Since': 'Sun, 01 Jan 2034 00:00:00 GMT'})
+    # Served from the cache, but as a full page with a freshly chosen ad
+    assert page_cache.stats()['hits'] == cached + 1
+    assert response.status_code == 200
+    assert 'Anuncio de prueba' in response.get_data(as_text=True)
+    assert ad_server.counters['impressions'] == impressions + 1
+
+
+
+@pytest.mark.parametrize('url', ['/', '/buscar?specialty=Pediatría'])
+def test_anonymous_pages_do_not_vary_on_cookie(client, url):
+    assert client.get(url, headers=BROWSER).headers.get('Vary') is None
+    # Served from the cache as well
+    assert client.get(url, headers=BROWSER).headers.get('Vary') is None
+
+
+def test_admin_pages_are_not_served_from_cache(admin_client):
+    page_cache.clear()
+    response = admin_client.get('/', headers=BROWSER)
+    assert response.headers.get('ETag') is None
+    assert 'Cookie' in response.headers.get('Vary', '')
@@ -0,0 +1,75 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, select
+
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page, split_page
+
+
+def raw_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def test_cursor_round_trip():
+    values = ['Pediatría', 3, 1.5, True, None, datetime(2025, 3, 4, 5, 6, 7, 890)]
+    cursor = encode_cursor(values)
+    assert '=' not in cursor
+    assert decode_cursor(cursor, len(values)) == values
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    base64.urlsafe_b64encode(b'\xff\xfe').decode('ascii'),
+    base64.urlsafe_b64encode(b'{"not": "json"').decode('ascii'),
+    raw_cursor({'a': 1}),
+    raw_cursor([1]),
+    raw_cursor([1, 2, 3]),
+    raw_cursor([{'x': 1}, [1]]),
+    raw_cursor([[1], 2]),
+    raw_cursor([{'$dt': 5}, 1]),
+    raw_cursor([{'$dt': 'yesterday'}, 1]),
+])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, 2)
+
+
+def test_encode_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        encode_cursor([object()])
+
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_keyset_pages_cover_ties_once(descending):
+    engine = create_engine('sqlite://')
+    metadata = MetaData()
+    rows = Table('rows', metadata, Column('id', Integer, primary_key=True), Column('name', String))
+    metadata.create_all(engine)
+    # Long runs of equal names, so page boundaries fall inside the ties
+    with engine.begin() as conn:
+        conn.execute(rows.insert(), [{'id': i, 'name': f'n{i % 4}'} for i in range(1, 48)])
+
+    columns = [(rows.c.name, descending), (rows.c.id, False)]
+    expected = sorted(range(1, 48), key=lambda i: (-(i % 4) if descending else i % 4, i))
+
+    seen = []
+    cursor = None
+    with engine.connect() as conn:
+        while True:
+            page = conn.execute(keyset_page(select(rows.c.id, rows.c.name), columns, cursor, per_page=5)).all()
+            page, cursor = split_page(page, lambda row: (row.name, row.id), 5)
+            seen += [row.id for row in page]
+            if cursor is None:
+                break
+    assert seen == expected
+
+
+def test_crafted_cursor_is_rejected_by_search(app):
+    # Plan, name and id, the sort key of a relevance search without text
+    cursor = raw_cursor([{'x': 1}, [1], 2])
+    client = app.test_client()
+    assert client.get('/api/buscar', query_string={'cursor': cursor}).status_code == 400
+    # The HTML page falls back to the first page
+    assert client.get('/buscar', query_string={'cursor': cursor}).status_code == 200
@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import text
+
+from app import db
+from models import LOCATIONS, SPECIALTIES, Professional
+from professional_io import import_professionals
+
+
+def rows(names):
+    return [
+        (row_number, {'name': name, 'specialty': SPECIALTIES[0], 'location': LOCATIONS[0],
+                      'phone': f'26220000{row_number:02d}'}, None)
+        for row_number, name in enumerate(names, start=2)
+    ]
+
+
+@pytest.fixture
+def rejecting_db(app, session):
+    """A database refusing to insert professionals named "Rechazado" """
+    db.session.execute(text(
+        "CREATE TRIGGER reject_professional BEFORE INSERT ON professional "
+        "WHEN NEW.name = 'Rechazado' BEGIN SELECT RAISE(ABORT, 'profesional rechazado'); END"
+    ))
+    db.session.commit()
+    with app.test_request_context():
+        yield
+    db.session.execute(text("DROP TRIGGER reject_professional"))
+    db.session.commit()
+
+
+def test_failed_batch_is_retried_row_by_row(rejecting_db):
+    names = ['Ana', 'Beto', 'Rechazado', 'Carla', 'Dario', 'Rechazado', 'Eva']
+    report = import_professionals(rows(names), batch_size=4)
+
+    assert report['rows'] == 7
+    assert report['created'] == 5
+    assert [error['row'] for error in report['errors']] == [4, 7]
+    assert 'profesional rechazado' in report['errors'][0]['errors']['_'][0]
+    assert sorted(name for (name,) in db.session.query(Professional.name)) == ['Ana', 'Beto', 'Carla', 'Dario', 'Eva']
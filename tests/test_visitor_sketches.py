@@ -0,0 +1,85 @@
+from datetime import date, datetime
+
+import pytest
+
+from app import db
+from visitor_sketches import PRECISION, HyperLogLog, professional_unique_visitors, record_batch, unique_visitors
+
+# Relative standard error at the default precision
+STANDARD_ERROR = 1.04 / (2 ** PRECISION) ** 0.5
+
+
+def sketch_of(values):
+    sketch = HyperLogLog()
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+@pytest.mark.parametrize('n', [1000, 10000, 100000])
+def test_estimate_within_expected_error(n):
+    estimate = sketch_of(f'visitor-{i}' for i in range(n)).count()
+    assert abs(estimate - n) <= 3 * STANDARD_ERROR * n
+
+
+def test_small_counts_are_nearly_exact():
+    assert sketch_of([]).count() == 0
+    assert sketch_of(f'visitor-{i}' for i in range(20)).count() == 20
+
+
+def test_duplicates_are_not_counted():
+    assert sketch_of(['same'] * 500).count() == 1
+
+
+def test_merge_is_the_sketch_of_the_union():
+    a = sketch_of(f'visitor-{i}' for i in range(0, 6000))
+    b = sketch_of(f'visitor-{i}' for i in range(4000, 10000))
+    expected = bytes(map(max, a.registers, b.registers))
+    assert bytes(a.merge(b).registers) == expected
+    assert bytes(a.registers) == bytes(sketch_of(f'visitor-{i}' for i in range(10000)).registers)
+
+
+def test_merge_rejects_other_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(12).merge(HyperLogLog(10))
+
+
+def test_bytes_round_trip():
+    sketch = sketch_of(f'visitor-{i}' for i in range(3000))
+    data = sketch.to_bytes()
+    assert len(data) < len(sketch.registers)
+    assert HyperLogLog.from_bytes(data).registers == sketch.registers
+    with pytest.raises(ValueError):
+        HyperLogLog.from_bytes(bytes([10]) + data[1:])
+
+
+def test_daily_and_professional_sketches(app):
+    from models import DailyVisitorSketch, ProfessionalVisitorSketch
+
+    def event(day, ip, professional_id=None):
+        return {
+            'created_at': datetime(2025, 6, day, 12),
+            'user_ip': ip,
+            'user_agent': 'Mozilla/5.0',
+            'target_type': 'professional' if professional_id else 'page',
+            'target_id': professional_id,
+        }
+
+    with app.app_context():
+        # 40 visitors on the 1st, 30 of them and 25 new ones on the 2nd; the
+        # 2nd takes two batches, merging into its stored sketch
+        record_batch([event(1, f'10.0.0.{i}', 7 if i < 10 else None) for i in range(40)])
+        record_batch([event(2, f'10.0.0.{i}', 7 if i < 5 else None) for i in range(10, 65)])
+        record_batch([event(2, f'10.0.0.{i}') for i in range(30, 40)])
+        db.session.commit()
+
+        # Estimates, though close to exact at these counts
+        total, daily = unique_visitors(date(2025, 6, 1), date(2025, 6, 2))
+        assert daily == {date(2025, 6, 1): pytest.approx(40, abs=1), date(2025, 6, 2): pytest.approx(55, abs=1)}
+        assert total == pytest.approx(65, abs=2)
+        visitors = professional_unique_visitors(date(2025, 6, 1), date(2025, 6, 2), [7, 8])
+        assert visitors == {7: pytest.approx(10, abs=1), 8: 0}
+
+        DailyVisitorSketch.query.delete()
+        ProfessionalVisitorSketch.query.delete()
+        db.session.commit()
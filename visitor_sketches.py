@@ -0,0 +1,209 @@
+import hashlib
+import math
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+from itertools import groupby
+
+from sqlalchemy import delete, func
+
+# A sketch has 2 ** PRECISION registers; the standard error of its estimate
+# is about 1.04 / sqrt(2 ** PRECISION), 1.6% for 12
+PRECISION = 12
+
+
+class HyperLogLog:
+    """Mergeable estimate of the number of distinct values added to it.
+
+    ``to_bytes`` stores the one-byte registers zlib-compressed after a
+    precision byte, so the sketch of a quiet day or professional takes a few
+    dozen bytes and a busy one at most a few KB, however many visitors it
+    counts. Merging two sketches gives the sketch of the union.
+    """
+
+    def __init__(self, precision=PRECISION, registers=None):
+        self.precision = precision
+        self.registers = bytearray(registers if registers is not None else 1 << precision)
+
+    @classmethod
+    def from_bytes(cls, data):
+        precision = data[0]
+        registers = zlib.decompress(data[1:])
+        if len(registers) != 1 << precision:
+            raise ValueError('Corrupt HyperLogLog sketch')
+        return cls(precision, registers)
+
+    def to_bytes(self):
+        return bytes([self.precision]) + zlib.compress(bytes(self.registers))
+
+    def add(self, value):
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(f'Cannot merge sketches of precision {self.precision} and {other.precision}')
+        # Register-wise max over all the registers at once, as one integer
+        # each: ranks are below 128, so subtracting from a register with its
+        # top bit set never borrows from the next one, and that bit survives
+        # exactly where this register is the larger
+        size = len(self.registers)
+        mine = int.from_bytes(self.registers, 'little')
+        theirs = int.from_bytes(other.registers, 'little')
+        top_bits = int.from_bytes(b'\x80' * size, 'little')
+        keep = ((((mine | top_bits) - theirs) & top_bits) >> 7) * 0xFF
+        self.registers = bytearray(((mine & keep) | (theirs & ~keep)).to_bytes(size, 'little'))
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        histogram = Counter(self.registers)
+        estimate = (0.7213 / (1 + 1.079 / m)) * m * m / sum(n * 2.0 ** -rank for rank, n in histogram.items())
+        # Linear counting is more accurate while many registers are still empty
+        if estimate <= 2.5 * m and histogram[0]:
+            estimate = m * math.log(m / histogram[0])
+        return round(estimate)
+
+
+def visitor_id(row):
+    """Identity of the visitor behind an event: client IP plus User-Agent"""
+    if not row.get('user_ip'):
+        return None
+    return f"{row['user_ip']}\n{row.get('user_agent') or ''}"
+
+
+def record_batch(rows):
+    """Add the visitors of a batch of raw analytics events to the daily sketches.
+
+    Registered as an ``analytics_ingestor`` batch handler next to
+    ``analytics_rollups.record_batch``. Only the sketches are kept, so
+    unique visitor counts survive the pruning of raw events and their IPs.
+    """
+    from models import DailyVisitorSketch, ProfessionalVisitorSketch
+
+    daily = defaultdict(HyperLogLog)
+    per_professional = defaultdict(HyperLogLog)
+    for row in rows:
+        visitor = visitor_id(row)
+        if visitor is None:
+            continue
+        day = row['created_at'].date()
+        daily[(day,)].add(visitor)
+        if row.get('target_type') == 'professional' and row.get('target_id') is not None:
+            per_professional[(day, row['target_id'])].add(visitor)
+
+    merge_sketches(DailyVisitorSketch, ('day',), daily)
+    merge_sketches(ProfessionalVisitorSketch, ('day', 'professional_id'), per_professional)
+
+
+def rebuild_sketches(start, end=None):
+    """Recompute the sketches for ``start``..``end`` (inclusive) from raw events.
+
+    Called by ``analytics_rollups.rebuild_rollups``; events are read one day
+    at a time, so memory stays bounded however many there are.
+    """
+    from app import db
+    from models import Analytics, DailyVisitorSketch, ProfessionalVisitorSketch, UserAgent
+
+    raw_filters = [Analytics.created_at >= datetime.combine(start, time.min)]
+    daily_filters = [DailyVisitorSketch.day >= start]
+    professional_filters = [ProfessionalVisitorSketch.day >= start]
+    if end is not None:
+        raw_filters.append(Analytics.created_at < datetime.combine(end + timedelta(days=1), time.min))
+        daily_filters.append(DailyVisitorSketch.day <= end)
+        professional_filters.append(ProfessionalVisitorSketch.day <= end)
+
+    db.session.execute(delete(DailyVisitorSketch).where(*daily_filters))
+    db.session.execute(delete(ProfessionalVisitorSketch).where(*professional_filters))
+
+    events = db.session.query(
+        Analytics.created_at,
+        Analytics.user_ip,
+        func.coalesce(Analytics.user_agent, UserAgent.value).label('user_agent'),
+        Analytics.target_type,
+        Analytics.target_id
+    ).outerjoin(
+        UserAgent, Analytics.user_agent_id == UserAgent.id
+    ).filter(*raw_filters).order_by(Analytics.created_at).yield_per(5000)
+    for _, rows in groupby(events, key=lambda row: row.created_at.date()):
+        record_batch(row._mapping for row in rows)
+
+
+def unique_visitors(start, end):
+    """Estimated distinct visitors between two dates (inclusive), and per day.
+
+    Returns ``(total, {day: visitors})``. The daily sketches are merged one
+    at a time, so neither the range nor the traffic affects memory use.
+    """
+    from app import db
+    from models import DailyVisitorSketch
+
+    total = HyperLogLog()
+    daily = {}
+    for day, data in db.session.query(DailyVisitorSketch.day, DailyVisitorSketch.sketch).filter(
+        DailyVisitorSketch.day.between(start, end)
+    ).yield_per(100):
+        sketch = HyperLogLog.from_bytes(data)
+        daily[day] = sketch.count()
+        total.merge(sketch)
+    return total.count(), daily
+
+
+def professional_unique_visitors(start, end, professional_ids):
+    """Estimated distinct visitors of each professional between two dates (inclusive)"""
+    from app import db
+    from models import ProfessionalVisitorSketch
+
+    sketches = {professional_id: HyperLogLog() for professional_id in professional_ids}
+    if not sketches:
+        return {}
+    for professional_id, data in db.session.query(
+        ProfessionalVisitorSketch.professional_id, ProfessionalVisitorSketch.sketch
+    ).filter(
+        ProfessionalVisitorSketch.professional_id.in_(sketches),
+        ProfessionalVisitorSketch.day.between(start, end)
+    ).yield_per(100):
+        sketches[professional_id].merge(HyperLogLog.from_bytes(data))
+    return {professional_id: sketch.count() for professional_id, sketch in sketches.items()}
+
+
+def merge_sketches(model, key_columns, sketches):
+    """Merge ``sketches`` ({key tuple: HyperLogLog}) into ``model.sketch``, inserting missing keys"""
+    from app import db
+
+    if not sketches:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        # Create the missing rows empty first, so concurrent writers both
+        # end up merging into the same locked row below
+        empty = HyperLogLog().to_bytes()
+        db.session.execute(
+            insert(model).on_conflict_do_nothing(index_elements=list(key_columns)),
+            [dict(zip(key_columns, key), sketch=empty) for key in sketches]
+        )
+
+    filters = [
+        getattr(model, column).in_({key[i] for key in sketches})
+        for i, column in enumerate(key_columns)
+    ]
+    existing = {
+        tuple(getattr(row, column) for column in key_columns): row
+        for row in model.query.filter(*filters).with_for_update()
+    }
+    for key, sketch in sketches.items():
+        row = existing.get(key)
+        if row is None:
+            db.session.add(model(**dict(zip(key_columns, key)), sketch=sketch.to_bytes()))
+        else:
+            row.sketch = HyperLogLog.from_bytes(row.sketch).merge(sketch).to_bytes()
+    db.session.flush()